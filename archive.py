@@ -0,0 +1,131 @@
+"""Hot/cold split for reservations.
+
+Finished stays (``checked_out``, ``cancelled``, ``no_show``) whose check-out
+is more than ``ARCHIVE_AFTER_DAYS`` ago move from ``reservations`` to
+``reservations_archive``. The hot table then holds only current and future
+stays plus a short tail, so the date-filtered endpoints and their indexes stay
+the same size however much history piles up.
+
+The mover works in batches, one short transaction each. It locks a batch of
+candidate rows (``FOR UPDATE SKIP LOCKED`` where supported, so it never waits
+on a row the front desk is editing), copies them to the archive and deletes
+them from the hot table. A stopped run loses nothing and the next run carries
+on, because every batch is atomic and candidates are found by predicate.
+
+Reads by ``reservation_id`` fall back to the archive (``get_reservation``),
+and the rollup rebuild and guest search load read both tables.
+
+    python archive.py                    # archive everything due
+    python archive.py --older-than-days 90 --batch-size 500 --max-batches 20
+    python archive.py --status
+"""
+import argparse
+import os
+import time
+from datetime import date, timedelta
+from typing import Optional
+
+from sqlalchemy import delete, func, insert, select
+
+import models
+
+hot = models.Reservations.__table__
+cold = models.ReservationArchive.__table__
+
+ARCHIVE_AFTER_DAYS = int(os.getenv("ARCHIVE_AFTER_DAYS", "30"))
+ARCHIVE_BATCH_SIZE = int(os.getenv("ARCHIVE_BATCH_SIZE", "1000"))
+FINISHED_STATUSES = ("checked_out", "cancelled", "no_show")
+
+
+def cutoff(today: Optional[date] = None, older_than_days: int = ARCHIVE_AFTER_DAYS) -> date:
+    return (today or date.today()) - timedelta(days=older_than_days)
+
+
+def candidates_query(before: date, batch_size: int):
+    # Served by ix_reservations_status_check_out
+    return (
+        select(hot)
+        .where(hot.c.status.in_(FINISHED_STATUSES), hot.c.check_out < before)
+        .limit(batch_size)
+        .with_for_update(skip_locked=True)
+    )
+
+
+def archive_batch(conn, before: date, batch_size: int = ARCHIVE_BATCH_SIZE) -> int:
+    """Move one batch inside the caller's transaction; returns how many rows moved."""
+    rows = conn.execute(candidates_query(before, batch_size)).mappings().all()
+    if not rows:
+        return 0
+    conn.execute(insert(cold), [dict(row) for row in rows])
+    conn.execute(delete(hot).where(hot.c.reservation_id.in_([row["reservation_id"] for row in rows])))
+    return len(rows)
+
+
+def archive(db_engine, before: date, batch_size: int = ARCHIVE_BATCH_SIZE,
+            max_batches: Optional[int] = None, pause: float = 0.0) -> dict:
+    """Move everything due in committed batches; `pause` seconds between batches spreads the I/O."""
+    started = time.perf_counter()
+    moved = batches = 0
+    while max_batches is None or batches < max_batches:
+        with db_engine.begin() as conn:
+            count = archive_batch(conn, before, batch_size)
+        if not count:
+            break
+        moved += count
+        batches += 1
+        if pause:
+            time.sleep(pause)
+    return {"moved": moved, "batches": batches, "before": before.isoformat(),
+            "seconds": round(time.perf_counter() - started, 3)}
+
+
+def status(conn, before: date) -> dict:
+    due = select(func.count()).select_from(hot).where(hot.c.status.in_(FINISHED_STATUSES), hot.c.check_out < before)
+    return {
+        "hot": conn.execute(select(func.count()).select_from(hot)).scalar(),
+        "archived": conn.execute(select(func.count()).select_from(cold)).scalar(),
+        "due": conn.execute(due).scalar(),
+    }
+
+
+# ---------------- Reads across both tables ----------------
+async def get_reservation(db, reservation_id: int):
+    """The reservation from the hot table, or else from the archive (an ORM object either way)."""
+    return await db.get(models.Reservations, reservation_id) or \
+        await db.get(models.ReservationArchive, reservation_id)
+
+
+async def get_fields(db, reservation_id: int, *names: str) -> Optional[dict]:
+    """Just the `names` columns of the reservation, hot or archived; None when it does not exist."""
+    for table in (hot, cold):
+        found = await db.execute(select(*(table.c[name] for name in names))
+                                 .where(table.c.reservation_id == reservation_id))
+        row = found.mappings().first()
+        if row is not None:
+            return dict(row)
+    return None
+
+
+async def is_archived(db, reservation_id: int) -> bool:
+    found = await db.execute(select(cold.c.reservation_id).where(cold.c.reservation_id == reservation_id))
+    return found.first() is not None
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Move finished reservations to reservations_archive")
+    parser.add_argument("--older-than-days", type=int, default=ARCHIVE_AFTER_DAYS,
+                        help="archive stays that checked out more than this many days ago")
+    parser.add_argument("--batch-size", type=int, default=ARCHIVE_BATCH_SIZE)
+    parser.add_argument("--max-batches", type=int, help="stop after this many batches (resume on the next run)")
+    parser.add_argument("--pause", type=float, default=0.0, help="seconds to sleep between batches")
+    parser.add_argument("--status", action="store_true", help="report table sizes and rows due, move nothing")
+    args = parser.parse_args()
+
+    from database import engine
+
+    before = cutoff(older_than_days=args.older_than_days)
+    if args.status:
+        with engine.connect() as conn:
+            print(status(conn, before))
+    else:
+        print(archive(engine, before, args.batch_size, args.max_batches, args.pause))
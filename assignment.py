@@ -0,0 +1,174 @@
+"""Batch room assignment for unassigned bookings.
+
+Takes every ``booked`` reservation without a room arriving in a date window,
+plus the rooms and the stays that already hold them, and assigns rooms per
+room type as interval scheduling:
+
+* a stay always gets one room for all of its nights, so the plan has no room
+  moves; a stay that no single room can hold is reported as unassigned
+  instead of being split;
+* arrivals are placed in check-in order into the free gap whose start is
+  closest before the arrival (best fit), so rooms turn over back to back and
+  long empty stretches stay whole for later long stays.
+
+    python assignment.py --from 2025-06-01 --to 2025-06-30 [--dry-run]
+"""
+import argparse
+import time
+from bisect import bisect_left, insort
+from collections import defaultdict
+from datetime import date
+from typing import Dict, List, Tuple
+
+from sqlalchemy import and_, bindparam, select, update
+
+import models
+from availability import UNSELLABLE_STATUSES
+from queries import live_assignments_query, rooms_query, unassigned_query
+
+reservations_table = models.Reservations.__table__
+# Open-ended free time after a room's last held night
+FOREVER = date.max.toordinal()
+
+
+def _ordinal(value) -> int:
+    if isinstance(value, str):
+        value = date.fromisoformat(value[:10])
+    return value.toordinal()
+
+
+def free_gaps(rooms, held, window_start: date) -> Dict[str, List[Tuple[int, int, str]]]:
+    """Free gaps per room type from `window_start` on, as sorted (start, -end, room_number).
+
+    The end is negated so that, among gaps opening on the same night, the
+    shortest sorts last and is the first one a backwards scan tries.
+    """
+    taken = defaultdict(list)
+    for stay in held:
+        taken[stay.room_number].append((_ordinal(stay.check_in), _ordinal(stay.check_out)))
+
+    gaps = defaultdict(list)
+    origin = window_start.toordinal()
+    for room in rooms:
+        if room.status in UNSELLABLE_STATUSES:
+            continue
+        cursor = origin
+        for start, end in sorted(taken.get(room.room_number, ())):
+            if start > cursor:
+                gaps[room.room_type].append((cursor, -start, room.room_number))
+            cursor = max(cursor, end)
+        gaps[room.room_type].append((cursor, -FOREVER, room.room_number))
+    for type_gaps in gaps.values():
+        type_gaps.sort()
+    return gaps
+
+
+def plan(rooms, held, pending, window_start: date) -> Tuple[Dict[int, str], List[int]]:
+    """Return ({reservation_id: room_number}, [reservation_ids left unassigned])."""
+    gaps = free_gaps(rooms, held, window_start)
+    by_type = defaultdict(list)
+    for stay in pending:
+        by_type[stay.room_type].append((_ordinal(stay.check_in), _ordinal(stay.check_out), stay.reservation_id))
+
+    assigned, unassigned = {}, []
+    for room_type, stays in by_type.items():
+        # Longer stays first on a shared arrival day: they are the hardest to place
+        stays.sort(key=lambda stay: (stay[0], stay[0] - stay[1]))
+        open_gaps = gaps.get(room_type, [])
+        for check_in, check_out, reservation_id in stays:
+            # Gaps starting on or before the arrival, nearest first; take the first long enough
+            i = bisect_left(open_gaps, (check_in + 1,))
+            while i:
+                i -= 1
+                start, end, room_number = open_gaps[i]
+                end = -end
+                if end <= check_in:
+                    # Later arrivals are no earlier, so this gap can never be used again
+                    del open_gaps[i]
+                    continue
+                if end >= check_out:
+                    del open_gaps[i]
+                    if end > check_out:
+                        insort(open_gaps, (check_out, -end, room_number))
+                    assigned[reservation_id] = room_number
+                    break
+            else:
+                unassigned.append(reservation_id)
+    return assigned, unassigned
+
+
+def load_statements(date_from: date, date_to: date):
+    return rooms_query(), live_assignments_query(date_from), unassigned_query(date_from, date_to)
+
+
+def _load(conn, date_from: date, date_to: date):
+    return [conn.execute(stmt).all() for stmt in load_statements(date_from, date_to)]
+
+
+def write_back_statement():
+    # Only fill rooms that are still empty: a front-desk assignment made meanwhile wins
+    return update(reservations_table).where(
+        and_(
+            reservations_table.c.reservation_id == bindparam("rid"),
+            reservations_table.c.room_number.is_(None),
+            reservations_table.c.status == "booked",
+        )
+    ).values(room_number=bindparam("room"))
+
+
+def write_back_params(assigned: Dict[int, str]) -> List[dict]:
+    return [{"rid": rid, "room": room} for rid, room in assigned.items()]
+
+
+def written_query(assigned: Dict[int, str]):
+    # Read back in the write-back's transaction (MySQL has no UPDATE ... RETURNING)
+    return select(reservations_table.c.reservation_id, reservations_table.c.room_number).where(
+        reservations_table.c.reservation_id.in_(list(assigned))
+    )
+
+
+def confirm(result: dict, rows) -> dict:
+    """Keep only the assignments the write-back stored; the guarded-out ones move to `skipped`."""
+    stored = {row.reservation_id: row.room_number for row in rows}
+    planned = result["assignments"]
+    result["assignments"] = {rid: room for rid, room in planned.items() if stored.get(rid) == room}
+    result["skipped"] = [rid for rid in planned if rid not in result["assignments"]]
+    result["assigned"] = len(result["assignments"])
+    return result
+
+
+def timed_plan(rooms, held, pending, window_start: date) -> dict:
+    started = time.perf_counter()
+    assigned, unassigned = plan(rooms, held, pending, window_start)
+    return {
+        "pending": len(pending),
+        "assigned": len(assigned),
+        "unassigned": unassigned,
+        "skipped": [],
+        "solve_seconds": round(time.perf_counter() - started, 4),
+        "assignments": assigned,
+    }
+
+
+def assign(conn, date_from: date, date_to: date, dry_run: bool = False) -> dict:
+    """Plan and (unless dry_run) write assignments in the caller's transaction."""
+    result = timed_plan(*_load(conn, date_from, date_to), date_from)
+    if result["assignments"] and not dry_run:
+        conn.execute(write_back_statement(), write_back_params(result["assignments"]))
+        confirm(result, conn.execute(written_query(result["assignments"])).all())
+    return result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Assign rooms to unassigned bookings in a date window")
+    parser.add_argument("--from", dest="date_from", type=date.fromisoformat, default=date.today())
+    parser.add_argument("--to", dest="date_to", type=date.fromisoformat, required=True)
+    parser.add_argument("--dry-run", action="store_true", help="plan only, write nothing")
+    args = parser.parse_args()
+
+    from database import engine
+
+    with engine.begin() as conn:
+        result = assign(conn, args.date_from, args.date_to, args.dry_run)
+    result["assignments"] = len(result["assignments"])
+    print(result)
@@ -0,0 +1,128 @@
+"""Night audit: end-of-day status transitions as chunked, set-based updates.
+
+For a business date D, in this order:
+
+* ``no_shows`` - ``booked`` stays arriving on or before D become ``no_show``,
+  and their nights are released from the rollups (and so from booking inventory);
+* ``departures`` - ``checked_in`` stays with check_out on or before D become
+  ``checked_out``, and their rooms are marked ``dirty`` (``occupied`` rooms go
+  back to ``vacant``) in the same transaction.
+
+Each chunk is one transaction. It locks up to ``chunk_size`` matching rows,
+updates them with one statement per table and commits. Every phase selects
+its work by predicate, so re-running an audit is a no-op, and a run that
+died part-way carries on where it stopped.
+
+    python audit.py [--date 2025-06-01] [--chunk-size 1000]
+
+``POST /night-audit`` runs the same job and also refreshes the API's
+in-process indexes, cache and event stream. After a run from the command line
+those catch up only when the API restarts.
+"""
+import argparse
+import os
+import time
+from datetime import date
+from types import SimpleNamespace
+from typing import List
+
+from sqlalchemy import select, update
+
+import bulk_ops
+import conditional
+import models
+import rollups
+from queries import rooms_query
+
+res = models.Reservations.__table__
+rooms = models.Room.__table__
+
+AUDIT_CHUNK_SIZE = int(os.getenv("AUDIT_CHUNK_SIZE", "1000"))
+STAY_COLUMNS = (res.c.reservation_id, res.c.room_number, res.c.room_type, res.c.check_in, res.c.check_out,
+                res.c.status, res.c.total_amount)
+
+
+def _changed(rows, status: str) -> List[SimpleNamespace]:
+    return [SimpleNamespace(**{**row._mapping, "status": status}) for row in rows]
+
+
+def no_shows_query(business_date: date, chunk_size: int):
+    return select(*STAY_COLUMNS).where(res.c.status == "booked", res.c.check_in <= business_date) \
+        .limit(chunk_size).with_for_update()
+
+
+def departures_query(business_date: date, chunk_size: int):
+    return select(*STAY_COLUMNS).where(res.c.status == "checked_in", res.c.check_out <= business_date) \
+        .limit(chunk_size).with_for_update()
+
+
+def no_show_chunk(conn, business_date: date, chunk_size: int = AUDIT_CHUNK_SIZE):
+    """One chunk in the caller's transaction; returns (changed reservations, changed rooms)."""
+    rows = conn.execute(no_shows_query(business_date, chunk_size)).all()
+    if not rows:
+        return [], []
+    conn.execute(update(res).where(res.c.reservation_id.in_([row.reservation_id for row in rows]),
+                                   res.c.status == "booked").values(status="no_show"))
+    # A no-show sells nothing, so its whole contribution comes off
+    rollups.apply(conn, rollups.difference(rollups.combined(rows), {}))
+    return _changed(rows, "no_show"), []
+
+
+def departure_chunk(conn, business_date: date, chunk_size: int = AUDIT_CHUNK_SIZE):
+    rows = conn.execute(departures_query(business_date, chunk_size)).all()
+    if not rows:
+        return [], []
+    conn.execute(update(res).where(res.c.reservation_id.in_([row.reservation_id for row in rows]),
+                                   res.c.status == "checked_in").values(status="checked_out"))
+    numbers = sorted({row.room_number for row in rows if row.room_number})
+    changed_rooms = []
+    if numbers:
+        conn.execute(update(rooms).where(rooms.c.room_number.in_(numbers)).values(**bulk_ops.VACATED_ROOM_VALUES))
+        conditional.bump_sync(conn, "rooms")
+        changed_rooms = conn.execute(rooms_query().where(models.Room.room_number.in_(numbers))).all()
+    return _changed(rows, "checked_out"), changed_rooms
+
+
+PHASES = (("no_shows", no_show_chunk), ("departures", departure_chunk))
+
+
+def run(db_engine, business_date: date, chunk_size: int = AUDIT_CHUNK_SIZE) -> dict:
+    """Run every phase to completion; the report carries the changed rows under `changes`."""
+    report = {"business_date": business_date.isoformat(), "phases": {}}
+    changes = {"reservations": [], "rooms": []}
+    started = time.perf_counter()
+    for name, step in PHASES:
+        phase_started = time.perf_counter()
+        reservations_changed = rooms_changed = chunks = 0
+        while True:
+            with db_engine.begin() as conn:
+                changed, changed_rooms = step(conn, business_date, chunk_size)
+            if not changed:
+                break
+            chunks += 1
+            reservations_changed += len(changed)
+            rooms_changed += len(changed_rooms)
+            changes["reservations"].extend(changed)
+            changes["rooms"].extend(changed_rooms)
+        report["phases"][name] = {
+            "reservations": reservations_changed,
+            "rooms": rooms_changed,
+            "chunks": chunks,
+            "seconds": round(time.perf_counter() - phase_started, 3),
+        }
+    report["seconds"] = round(time.perf_counter() - started, 3)
+    report["changes"] = changes
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the night audit for a business date")
+    parser.add_argument("--date", dest="business_date", type=date.fromisoformat, default=date.today())
+    parser.add_argument("--chunk-size", type=int, default=AUDIT_CHUNK_SIZE)
+    args = parser.parse_args()
+
+    from database import engine
+
+    result = run(engine, args.business_date, args.chunk_size)
+    result.pop("changes")
+    print(result)
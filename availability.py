@@ -0,0 +1,170 @@
+import threading
+from datetime import date
+from typing import Dict, List, Optional, Set, Tuple
+
+import models
+from queries import live_assignments_query
+
+# Reservation statuses that hold a room for their nights
+BLOCKING_STATUSES = ("booked", "checked_in")
+
+# Room statuses that cannot be sold at all
+UNSELLABLE_STATUSES = ("maintenance",)
+
+
+class AvailabilityIndex:
+    """In-process room-night index.
+
+    Every room gets a bit position. For each night (date ordinal) we keep an
+    int bitmask of the rooms that are held by an assigned reservation, so
+    "which rooms of type X are free from check_in to check_out" is an OR over
+    the stay's nights masked with the room type - no database round trip.
+
+    Only stays with a room take a bit, so the free rooms overstate what can be
+    sold while bookings wait for assignment; ``/rooms_availability`` caps them
+    at the unsold inventory in ``daily_rollups``. The index is per process and
+    sees only the writes made through it, so with several workers the list of
+    free rooms (not its count) can lag until the next restart.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self._bit: Dict[str, int] = {}
+        self._by_bit: List[str] = []
+        self._rooms: Dict[str, dict] = {}
+        self._type_mask: Dict[str, int] = {}
+        self._unsellable_mask = 0
+        self._nights: Dict[int, int] = {}
+        # reservation_id -> (room_number, first night ordinal, check_out ordinal)
+        self._bookings: Dict[int, Tuple[str, int, int]] = {}
+        self._room_bookings: Dict[str, Set[int]] = {}
+
+    # ---------------- Build ----------------
+    def load(self, rooms, reservations):
+        with self._lock:
+            self._reset()
+            for room in rooms:
+                self._put_room(room)
+            for reservation in reservations:
+                self._put_reservation(reservation)
+
+    def load_from_db(self, db, since: Optional[date] = None):
+        rooms = db.query(models.Room).all()
+        reservations = db.execute(live_assignments_query(since or date.today())).all()
+        self.load(rooms, reservations)
+
+    # ---------------- Incremental updates ----------------
+    def upsert_room(self, room):
+        with self._lock:
+            self._put_room(room)
+
+    def upsert_reservation(self, reservation):
+        with self._lock:
+            self._drop_reservation(reservation.reservation_id)
+            self._put_reservation(reservation)
+
+    def remove_reservation(self, reservation_id: int):
+        with self._lock:
+            self._drop_reservation(reservation_id)
+
+    # ---------------- Queries ----------------
+    def free_rooms(self, room_type: str, check_in: date, check_out: Optional[date] = None) -> List[dict]:
+        start = check_in.toordinal()
+        end = check_out.toordinal() if check_out else start + 1
+        with self._lock:
+            candidates = self._type_mask.get(room_type, 0) & ~self._unsellable_mask
+            nights = self._nights
+            occupied = 0
+            for night in range(start, end):
+                occupied |= nights.get(night, 0)
+            free = candidates & ~occupied
+            rooms = self._rooms
+            return [rooms[number] for number in self._numbers(free)]
+
+    def is_free(self, room_number: str, check_in: date, check_out: date) -> bool:
+        with self._lock:
+            bit = self._bit.get(room_number)
+            if bit is None:
+                return False
+            mask = 1 << bit
+            for night in range(check_in.toordinal(), check_out.toordinal()):
+                if self._nights.get(night, 0) & mask:
+                    return False
+            return True
+
+    # ---------------- Internals (caller holds the lock) ----------------
+    def _numbers(self, mask: int):
+        by_bit = self._by_bit
+        while mask:
+            low = mask & -mask
+            yield by_bit[low.bit_length() - 1]
+            mask ^= low
+
+    def _put_room(self, room):
+        number = room.room_number
+        bit = self._bit.get(number)
+        if bit is None:
+            bit = len(self._by_bit)
+            self._bit[number] = bit
+            self._by_bit.append(number)
+            self._room_bookings.setdefault(number, set())
+        else:
+            old_type = self._rooms[number]["room_type"]
+            self._type_mask[old_type] &= ~(1 << bit)
+        self._rooms[number] = {
+            "room_number": number,
+            "room_type": room.room_type,
+            "status": room.status,
+            "room_condition": room.room_condition,
+        }
+        self._type_mask[room.room_type] = self._type_mask.get(room.room_type, 0) | (1 << bit)
+        if room.status in UNSELLABLE_STATUSES:
+            self._unsellable_mask |= 1 << bit
+        else:
+            self._unsellable_mask &= ~(1 << bit)
+
+    def _put_reservation(self, reservation):
+        if reservation.status not in BLOCKING_STATUSES or not reservation.room_number:
+            return
+        bit = self._bit.get(reservation.room_number)
+        if bit is None:
+            return
+        start, end = _ordinal(reservation.check_in), _ordinal(reservation.check_out)
+        self._bookings[reservation.reservation_id] = (reservation.room_number, start, end)
+        self._room_bookings[reservation.room_number].add(reservation.reservation_id)
+        mask = 1 << bit
+        nights = self._nights
+        for night in range(start, end):
+            nights[night] = nights.get(night, 0) | mask
+
+    def _drop_reservation(self, reservation_id: int):
+        booking = self._bookings.pop(reservation_id, None)
+        if booking is None:
+            return
+        number, start, end = booking
+        others = self._room_bookings[number]
+        others.discard(reservation_id)
+        # Another (overbooked) stay may still hold some of these nights
+        still_held = set()
+        for other_id in others:
+            _, o_start, o_end = self._bookings[other_id]
+            still_held.update(range(max(start, o_start), min(end, o_end)))
+        clear = ~(1 << self._bit[number])
+        nights = self._nights
+        for night in range(start, end):
+            if night in still_held:
+                continue
+            mask = nights.get(night, 0) & clear
+            if mask:
+                nights[night] = mask
+            else:
+                nights.pop(night, None)
+
+
+def _ordinal(value) -> int:
+    if isinstance(value, str):
+        value = date.fromisoformat(value[:10])
+    return value.toordinal()
@@ -0,0 +1,447 @@
+"""In-process benchmark for the FastAPI endpoints.
+
+Drives an app from ``main.create_app()`` through an ASGI client against a SQLite stand-in seeded by
+``master_data.seed`` and records throughput and latency percentiles per route
+and concurrency level.
+
+    python benchmark.py run --rooms 500 --days 365 --concurrency 1,8,32 --out before.json
+    python benchmark.py compare before.json after.json --threshold 0.10
+    python benchmark.py serialize --days 365
+    python benchmark.py startup --runs 5
+    python benchmark.py booking --rooms 40 --concurrency 1,8,32 --requests 400
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import platform
+import secrets
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+BENCH_TODAY = date(2025, 6, 1)
+
+
+def routes(today: date):
+    day = today.isoformat()
+    stay_end = (today + timedelta(days=3)).isoformat()
+    # Every booking gets a night of its own past the seeded stays, so bookings
+    # measure the insert path instead of selling out after the warmup
+    nights = itertools.count(3 * 365)
+
+    def booking():
+        check_in = today + timedelta(days=next(nights))
+        return {
+            "first_name": "Bench", "last_name": "Guest", "email": "bench@guest.example",
+            "phone_number": "+15550000000", "check_in": check_in.isoformat(),
+            "check_out": (check_in + timedelta(days=3)).isoformat(),
+            "total_amount": "360.00", "address": "1 Main Street", "credit_card_number": "4111111111111111",
+            "cc_expiry": "12/30", "room_type": "Double", "created_by": 1,
+        }
+
+    return {
+        "/arrivals": ("GET", "/arrivals", {"check_in_date": day}, None),
+        "/departures": ("GET", "/departures", {"check_out_date": day}, None),
+        "/inhouse/{rstatus}": ("GET", "/inhouse/checked_in", None, None),
+        "/rooms_availability/{roomtype}": ("GET", "/rooms_availability/Double", {"date": day, "check_out": stay_end}, None),
+        "/reservations/": ("POST", "/reservations/", None, booking),
+    }
+
+
+def percentile(sorted_values, pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+async def measure(client, request, total: int, concurrency: int) -> dict:
+    method, url, params, body = request
+    latencies, errors = [], 0
+    remaining = total
+
+    async def worker():
+        nonlocal remaining, errors
+        while remaining > 0:
+            remaining -= 1
+            started = time.perf_counter()
+            response = await client.request(method, url, params=params, json=body() if callable(body) else body)
+            latencies.append(time.perf_counter() - started)
+            if response.status_code >= 400:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "rps": round(len(latencies) / elapsed, 1),
+        "mean_ms": round(sum(latencies) / len(latencies) * 1000, 3),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 3),
+    }
+
+
+async def run_suite(app, selected, concurrency_levels, total: int, warmup: int, today: date) -> dict:
+    import httpx
+
+    results = {}
+    transport = httpx.ASGITransport(app=app)
+    async with app.router.lifespan_context(app):
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            for name, request in routes(today).items():
+                if selected and name not in selected:
+                    continue
+                await measure(client, request, warmup, 1)
+                results[name] = {}
+                for level in concurrency_levels:
+                    results[name][str(level)] = await measure(client, request, total, level)
+                    print(f"{name:34} c={level:<4} {results[name][str(level)]}", file=sys.stderr)
+    return results
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=os.path.dirname(os.path.abspath(__file__)),
+            stderr=subprocess.DEVNULL, text=True,
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(args) -> int:
+    db_path = args.db or os.path.join(tempfile.mkdtemp(prefix="hotel-bench-"), "bench.db")
+    # database.py reads DATABASE_URL at import, so point it at the stand-in first
+    os.environ["DATABASE_URL"] = f"sqlite:///{db_path}"
+    import master_data
+    import main
+
+    dataset = {"rooms": args.rooms, "users": args.users, "days": args.days, "seed": args.seed,
+               "today": BENCH_TODAY.isoformat()}
+    seeded = master_data.seed(rooms=args.rooms, users=args.users, days=args.days, seed=args.seed,
+                              start=BENCH_TODAY - timedelta(days=args.days // 2), today=BENCH_TODAY)
+    print(f"dataset: {seeded}", file=sys.stderr)
+
+    levels = [int(level) for level in args.concurrency.split(",")]
+    results = asyncio.run(run_suite(main.create_app(), args.route, levels, args.requests, args.warmup, BENCH_TODAY))
+    report = {
+        "meta": {
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "dataset": dataset,
+            "requests_per_level": args.requests,
+        },
+        "results": results,
+    }
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        sys.stdout.write("\n")
+    return 0
+
+
+def legacy_arrivals_body(rows) -> bytes:
+    """The pre-fast-path serialization: one ArrivalResponse per row, then response_model validation."""
+    from typing import List
+
+    from pydantic import TypeAdapter
+
+    from schemas import ArrivalResponse
+
+    models = [
+        ArrivalResponse(
+            reservation_id=r.reservation_id, first_name=r.first_name, last_name=r.last_name,
+            check_in=r.check_in, check_out=r.check_out, room_number=r.room_number,
+            room_type=r.room_type, days=(r.check_out - r.check_in).days,
+        )
+        for r in rows
+    ]
+    adapter = TypeAdapter(List[ArrivalResponse])
+    content = adapter.dump_python(adapter.validate_python(models, from_attributes=True), mode="json")
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode()
+
+
+def serialize(args) -> int:
+    db_path = args.db or os.path.join(tempfile.mkdtemp(prefix="hotel-bench-"), "bench.db")
+    os.environ["DATABASE_URL"] = f"sqlite:///{db_path}"
+    import master_data
+    from database import engine
+    from queries import inhouse_query
+    from serialization import rows_response
+
+    master_data.seed(rooms=args.rooms, users=args.users, days=args.days, seed=args.seed,
+                     start=BENCH_TODAY - timedelta(days=args.days // 2), today=BENCH_TODAY)
+    with engine.connect() as conn:
+        rows = conn.execute(inhouse_query("booked")).all()
+
+    fast, legacy = rows_response(rows).body, legacy_arrivals_body(rows)
+    if json.loads(fast) != json.loads(legacy):
+        print("fast path output differs from the response_model output", file=sys.stderr)
+        return 1
+
+    timings = {}
+    for name, fn in (("response_model", legacy_arrivals_body), ("fast_path", lambda r: rows_response(r).body)):
+        runs = []
+        for _ in range(args.repeat):
+            started = time.perf_counter()
+            fn(rows)
+            runs.append(time.perf_counter() - started)
+        runs.sort()
+        timings[name] = {"p50_ms": round(percentile(runs, 50) * 1000, 3), "min_ms": round(runs[0] * 1000, 3)}
+    report = {"rows": len(rows), "timings": timings,
+              "speedup": round(timings["response_model"]["p50_ms"] / timings["fast_path"]["p50_ms"], 1)}
+    json.dump(report, sys.stdout, indent=2)
+    sys.stdout.write("\n")
+    return 0
+
+
+def startup_probe():
+    """Runs in a fresh interpreter: time importing main, app startup and the first request."""
+    started = time.perf_counter()
+    import main
+    imported = time.perf_counter()
+
+    async def serve():
+        import httpx
+
+        app = main.create_app()
+        async with app.router.lifespan_context(app):
+            ready = time.perf_counter()
+            async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+                response = await client.get("/rooms/")
+            return ready, response.status_code
+
+    ready, status = asyncio.run(serve())
+    done = time.perf_counter()
+    json.dump({"import_ms": (imported - started) * 1000, "startup_ms": (ready - imported) * 1000,
+               "first_request_ms": (done - ready) * 1000, "status": status}, sys.stdout)
+
+
+def startup(args) -> int:
+    db_path = args.db or os.path.join(tempfile.mkdtemp(prefix="hotel-bench-"), "bench.db")
+    env = dict(os.environ, DATABASE_URL=f"sqlite:///{db_path}")
+    os.environ["DATABASE_URL"] = env["DATABASE_URL"]
+    import master_data
+
+    master_data.seed(rooms=args.rooms, users=args.users, days=args.days, seed=args.seed,
+                     start=BENCH_TODAY - timedelta(days=args.days // 2), today=BENCH_TODAY)
+
+    runs = {"process_ms": [], "import_ms": [], "startup_ms": [], "first_request_ms": []}
+    for _ in range(args.runs):
+        started = time.perf_counter()
+        output = subprocess.check_output(
+            [sys.executable, "-c", "import benchmark; benchmark.startup_probe()"],
+            cwd=os.path.dirname(os.path.abspath(__file__)), env=env, text=True,
+        )
+        runs["process_ms"].append((time.perf_counter() - started) * 1000)
+        probe = json.loads(output)
+        if probe["status"] != 200:
+            print(f"first request returned {probe['status']}", file=sys.stderr)
+            return 1
+        for phase in ("import_ms", "startup_ms", "first_request_ms"):
+            runs[phase].append(probe[phase])
+
+    report = {}
+    for phase, values in runs.items():
+        values.sort()
+        report[phase] = {"p50": round(percentile(values, 50), 1), "max": round(values[-1], 1)}
+    json.dump({"runs": args.runs, "timings": report}, sys.stdout, indent=2)
+    sys.stdout.write("\n")
+    return 0
+
+
+def booking_body(rng, first_night: date, window: int) -> dict:
+    import master_data
+
+    check_in = first_night + timedelta(days=rng.randrange(window))
+    nights = rng.choice((1, 1, 2, 3))
+    return {
+        "first_name": "Stress", "last_name": "Guest", "email": "stress@guest.example",
+        "phone_number": "+15550000000", "check_in": check_in.isoformat(),
+        "check_out": (check_in + timedelta(days=nights)).isoformat(), "total_amount": "100.00",
+        "address": "1 Main Street", "credit_card_number": "4111111111111111", "cc_expiry": "12/30",
+        "room_type": rng.choice(master_data.ROOM_TYPES), "created_by": 1,
+    }
+
+
+def overbooked_nights(conn, date_from: date, date_to: date) -> list:
+    """(night, room_type, sold, capacity) for nights with more stays than sellable rooms."""
+    from sqlalchemy import select
+
+    import inventory
+    import models
+    import rollups
+
+    res = models.Reservations
+    stays = conn.execute(select(res.room_type, res.check_in, res.check_out).where(
+        res.status.in_(rollups.SOLD_STATUSES), res.check_in < date_to, res.check_out > date_from)).all()
+    sold = {}
+    for room_type, check_in, check_out in stays:
+        for n in range((check_out - check_in).days):
+            night = check_in + timedelta(days=n)
+            sold[(night, room_type)] = sold.get((night, room_type), 0) + 1
+    capacity = {room_type: conn.execute(inventory.capacity_query(room_type)).scalar()
+                for room_type in {room_type for _, room_type in sold}}
+    return [(night, room_type, count, capacity[room_type])
+            for (night, room_type), count in sorted(sold.items()) if count > capacity[room_type]]
+
+
+async def booking_storm(app, levels, total: int, window: int, seed: int) -> dict:
+    import random
+
+    import httpx
+
+    rng = random.Random(seed)
+    results = {}
+    async with app.router.lifespan_context(app):
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+            for i, level in enumerate(levels):
+                # Each level books its own date window, so every level starts with full inventory
+                first_night = BENCH_TODAY + timedelta(days=30 * (i + 1))
+                bodies = [booking_body(rng, first_night, window) for _ in range(total)]
+                counts = {"booked": 0, "sold_out": 0, "errors": 0}
+                latencies = []
+
+                async def worker():
+                    while bodies:
+                        body = bodies.pop()
+                        started = time.perf_counter()
+                        response = await client.post("/reservations/", json=body)
+                        latencies.append(time.perf_counter() - started)
+                        if response.status_code == 200:
+                            counts["booked"] += 1
+                        elif response.status_code == 400:
+                            counts["sold_out"] += 1
+                        else:
+                            counts["errors"] += 1
+
+                started = time.perf_counter()
+                await asyncio.gather(*(worker() for _ in range(level)))
+                elapsed = time.perf_counter() - started
+                latencies.sort()
+                results[str(level)] = {
+                    **counts, "window": [first_night.isoformat(), (first_night + timedelta(days=window + 3)).isoformat()],
+                    "rps": round(total / elapsed, 1), "p95_ms": round(percentile(latencies, 95) * 1000, 3),
+                }
+                print(f"booking c={level:<4} {results[str(level)]}", file=sys.stderr)
+    return results
+
+
+def booking(args) -> int:
+    if args.database_url:
+        os.environ["DATABASE_URL"] = args.database_url
+    else:
+        db_path = os.path.join(tempfile.mkdtemp(prefix="hotel-bench-"), "bench.db")
+        os.environ["DATABASE_URL"] = f"sqlite:///{db_path}"
+    import master_data
+    import main
+    from database import engine
+
+    master_data.seed(rooms=args.rooms, users=args.users, days=0, seed=args.seed, today=BENCH_TODAY)
+    levels = [int(level) for level in args.concurrency.split(",")]
+    results = asyncio.run(booking_storm(main.create_app(), levels, args.requests, args.window, args.seed))
+
+    failures = 0
+    with engine.connect() as conn:
+        for level, result in results.items():
+            window = [date.fromisoformat(day) for day in result["window"]]
+            result["overbooked_nights"] = len(overbooked_nights(conn, *window))
+            failures += result["overbooked_nights"] + result["errors"]
+    json.dump({"rooms": args.rooms, "requests_per_level": args.requests, "results": results}, sys.stdout, indent=2)
+    sys.stdout.write("\n")
+    return 1 if failures else 0
+
+
+def compare(args) -> int:
+    with open(args.baseline) as f:
+        baseline = json.load(f)["results"]
+    with open(args.candidate) as f:
+        candidate = json.load(f)["results"]
+
+    regressions = 0
+    for route, levels in candidate.items():
+        for level, new in levels.items():
+            old = baseline.get(route, {}).get(level)
+            if not old:
+                continue
+            flags = []
+            if new["p95_ms"] > old["p95_ms"] * (1 + args.threshold):
+                flags.append("p95")
+            if new["rps"] < old["rps"] * (1 - args.threshold):
+                flags.append("rps")
+            regressions += bool(flags)
+            print(f"{route:34} c={level:<4} p95 {old['p95_ms']:>9.3f} -> {new['p95_ms']:>9.3f} ms   "
+                  f"rps {old['rps']:>9.1f} -> {new['rps']:>9.1f}   {'REGRESSION ' + ','.join(flags) if flags else 'ok'}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the hotel API in-process")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="run the benchmark and write a JSON report")
+    run_parser.add_argument("--rooms", type=int, default=200)
+    run_parser.add_argument("--users", type=int, default=20)
+    run_parser.add_argument("--days", type=int, default=365)
+    run_parser.add_argument("--seed", type=int, default=42)
+    run_parser.add_argument("--db", help="SQLite file to seed and reuse (default: a fresh temp file)")
+    run_parser.add_argument("--concurrency", default="1,8,32", help="comma separated concurrency levels")
+    run_parser.add_argument("--requests", type=int, default=200, help="requests per route and level")
+    run_parser.add_argument("--warmup", type=int, default=10)
+    run_parser.add_argument("--route", action="append", help="only benchmark this route (repeatable)")
+    run_parser.add_argument("--out", help="write the JSON report here instead of stdout")
+    run_parser.set_defaults(func=run)
+
+    serialize_parser = commands.add_parser(
+        "serialize", help="compare the fast list serializer with per-row Pydantic + response_model")
+    serialize_parser.add_argument("--rooms", type=int, default=200)
+    serialize_parser.add_argument("--users", type=int, default=20)
+    serialize_parser.add_argument("--days", type=int, default=365)
+    serialize_parser.add_argument("--seed", type=int, default=42)
+    serialize_parser.add_argument("--db", help="SQLite file to seed and reuse (default: a fresh temp file)")
+    serialize_parser.add_argument("--repeat", type=int, default=20)
+    serialize_parser.set_defaults(func=serialize)
+
+    startup_parser = commands.add_parser(
+        "startup", help="time a cold worker: importing main, app startup and the first request")
+    startup_parser.add_argument("--rooms", type=int, default=200)
+    startup_parser.add_argument("--users", type=int, default=20)
+    startup_parser.add_argument("--days", type=int, default=365)
+    startup_parser.add_argument("--seed", type=int, default=42)
+    startup_parser.add_argument("--db", help="SQLite file to seed and reuse (default: a fresh temp file)")
+    startup_parser.add_argument("--runs", type=int, default=5, help="fresh processes to start")
+    startup_parser.set_defaults(func=startup)
+
+    booking_parser = commands.add_parser(
+        "booking", help="concurrent bookings against scarce inventory; fails on any overbooked night")
+    booking_parser.add_argument("--rooms", type=int, default=40)
+    booking_parser.add_argument("--users", type=int, default=5)
+    booking_parser.add_argument("--seed", type=int, default=42)
+    booking_parser.add_argument("--concurrency", default="1,8,32", help="comma separated concurrency levels")
+    booking_parser.add_argument("--requests", type=int, default=400, help="bookings per level")
+    booking_parser.add_argument("--window", type=int, default=5, help="arrival dates per level (smaller = more contention)")
+    booking_parser.add_argument("--database-url", help="run against this database instead of a temp SQLite file")
+    booking_parser.set_defaults(func=booking)
+
+    compare_parser = commands.add_parser("compare", help="flag regressions between two reports")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("candidate")
+    compare_parser.add_argument("--threshold", type=float, default=0.10,
+                                help="allowed relative slowdown before a route is flagged")
+    compare_parser.set_defaults(func=compare)
+
+    args = parser.parse_args()
+    # The app refuses to start without a signing key; a throwaway one is fine here
+    os.environ.setdefault("SESSION_SECRET", secrets.token_hex(32))
+    sys.exit(args.func(args))
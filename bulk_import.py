@@ -0,0 +1,227 @@
+"""Streaming NDJSON reservation import.
+
+Each line is one ``schemas.CreateReservation`` object. Lines are validated in
+batches and inserted with a single executemany per batch, one transaction per
+batch, so a bad line only costs itself and a failed batch only costs its rows.
+A booking whose nights are already sold out is reported like a bad line
+(``inventory.split_sellable``) instead of overselling the room type.
+
+    python bulk_import.py reservations.jsonl --batch-size 5000 --workers 4
+
+Validation (mostly e-mail checks) is the expensive part, so the CLI can fan
+batches out to worker processes while the main process keeps inserting.
+"""
+import argparse
+import json
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from typing import AsyncIterator, Iterable, Iterator, List, Tuple
+
+from pydantic import ValidationError
+from sqlalchemy import insert, select
+from sqlalchemy.exc import SQLAlchemyError
+from starlette.concurrency import run_in_threadpool
+
+import inventory
+import models
+import rollups
+import schemas
+
+DEFAULT_BATCH_SIZE = 2000
+# Per-line errors kept in the report; the counts stay exact beyond this
+MAX_REPORTED_ERRORS = 1000
+
+reservations_table = models.Reservations.__table__
+
+
+class ImportReport:
+    def __init__(self):
+        self.inserted = 0
+        self.failed = 0
+        self.errors: List[dict] = []
+        self.started = time.perf_counter()
+
+    def error(self, line_no: int, message):
+        self.failed += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({"line": line_no, "error": message})
+
+    def add(self, validated) -> Tuple[List[int], List[dict]]:
+        line_nos, rows, errors = validated
+        for line_no, message in errors:
+            self.error(line_no, message)
+        return line_nos, rows
+
+    def sellable(self, line_nos: List[int], rows: List[dict], kept: List[int], sold_out) -> Tuple[List[int], List[dict]]:
+        for i, message in sold_out:
+            self.error(line_nos[i], message)
+        return [line_nos[i] for i in kept], [rows[i] for i in kept]
+
+    def insert_failed(self, line_nos: List[int], exc: SQLAlchemyError):
+        message = str(getattr(exc, "orig", None) or exc)
+        for line_no in line_nos:
+            self.error(line_no, message)
+
+    def as_dict(self) -> dict:
+        elapsed = time.perf_counter() - self.started
+        return {
+            "inserted": self.inserted,
+            "failed": self.failed,
+            "seconds": round(elapsed, 3),
+            "rows_per_second": round(self.inserted / elapsed) if elapsed else 0,
+            "errors": self.errors,
+        }
+
+
+def batched(lines: Iterable[Tuple[int, bytes]], size: int) -> Iterator[List[Tuple[int, bytes]]]:
+    batch = []
+    for item in lines:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def numbered(lines: Iterable) -> Iterator[Tuple[int, bytes]]:
+    for line_no, line in enumerate(lines, start=1):
+        if line.strip():
+            yield line_no, line
+
+
+async def numbered_stream(chunks: AsyncIterator[bytes]) -> AsyncIterator[Tuple[int, bytes]]:
+    """Split a streamed request body into numbered, non-blank lines."""
+    line_no = 0
+    pending = b""
+    async for chunk in chunks:
+        pending += chunk
+        *lines, pending = pending.split(b"\n")
+        for line in lines:
+            line_no += 1
+            if line.strip():
+                yield line_no, line
+    if pending.strip():
+        yield line_no + 1, pending
+
+
+def validate_batch(room_types, user_ids, batch):
+    line_nos, rows, errors = [], [], []
+    for line_no, raw in batch:
+        try:
+            reservation = schemas.CreateReservation.model_validate_json(raw)
+        except ValidationError as exc:
+            errors.append((line_no, "; ".join(
+                f"{'.'.join(str(part) for part in err['loc']) or 'line'}: {err['msg']}" for err in exc.errors()
+            )))
+            continue
+        if reservation.room_type not in room_types:
+            errors.append((line_no, f"Unknown room_type {reservation.room_type!r}"))
+            continue
+        if reservation.created_by not in user_ids:
+            errors.append((line_no, f"Unknown created_by user {reservation.created_by}"))
+            continue
+        row = reservation.model_dump()
+        # Same as POST /reservations/: rooms are assigned later
+        row["room_number"] = None
+        line_nos.append(line_no)
+        rows.append(row)
+    return line_nos, rows, errors
+
+
+def _reference_queries():
+    return select(models.Room.room_type).distinct(), select(models.User.user_id)
+
+
+# ---------------- Sync (CLI) ----------------
+def import_lines(engine, lines: Iterable, batch_size: int = DEFAULT_BATCH_SIZE, workers: int = 0) -> dict:
+    report = ImportReport()
+    room_types_q, user_ids_q = _reference_queries()
+    with engine.connect() as conn:
+        room_types = set(conn.execute(room_types_q).scalars())
+        user_ids = set(conn.execute(user_ids_q).scalars())
+    validate = partial(validate_batch, room_types, user_ids)
+    batches = batched(numbered(lines), batch_size)
+
+    pool = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+    try:
+        validated = pool.map(validate, batches) if pool else map(validate, batches)
+        for result in validated:
+            line_nos, rows = report.add(result)
+            if not rows:
+                continue
+            try:
+                with engine.begin() as conn:
+                    kept, sold_out = inventory.split_sellable(conn, rows)
+                    line_nos, rows = report.sellable(line_nos, rows, kept, sold_out)
+                    if rows:
+                        conn.execute(insert(reservations_table), rows)
+                        rollups.apply(conn, rollups.combined(rows))
+                report.inserted += len(rows)
+            except SQLAlchemyError as exc:
+                report.insert_failed(line_nos, exc)
+    finally:
+        if pool:
+            pool.shutdown()
+    return report.as_dict()
+
+
+# ---------------- Async (POST /reservations/bulk) ----------------
+async def import_stream(async_engine, lines: AsyncIterator[Tuple[int, bytes]],
+                        batch_size: int = DEFAULT_BATCH_SIZE) -> dict:
+    report = ImportReport()
+    room_types_q, user_ids_q = _reference_queries()
+    async with async_engine.connect() as conn:
+        room_types = set((await conn.execute(room_types_q)).scalars())
+        user_ids = set((await conn.execute(user_ids_q)).scalars())
+
+    async def flush(batch):
+        # Validation is CPU work; keep it off the event loop
+        line_nos, rows = report.add(await run_in_threadpool(validate_batch, room_types, user_ids, batch))
+        if not rows:
+            return
+        try:
+            async with async_engine.begin() as conn:
+                kept, sold_out = await inventory.split_sellable_async(conn, rows)
+                line_nos, rows = report.sellable(line_nos, rows, kept, sold_out)
+                if rows:
+                    await conn.execute(insert(reservations_table), rows)
+                    await rollups.apply_async(conn, rollups.combined(rows))
+            report.inserted += len(rows)
+        except SQLAlchemyError as exc:
+            report.insert_failed(line_nos, exc)
+
+    batch = []
+    async for item in lines:
+        batch.append(item)
+        if len(batch) >= batch_size:
+            await flush(batch)
+            batch = []
+    if batch:
+        await flush(batch)
+    return report.as_dict()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Bulk import reservations from an NDJSON file")
+    parser.add_argument("path", help="NDJSON file, or - for stdin")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument("--workers", type=int, default=0, help="validation processes (0 = validate inline)")
+    args = parser.parse_args(argv)
+
+    from database import engine
+
+    if args.path == "-":
+        report = import_lines(engine, sys.stdin.buffer, args.batch_size, args.workers)
+    else:
+        with open(args.path, "rb") as f:
+            report = import_lines(engine, f, args.batch_size, args.workers)
+    json.dump(report, sys.stdout, indent=2, default=str)
+    sys.stdout.write("\n")
+    return 1 if report["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
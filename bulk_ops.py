@@ -0,0 +1,84 @@
+"""Set-based bulk status changes for rooms and reservations.
+
+Every operation is one ``UPDATE ... WHERE key IN (...)`` inside the caller's
+transaction. On dialects with ``UPDATE ... RETURNING`` (SQLite, PostgreSQL,
+MariaDB) the changed rows come back from the same statement; on MySQL they
+are read back with one ``SELECT`` in the same transaction. Keys that did not
+change are looked up once to explain why, so each request gets a per-item
+result list.
+"""
+from typing import Dict, List
+
+from sqlalchemy import case, select, update
+
+import conditional
+import models
+
+rooms_table = models.Room.__table__
+reservations_table = models.Reservations.__table__
+
+ROOM_COLUMNS = (rooms_table.c.room_number, rooms_table.c.room_type, rooms_table.c.status,
+                rooms_table.c.room_condition)
+RESERVATION_COLUMNS = (reservations_table.c.reservation_id, reservations_table.c.room_number,
+                       reservations_table.c.room_type, reservations_table.c.check_in,
+                       reservations_table.c.check_out, reservations_table.c.status)
+
+# Group front-desk moves: target status -> status the stay must be in (the target itself is a no-op)
+TRANSITIONS = {
+    "checked_in": "booked",
+    "checked_out": "checked_in",
+}
+# What a departure does to its room, at the desk or in the night audit: dirty, and vacant if it was occupied
+VACATED_ROOM_VALUES = {
+    "room_condition": "dirty",
+    "status": case((rooms_table.c.status == "occupied", "vacant"), else_=rooms_table.c.status),
+}
+
+
+async def _update_returning(db, stmt, columns, *changed) -> list:
+    """Run `stmt` and return `columns` of the rows it changed (`changed` re-selects them without RETURNING)."""
+    if db.bind.dialect.update_returning:
+        return (await db.execute(stmt.returning(*columns))).all()
+    await db.execute(stmt)
+    return (await db.execute(select(*columns).where(*changed))).all()
+
+
+async def update_rooms(db, room_numbers: List[str], values: Dict[str, str]) -> list:
+    """Apply `values` to every listed room; returns the updated room rows."""
+    keys = list(dict.fromkeys(room_numbers))
+    stmt = update(rooms_table).where(rooms_table.c.room_number.in_(keys)).values(**values)
+    rows = await _update_returning(db, stmt, ROOM_COLUMNS, rooms_table.c.room_number.in_(keys))
+    await conditional.bump(db, "rooms")
+    return rows
+
+
+async def vacate_rooms(db, reservation_ids: List[int]) -> list:
+    """Apply VACATED_ROOM_VALUES to the rooms of the listed stays still ``checked_in``; returns the room rows.
+
+    Run it before moving the stays to ``checked_out``, so a repeated checkout leaves cleaned rooms alone.
+    """
+    stmt = select(reservations_table.c.room_number).where(
+        reservations_table.c.reservation_id.in_(list(dict.fromkeys(reservation_ids))),
+        reservations_table.c.status == "checked_in", reservations_table.c.room_number.is_not(None))
+    numbers = sorted(set((await db.execute(stmt)).scalars()))
+    return await update_rooms(db, numbers, VACATED_ROOM_VALUES) if numbers else []
+
+
+async def transition_reservations(db, reservation_ids: List[int], target: str):
+    """Move reservations to `target`; returns (changed rows, {reservation_id: error})."""
+    keys = list(dict.fromkeys(reservation_ids))
+    in_keys = reservations_table.c.reservation_id.in_(keys)
+    stmt = update(reservations_table).where(
+        in_keys, reservations_table.c.status.in_((TRANSITIONS[target], target))
+    ).values(status=target)
+    rows = await _update_returning(db, stmt, RESERVATION_COLUMNS, in_keys, reservations_table.c.status == target)
+
+    changed = {row.reservation_id for row in rows}
+    missed = [key for key in keys if key not in changed]
+    errors = {key: "Reservation not found" for key in missed}
+    if missed:
+        current = select(reservations_table.c.reservation_id, reservations_table.c.status).where(
+            reservations_table.c.reservation_id.in_(missed))
+        for reservation_id, status in (await db.execute(current)).all():
+            errors[reservation_id] = f"Status is {status!r}, expected {TRANSITIONS[target]!r}"
+    return rows, errors
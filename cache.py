@@ -0,0 +1,157 @@
+"""Read-through entity cache for rooms and reservations.
+
+Entries are JSON-safe values keyed ``<namespace>:<key>`` (``room:101``,
+``reservation:42``, ``rooms:all``). Handlers read through ``EntityCache.get``
+and the write paths call ``invalidate`` after their commit; the TTL bounds
+how long a write made elsewhere (another worker, a script) can go unseen.
+
+Two backends:
+
+* ``MemoryBackend`` (default) - per-process LRU with a TTL. Each API worker
+  keeps its own copy, so other workers see a write only after the TTL.
+* ``SharedBackend`` - any asyncio Redis-style client (awaitable
+  ``get``/``set(ex=)``/``delete``), shared by all workers. ``CACHE_BACKEND=redis``
+  builds one from ``CACHE_URL`` with the optional ``redis`` package
+  (``redis.asyncio``, so a round trip never blocks the event loop); tests can
+  pass a local stand-in client instead.
+
+Callers keep card data out of cached values: ``GET /reservation/`` caches
+the reservation without ``credit_card_number`` / ``cc_expiry`` and reads those
+from the database on every request.
+
+Backend methods are coroutines either way, so handlers ``await`` the cache
+the same whichever backend is configured.
+
+    CACHE_BACKEND=memory CACHE_MAX_ENTRIES=10000 CACHE_TTL=300
+"""
+import os
+import threading
+import time
+from collections import Counter, OrderedDict
+from typing import Awaitable, Callable, Optional
+
+import orjson
+
+from serialization import dumps
+
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "memory")
+CACHE_URL = os.getenv("CACHE_URL", "redis://localhost:6379/0")
+CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", "10000"))
+CACHE_TTL = float(os.getenv("CACHE_TTL", "300"))
+
+_MISSING = object()
+
+
+class MemoryBackend:
+    def __init__(self, max_entries: int = CACHE_MAX_ENTRIES, ttl: float = CACHE_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.evictions = 0
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    async def get(self, key: str):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return _MISSING
+            expires, value = entry
+            if expires < time.monotonic():
+                del self._entries[key]
+                return _MISSING
+            self._entries.move_to_end(key)
+            return value
+
+    async def set(self, key: str, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    async def delete(self, *keys: str):
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+
+    async def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def status(self) -> dict:
+        return {"backend": "memory", "entries": len(self._entries), "max_entries": self.max_entries,
+                "ttl": self.ttl, "evictions": self.evictions}
+
+
+class SharedBackend:
+    """Values are stored as JSON under `prefix`; expiry and eviction are left to the server."""
+
+    def __init__(self, client, ttl: float = CACHE_TTL, prefix: str = "hotel:"):
+        self.client = client
+        self.ttl = ttl
+        self.prefix = prefix
+
+    async def get(self, key: str):
+        raw = await self.client.get(self.prefix + key)
+        return _MISSING if raw is None else orjson.loads(raw)
+
+    async def set(self, key: str, value):
+        await self.client.set(self.prefix + key, dumps(value), ex=max(1, int(self.ttl)))
+
+    async def delete(self, *keys: str):
+        if keys:
+            await self.client.delete(*(self.prefix + key for key in keys))
+
+    async def clear(self):
+        async for key in self.client.scan_iter(self.prefix + "*"):
+            await self.client.delete(key)
+
+    def status(self) -> dict:
+        return {"backend": "shared", "ttl": self.ttl, "prefix": self.prefix}
+
+
+class EntityCache:
+    def __init__(self, backend=None):
+        self.backend = backend or MemoryBackend()
+        self.hits = Counter()
+        self.misses = Counter()
+
+    async def get(self, namespace: str, key, load: Callable[[], Awaitable[Optional[dict]]]):
+        """Cached value, or `await load()` stored on the way out. A None result is not cached."""
+        cache_key = f"{namespace}:{key}"
+        value = await self.backend.get(cache_key)
+        if value is not _MISSING:
+            self.hits[namespace] += 1
+            return value
+        self.misses[namespace] += 1
+        value = await load()
+        if value is not None:
+            await self.backend.set(cache_key, value)
+        return value
+
+    async def invalidate(self, namespace: str, *keys):
+        await self.backend.delete(*(f"{namespace}:{key}" for key in keys))
+
+    def status(self) -> dict:
+        hits, misses = sum(self.hits.values()), sum(self.misses.values())
+        return {
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": round(hits / (hits + misses), 4) if hits + misses else 0.0,
+            "by_namespace": {
+                namespace: {"hits": self.hits[namespace], "misses": self.misses[namespace]}
+                for namespace in sorted(set(self.hits) | set(self.misses))
+            },
+            **self.backend.status(),
+        }
+
+
+def make_backend(name: str = CACHE_BACKEND):
+    if name == "memory":
+        return MemoryBackend()
+    if name == "redis":
+        import redis.asyncio  # optional dependency, only needed for the shared backend
+
+        return SharedBackend(redis.asyncio.Redis.from_url(CACHE_URL))
+    raise ValueError(f"Unknown CACHE_BACKEND {name!r}")
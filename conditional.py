@@ -0,0 +1,97 @@
+"""Conditional GET helpers (ETag / Last-Modified / 304).
+
+Single rows are validated by a digest of their JSON representation (the
+entity cache copy, so a revalidation that hits the cache costs no database
+read). ``updated_at`` only feeds ``Last-Modified``: ``func.now()`` has
+whole-second precision on MySQL DATETIME and SQLite, so two writes in the
+same second would share a timestamp. List endpoints are validated by a
+per-table change counter in ``change_counters`` that every write to the
+table bumps in its own transaction, so a poll that finds nothing new costs
+one primary-key read and no row materialization or serialization.
+"""
+import hashlib
+from datetime import datetime, timezone
+from email.utils import format_datetime
+from typing import Optional, Tuple
+
+from fastapi import Request, Response
+from sqlalchemy import insert, select, update
+
+import models
+from serialization import dumps
+
+counters = models.ChangeCounter.__table__
+
+# Clients may reuse a response but must revalidate it first
+CACHE_CONTROL = "no-cache"
+
+
+def _utc(value) -> Optional[datetime]:
+    """Timestamps from the row or from a cached JSON copy, as aware UTC datetimes."""
+    if not value:
+        return None
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    if value.tzinfo is None:
+        # SQLite and MySQL DATETIME come back naive; func.now() stores UTC on both
+        value = value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
+
+
+def http_date(value) -> Optional[str]:
+    value = _utc(value)
+    return format_datetime(value, usegmt=True) if value else None
+
+
+def row_validators(kind: str, key, row: dict) -> Tuple[str, Optional[datetime]]:
+    """ETag from the row's JSON, Last-Modified from ``updated_at`` (``created_at`` until the first update)."""
+    digest = hashlib.blake2b(dumps(row), digest_size=12).hexdigest()
+    return f'W/"{kind}-{key}-{digest}"', _utc(row.get("updated_at")) or _utc(row.get("created_at"))
+
+
+def list_validators(name: str, version: int, changed_at, *params) -> Tuple[str, Optional[datetime]]:
+    suffix = "".join(f"-{param}" for param in params if param is not None)
+    return f'W/"{name}-v{version}{suffix}"', changed_at
+
+
+def headers(etag: str, last_modified=None) -> dict:
+    result = {"ETag": etag, "Cache-Control": CACHE_CONTROL}
+    if last_modified:
+        result["Last-Modified"] = http_date(last_modified)
+    return result
+
+
+def matches(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    # Weak comparison (RFC 9110 13.1.2): ignore the W/ prefix on both sides
+    wanted = etag.removeprefix("W/")
+    return any(tag.strip().removeprefix("W/") == wanted for tag in header.split(","))
+
+
+def not_modified(etag: str, last_modified=None) -> Response:
+    return Response(status_code=304, headers=headers(etag, last_modified))
+
+
+# ---------------- Change counters ----------------
+async def version(db, name: str) -> Tuple[int, Optional[datetime]]:
+    row = (await db.execute(select(counters.c.version, counters.c.changed_at).where(counters.c.name == name))).first()
+    return (row.version, row.changed_at) if row else (0, None)
+
+
+def _bump_statement(name: str):
+    return update(counters).where(counters.c.name == name).values(version=counters.c.version + 1)
+
+
+async def bump(db, name: str):
+    """Count a write to `name` inside the caller's transaction."""
+    if (await db.execute(_bump_statement(name))).rowcount == 0:
+        await db.execute(insert(counters).values(name=name, version=1))
+
+
+def bump_sync(conn, name: str):
+    if conn.execute(_bump_statement(name)).rowcount == 0:
+        conn.execute(insert(counters).values(name=name, version=1))
@@ -0,0 +1,246 @@
+"""Room and reservation change events, streamed to screens as server-sent events.
+
+Write paths publish a snapshot of each changed row after their commit. Events
+sit in a fixed-size ring buffer, and every ``GET /events`` connection reads
+from it at its own pace: there is no per-client queue, so a slow client costs
+nothing until it falls out of the buffer. It then gets a ``reset`` event and
+refetches its snapshot.
+
+Event ids are ``<process epoch>-<sequence>``. A client reconnecting with a
+``Last-Event-ID`` still in the buffer resumes after it. An id from before a
+restart (another epoch) or one that has been overwritten gets ``reset``.
+
+Each worker has its own buffer. With ``EVENT_RELAY=redis`` every worker also
+sends its events to a Redis pub/sub channel and appends the other workers'
+events to its buffer, so every stream sees every write. Ids stay per worker,
+so a client that reconnects to another worker gets ``reset``, and so does
+every stream on a worker whose subscription dropped, since it may have missed
+events in between. With the default ``EVENT_RELAY=local`` a stream sees only
+the writes made through its own worker.
+
+    EVENT_BUFFER=10000  EVENT_RELAY=local  EVENT_RELAY_URL=redis://localhost:6379/0
+"""
+import asyncio
+import logging
+import os
+import secrets
+import time
+from collections import deque
+from itertools import islice
+from typing import AsyncIterator, Iterable, List, Optional
+
+import orjson
+
+from serialization import dumps
+
+logger = logging.getLogger("hotel.events")
+
+EVENT_BUFFER = int(os.getenv("EVENT_BUFFER", "10000"))
+EVENT_RELAY = os.getenv("EVENT_RELAY", "local")
+EVENT_RELAY_URL = os.getenv("EVENT_RELAY_URL", "redis://localhost:6379/0")
+EVENT_CHANNEL = "hotel:events"
+RELAY_RETRY_SECONDS = 1.0
+KEEPALIVE_SECONDS = 15
+# Client reconnect delay (ms) sent in the stream
+RETRY_MS = 3000
+
+TOPICS = ("room", "reservation")
+ROOM_FIELDS = ("room_number", "room_type", "status", "room_condition")
+RESERVATION_FIELDS = ("reservation_id", "first_name", "last_name", "check_in", "check_out",
+                      "status", "room_type", "room_number")
+
+
+def _snapshot(row, fields) -> dict:
+    # Rows from bulk statements carry only some columns; send what is there
+    return {name: getattr(row, name) for name in fields if hasattr(row, name)}
+
+
+class EventFilter:
+    """Per-connection filter; an empty criterion matches everything. ``reset`` always passes."""
+
+    def __init__(self, topics: Optional[List[str]] = None, room_types: Optional[List[str]] = None,
+                 room_numbers: Optional[List[str]] = None, statuses: Optional[List[str]] = None):
+        self.topics = set(topics or TOPICS)
+        self.criteria = [(field, set(values)) for field, values in (
+            ("room_type", room_types), ("room_number", room_numbers), ("status", statuses)) if values]
+
+    def matches(self, topic: str, data: dict) -> bool:
+        if topic == "reset":
+            return True
+        return topic in self.topics and all(data.get(field) in values for field, values in self.criteria)
+
+
+class RedisRelay:
+    """Pub/sub over any asyncio Redis-style client (``publish``, ``pubsub()``)."""
+
+    def __init__(self, client, channel: str = EVENT_CHANNEL):
+        self.client = client
+        self.channel = channel
+
+    async def send(self, message: bytes):
+        await self.client.publish(self.channel, message)
+
+    async def subscribe(self) -> AsyncIterator[bytes]:
+        """Subscribe now; the returned iterator yields the messages published from then on."""
+        pubsub = self.client.pubsub()
+        await pubsub.subscribe(self.channel)
+        return self._messages(pubsub)
+
+    async def _messages(self, pubsub):
+        try:
+            async for message in pubsub.listen():
+                if message["type"] == "message":
+                    yield message["data"]
+        finally:
+            await pubsub.reset()
+
+
+def make_relay(name: str = EVENT_RELAY) -> Optional[RedisRelay]:
+    if name == "local":
+        return None
+    if name == "redis":
+        import redis.asyncio  # optional dependency, only needed to relay between workers
+
+        return RedisRelay(redis.asyncio.Redis.from_url(EVENT_RELAY_URL))
+    raise ValueError(f"Unknown EVENT_RELAY {name!r}")
+
+
+class EventBus:
+    def __init__(self, size: int = EVENT_BUFFER):
+        self.epoch = format(int(time.time() * 1000), "x")
+        # Tells this worker's relayed events apart from the others'
+        self.origin = secrets.token_hex(8)
+        self._events = deque(maxlen=size)
+        self._seq = 0
+        self._wakeup = asyncio.Event()
+        self._outbox: Optional[asyncio.Queue] = None
+        self._outbox_overflow = False
+        self._relay_state = "local"
+
+    def _id(self, seq: int) -> str:
+        return f"{self.epoch}-{seq}"
+
+    def publish(self, topic: str, data: dict):
+        """Append an event and wake every waiting stream (call on the event loop, after commit)."""
+        self._append(topic, data)
+        if self._outbox is not None:
+            try:
+                self._outbox.put_nowait((topic, data))
+            except asyncio.QueueFull:
+                # The other workers miss this one; _send_loop tells them to reset
+                self._outbox_overflow = True
+
+    def _append(self, topic: str, data: dict):
+        self._seq += 1
+        frame = f"id: {self._id(self._seq)}\nevent: {topic}\ndata: ".encode() + dumps(data) + b"\n\n"
+        self._events.append((self._seq, topic, data, frame))
+        # Streams wait on the current Event; swap in a fresh one so the next publish wakes them again
+        wakeup, self._wakeup = self._wakeup, asyncio.Event()
+        wakeup.set()
+
+    def publish_rooms(self, rooms: Iterable):
+        for room in rooms:
+            self.publish("room", _snapshot(room, ROOM_FIELDS))
+
+    def publish_reservations(self, reservations: Iterable):
+        for reservation in reservations:
+            self.publish("reservation", _snapshot(reservation, RESERVATION_FIELDS))
+
+    def reset(self, reason: str):
+        """Tell every client to refetch its snapshot (for changes too large to send one by one)."""
+        self.publish("reset", {"reason": reason})
+
+    async def relay(self, relay: RedisRelay, retry_seconds: float = RELAY_RETRY_SECONDS):
+        """Exchange events with the other workers through `relay` until cancelled."""
+        self._outbox = asyncio.Queue(maxsize=self._events.maxlen)
+        try:
+            await asyncio.gather(self._send_loop(relay), self._receive_loop(relay, retry_seconds))
+        finally:
+            self._outbox, self._relay_state = None, "local"
+
+    def _message(self, topic: str, data: dict) -> bytes:
+        return dumps({"origin": self.origin, "topic": topic, "data": data})
+
+    async def _send_loop(self, relay: RedisRelay):
+        while True:
+            topic, data = await self._outbox.get()
+            try:
+                if self._outbox_overflow:
+                    await relay.send(self._message("reset", {"reason": "missed events"}))
+                    self._outbox_overflow = False
+                await relay.send(self._message(topic, data))
+            except Exception as exc:
+                logger.warning("event relay send failed: %s: %s", type(exc).__name__, exc)
+                self._outbox_overflow = True
+
+    async def _receive_loop(self, relay: RedisRelay, retry_seconds: float):
+        subscribed_before = False
+        while True:
+            try:
+                messages = await relay.subscribe()
+                self._relay_state = "subscribed"
+                if subscribed_before:
+                    # Events the other workers sent while we were not subscribed are gone
+                    self._append("reset", {"reason": "event relay reconnected"})
+                subscribed_before = True
+                async for message in messages:
+                    event = orjson.loads(message)
+                    if event["origin"] != self.origin:
+                        self._append(event["topic"], event["data"])
+            except asyncio.CancelledError:
+                raise
+            except Exception as exc:
+                logger.warning("event relay subscription failed: %s: %s", type(exc).__name__, exc)
+            self._relay_state = "down"
+            await asyncio.sleep(retry_seconds)
+
+    def _resume_point(self, last_event_id: Optional[str]) -> Optional[int]:
+        """Sequence to continue after, or None when the client has missed events."""
+        if not last_event_id:
+            return self._seq
+        epoch, _, seq = last_event_id.partition("-")
+        if epoch != self.epoch or not seq.isdigit() or int(seq) > self._seq:
+            return None
+        seq = int(seq)
+        oldest = self._events[0][0] if self._events else self._seq + 1
+        return seq if seq >= oldest - 1 else None
+
+    def _after(self, seq: int) -> Optional[list]:
+        if not self._events:
+            return []
+        start = seq - self._events[0][0] + 1
+        if start < 0:
+            return None
+        return list(islice(self._events, start, None))
+
+    def _reset_frame(self, reason: str) -> bytes:
+        return f"id: {self._id(self._seq)}\nevent: reset\ndata: ".encode() + dumps({"reason": reason}) + b"\n\n"
+
+    async def stream(self, last_event_id: Optional[str], event_filter: EventFilter):
+        yield f"retry: {RETRY_MS}\n\n".encode()
+        seq = self._resume_point(last_event_id)
+        if seq is None:
+            seq = self._seq
+            yield self._reset_frame("missed events")
+        while True:
+            # Take the wakeup before reading, so a publish in between is not missed
+            wakeup = self._wakeup
+            events = self._after(seq)
+            if events is None:
+                seq = self._seq
+                yield self._reset_frame("missed events")
+                continue
+            if events:
+                seq = events[-1][0]
+                frames = [frame for _, topic, data, frame in events if event_filter.matches(topic, data)]
+                if frames:
+                    yield b"".join(frames)
+                continue
+            try:
+                await asyncio.wait_for(wakeup.wait(), KEEPALIVE_SECONDS)
+            except asyncio.TimeoutError:
+                yield b": keepalive\n\n"
+
+    def status(self) -> dict:
+        return {"epoch": self.epoch, "last_id": self._id(self._seq), "buffered": len(self._events),
+                "buffer_size": self._events.maxlen, "relay": self._relay_state}
@@ -0,0 +1,337 @@
+import re
+import threading
+from bisect import bisect_left, insort
+from datetime import date, timedelta
+from heapq import heappop, heappush, nsmallest
+from itertools import chain
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy import select
+
+import models
+
+res = models.Reservations
+
+# An email / phone prefix matching more stays than this is too broad to rank;
+# it is ignored when names match and cut to this many otherwise
+MAX_CANDIDATES = 500
+# Stays that checked out longer ago than this are not loaded at startup
+HISTORY_DAYS = 365
+MIN_PHONE_DIGITS = 3
+# Two name tokens matching more (first, last) combinations than this fall back to one token
+MAX_NAME_PAIRS = 400
+SEP = "\x00"
+
+_NON_DIGITS = re.compile(r"\D")
+
+# _docs tuple layout
+# FIRST/LAST/EMAIL are lower-cased and PHONE is digits only, for matching; DISPLAY keeps the stored values
+FIRST, LAST, EMAIL, PHONE, CHECK_IN, CHECK_OUT, STATUS, ROOM_TYPE, ROOM_NUMBER, DISPLAY = range(10)
+
+
+def _digits(value: str) -> str:
+    return _NON_DIGITS.sub("", value or "")
+
+
+def _trigrams(term: str) -> Set[str]:
+    return {term[i:i + 3] for i in range(len(term) - 2)}
+
+
+def _ordinal(value) -> int:
+    if isinstance(value, str):
+        value = date.fromisoformat(value[:10])
+    return value.toordinal()
+
+
+class GuestSearchIndex:
+    """In-process guest lookup by name, email or phone fragment.
+
+    Names are matched anywhere in the word: a trigram index over the distinct
+    lower-cased names finds the matching names, and each name keeps its
+    reservations sorted by check-in, so the stays closest to today come out
+    first by walking outwards from today. Emails match by prefix and phone
+    numbers by leading or trailing digits, through sorted key lists. Guests
+    currently checked in always rank first.
+
+    The index is per process and sees only the writes made through it; other
+    workers' writes show up after a restart. Each write inserts into sorted
+    lists that hold every stay, about 1-2 ms at a million stays.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self._docs: Dict[int, tuple] = {}
+        self._max_id = 0
+        # name -> [(check_in ordinal, reservation_id)] sorted
+        self._postings: Dict[str, List[Tuple[int, int]]] = {}
+        # (first, last) -> the same, for "first last" queries
+        self._full_names: Dict[Tuple[str, str], List[Tuple[int, int]]] = {}
+        self._names: List[str] = []
+        self._grams: Dict[str, Set[str]] = {}
+        # "key\x00reservation_id", sorted
+        self._emails: List[str] = []
+        self._phones: List[str] = []
+        self._phones_reversed: List[str] = []
+        self._in_house: Set[int] = set()
+
+    # ---------------- Build ----------------
+    def load(self, reservations: Iterable):
+        with self._lock:
+            self._reset()
+            docs = [self._doc(r) for r in reservations]
+            # Bulk build: append everything, sort once
+            for rid, doc in docs:
+                self._docs[rid] = doc
+                self._max_id = max(self._max_id, rid)
+                for name in {doc[FIRST], doc[LAST]}:
+                    self._postings.setdefault(name, []).append((doc[CHECK_IN], rid))
+                self._full_names.setdefault((doc[FIRST], doc[LAST]), []).append((doc[CHECK_IN], rid))
+                self._emails.append(f"{doc[EMAIL]}{SEP}{rid}")
+                self._phones.append(f"{doc[PHONE]}{SEP}{rid}")
+                self._phones_reversed.append(f"{doc[PHONE][::-1]}{SEP}{rid}")
+                if doc[STATUS] == "checked_in":
+                    self._in_house.add(rid)
+            for postings in self._full_names.values():
+                postings.sort()
+            for name, postings in self._postings.items():
+                postings.sort()
+                for gram in _trigrams(name):
+                    self._grams.setdefault(gram, set()).add(name)
+            self._names = sorted(self._postings)
+            self._emails.sort()
+            self._phones.sort()
+            self._phones_reversed.sort()
+
+    def load_from_db(self, db, today: Optional[date] = None):
+        since = (today or date.today()) - timedelta(days=HISTORY_DAYS)
+        # Older finished stays may already have moved to the archive table
+        self.load(chain(*(
+            db.execute(search_source_query(table).where(table.check_out >= since)).all()
+            for table in (res, models.ReservationArchive)
+        )))
+
+    def load_new_from_db(self, db):
+        """Index reservations inserted without going through upsert (bulk import)."""
+        for row in db.execute(search_source_query().where(res.reservation_id > self._max_id)).all():
+            self.upsert_reservation(row)
+
+    # ---------------- Incremental updates ----------------
+    def upsert_reservation(self, reservation):
+        rid, doc = self._doc(reservation)
+        with self._lock:
+            self._drop(rid)
+            self._put(rid, doc)
+
+    def update_fields(self, reservation_id: int, **fields):
+        """Change status / room fields of an indexed stay without re-reading it."""
+        with self._lock:
+            doc = self._docs.get(reservation_id)
+            if doc is None:
+                return
+            doc = list(doc)
+            if "status" in fields:
+                doc[STATUS] = fields["status"]
+            if "room_number" in fields:
+                doc[ROOM_NUMBER] = fields["room_number"]
+            self._drop(reservation_id)
+            self._put(reservation_id, tuple(doc))
+
+    def remove_reservation(self, reservation_id: int):
+        with self._lock:
+            self._drop(reservation_id)
+
+    # ---------------- Queries ----------------
+    def search(self, q: str, today: Optional[date] = None, limit: int = 20) -> List[dict]:
+        tokens = q.lower().split()
+        if not tokens:
+            return []
+        today_ord = (today or date.today()).toordinal()
+        with self._lock:
+            # Drive with the most selective token, check the rest against the stay itself
+            sources = sorted((self._candidates(token) for token in tokens), key=lambda s: s[0])
+            _, names, others, driver = sources[0]
+            rest = tokens[:]
+            rest.remove(driver)
+            name_set = set(names)
+            postings = [self._postings[name] for name in names]
+            if len(sources) > 1 and names and sources[1][1] and len(names) * len(sources[1][1]) <= MAX_NAME_PAIRS:
+                # "mary smi": walk the stays of the matching full names, which all match both tokens
+                full = self._full_names
+                partners = sources[1][1]
+                postings = [full[pair] for a in names for b in partners
+                            for pair in ((a, b), (b, a)) if pair in full]
+
+            checks = [self._matcher(token) for token in rest]
+
+            def accept(rid: int) -> bool:
+                doc = self._docs.get(rid)
+                return doc is not None and all(check(doc) for check in checks)
+
+            # Guests in house rank first: intersect them with the driver's stays, walking the smaller side
+            found = {}
+            in_house = self._in_house
+            if sum(map(len, postings)) + len(others) <= len(in_house):
+                matches = (rid for rid in chain(others, (rid for p in postings for _, rid in p)) if rid in in_house)
+            else:
+                matches = (rid for rid in in_house if rid in others or _doc_has_name(self._docs[rid], name_set))
+            for rid in matches:
+                if len(found) >= limit:
+                    break
+                if rid not in found and accept(rid):
+                    found[rid] = 0
+            for rid, distance in self._nearest(postings, today_ord, limit + len(found), accept):
+                found.setdefault(rid, 1 + distance)
+            for rid in nsmallest(limit, (r for r in others if r not in found and accept(r)),
+                                 key=lambda r: self._distance(r, today_ord)):
+                found[rid] = 1 + self._distance(rid, today_ord)
+
+            ranked = sorted(found.items(), key=lambda item: (item[1], -item[0]))[:limit]
+            return [self._result(rid) for rid, _ in ranked]
+
+    # ---------------- Internals (caller holds the lock) ----------------
+    def _candidates(self, token: str):
+        """(cost, matching names, other matching ids, token) for one query token."""
+        names = self._matching_names(token)
+        broad_ok = not names
+        others: Set[int] = set()
+        if len(token) >= 3:
+            others.update(_prefixed(self._emails, token, broad_ok))
+        digits = _digits(token)
+        if len(digits) >= MIN_PHONE_DIGITS and len(digits) * 2 >= len(token):
+            others.update(_prefixed(self._phones, digits, broad_ok))
+            others.update(_prefixed(self._phones_reversed, digits[::-1], broad_ok))
+        cost = sum(len(self._postings[name]) for name in names) + len(others)
+        return cost, names, others, token
+
+    def _matching_names(self, token: str) -> List[str]:
+        if len(token) < 3:
+            return [self._names[i] for i in _prefix_range(self._names, token)]
+        grams = sorted((self._grams.get(gram, ()) for gram in _trigrams(token)), key=len)
+        if not grams or not grams[0]:
+            return []
+        return [name for name in grams[0] if token in name and all(name in g for g in grams[1:])]
+
+    def _matcher(self, token: str):
+        """Predicate: does a stay match `token` the way search() would find it?"""
+        names = set(self._matching_names(token))
+        digits = _digits(token)
+        digits = digits if len(digits) >= MIN_PHONE_DIGITS else None
+
+        def check(doc: tuple) -> bool:
+            return (doc[FIRST] in names or doc[LAST] in names or doc[EMAIL].startswith(token)
+                    or (digits is not None and (doc[PHONE].startswith(digits) or doc[PHONE].endswith(digits))))
+        return check
+
+    @staticmethod
+    def _nearest(lists: List[List[Tuple[int, int]]], today_ord: int, limit: int, accept):
+        """Yield (reservation_id, days from today to check-in) nearest first across posting lists."""
+        heap = []
+        for n, postings in enumerate(lists):
+            mid = bisect_left(postings, (today_ord, 0))
+            if mid < len(postings):
+                heappush(heap, (postings[mid][0] - today_ord, n, mid, 1))
+            if mid > 0:
+                heappush(heap, (today_ord - postings[mid - 1][0], n, mid - 1, -1))
+        seen = set()
+        while heap and len(seen) < limit:
+            distance, n, i, step = heappop(heap)
+            postings = lists[n]
+            rid = postings[i][1]
+            if rid not in seen and accept(rid):
+                seen.add(rid)
+                yield rid, distance
+            j = i + step
+            if 0 <= j < len(postings):
+                heappush(heap, (abs(postings[j][0] - today_ord), n, j, step))
+
+    def _distance(self, rid: int, today_ord: int) -> int:
+        return abs(self._docs[rid][CHECK_IN] - today_ord)
+
+    def _result(self, rid: int) -> dict:
+        doc = self._docs[rid]
+        return {
+            "reservation_id": rid,
+            "first_name": doc[DISPLAY][0],
+            "last_name": doc[DISPLAY][1],
+            "email": doc[DISPLAY][2],
+            "phone_number": doc[DISPLAY][3],
+            "check_in": date.fromordinal(doc[CHECK_IN]),
+            "check_out": date.fromordinal(doc[CHECK_OUT]),
+            "status": doc[STATUS],
+            "room_type": doc[ROOM_TYPE],
+            "room_number": doc[ROOM_NUMBER],
+        }
+
+    @staticmethod
+    def _doc(r) -> Tuple[int, tuple]:
+        return r.reservation_id, (
+            (r.first_name or "").lower(), (r.last_name or "").lower(), (r.email or "").lower(),
+            _digits(r.phone_number), _ordinal(r.check_in), _ordinal(r.check_out),
+            r.status, r.room_type, r.room_number, (r.first_name, r.last_name, r.email, r.phone_number),
+        )
+
+    def _add_name(self, name: str):
+        # Names are never dropped; an unused one just has no postings left
+        self._postings[name] = []
+        insort(self._names, name)
+        for gram in _trigrams(name):
+            self._grams.setdefault(gram, set()).add(name)
+
+    def _put(self, rid: int, doc: tuple):
+        self._docs[rid] = doc
+        self._max_id = max(self._max_id, rid)
+        for name in {doc[FIRST], doc[LAST]}:
+            if name not in self._postings:
+                self._add_name(name)
+            insort(self._postings[name], (doc[CHECK_IN], rid))
+        insort(self._full_names.setdefault((doc[FIRST], doc[LAST]), []), (doc[CHECK_IN], rid))
+        insort(self._emails, f"{doc[EMAIL]}{SEP}{rid}")
+        insort(self._phones, f"{doc[PHONE]}{SEP}{rid}")
+        insort(self._phones_reversed, f"{doc[PHONE][::-1]}{SEP}{rid}")
+        if doc[STATUS] == "checked_in":
+            self._in_house.add(rid)
+
+    def _drop(self, rid: int):
+        doc = self._docs.pop(rid, None)
+        if doc is None:
+            return
+        for name in {doc[FIRST], doc[LAST]}:
+            _remove(self._postings.get(name, []), (doc[CHECK_IN], rid))
+        _remove(self._full_names.get((doc[FIRST], doc[LAST]), []), (doc[CHECK_IN], rid))
+        _remove(self._emails, f"{doc[EMAIL]}{SEP}{rid}")
+        _remove(self._phones, f"{doc[PHONE]}{SEP}{rid}")
+        _remove(self._phones_reversed, f"{doc[PHONE][::-1]}{SEP}{rid}")
+        self._in_house.discard(rid)
+
+
+def _remove(sorted_list: list, item):
+    i = bisect_left(sorted_list, item)
+    if i < len(sorted_list) and sorted_list[i] == item:
+        del sorted_list[i]
+
+
+def _prefix_range(sorted_keys: List[str], prefix: str) -> range:
+    return range(bisect_left(sorted_keys, prefix), bisect_left(sorted_keys, prefix + "\U0010ffff"))
+
+
+def _prefixed(sorted_keys: List[str], prefix: str, broad_ok: bool) -> List[int]:
+    found = _prefix_range(sorted_keys, prefix)
+    if len(found) > MAX_CANDIDATES:
+        if not broad_ok:
+            return []
+        found = found[:MAX_CANDIDATES]
+    return [int(sorted_keys[i].rsplit(SEP, 1)[1]) for i in found]
+
+
+def _doc_has_name(doc: tuple, names: Set[str]) -> bool:
+    return doc[FIRST] in names or doc[LAST] in names
+
+
+def search_source_query(table=res):
+    return select(
+        table.reservation_id, table.first_name, table.last_name, table.email, table.phone_number,
+        table.check_in, table.check_out, table.status, table.room_type, table.room_number,
+    )
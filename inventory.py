@@ -0,0 +1,200 @@
+"""Contention-safe room-type inventory for new bookings.
+
+Bookings are sold by room type and get a room later (``assignment.py``), so
+the inventory to protect is "rooms of type X sold on night N", which is
+``daily_rollups.rooms_sold``. A booking claims every night of its stay with
+one guarded update inside its own transaction::
+
+    UPDATE daily_rollups SET rooms_sold = rooms_sold + 1
+    WHERE room_type = :type AND stay_date >= :check_in AND stay_date < :check_out
+      AND rooms_sold < (sellable rooms of :type)
+
+and only proceeds if every night matched. The update holds row locks on just
+those (night, type) rows until commit, so concurrent bookings for other
+nights or types never wait on each other, and a booking that waited
+re-checks the guard against the committed count instead of overselling.
+Nights nobody has booked yet get their zero row first (an upsert adding 0).
+Rows are always touched in date order; deadlocks and lock timeouts that still
+happen are retried by ``with_retries``.
+
+Writes that add nights some other way go through the same guard:
+``claim_deltas`` claims the nights a ``PUT /reservation/`` edit adds (new
+dates, or a cancelled booking made live again), and ``split_sellable`` locks
+the nights of a bulk import batch and sets aside the rows that would oversell
+them.
+"""
+import asyncio
+from collections import Counter
+from datetime import timedelta
+from typing import List, Tuple
+
+from sqlalchemy import func, select, update
+from sqlalchemy.exc import DBAPIError
+
+import models
+import rollups
+from availability import UNSELLABLE_STATUSES
+
+rollups_table = rollups.rollups
+rooms_table = models.Room.__table__
+
+BOOKING_RETRIES = 3
+# MySQL deadlock / lock wait timeout, PostgreSQL serialization failure / deadlock
+_RETRYABLE_CODES = {1213, 1205, "40001", "40P01"}
+
+
+def capacity_query(room_type: str):
+    return select(func.count()).select_from(rooms_table).where(
+        rooms_table.c.room_type == room_type, rooms_table.c.status.not_in(UNSELLABLE_STATUSES)
+    )
+
+
+def _zero_rows(keys) -> List[dict]:
+    return [{"stay_date": night, "room_type": room_type, **dict.fromkeys(rollups.COUNTERS, 0)}
+            for night, room_type in sorted(keys)]
+
+
+async def claim_nights(db, room_type: str, check_in, check_out) -> bool:
+    """Take one room of `room_type` for every night of the stay; False if any night is sold out.
+
+    On False the caller must roll back: nights before the sold-out one may already be counted.
+    """
+    nights = [check_in + timedelta(days=n) for n in range((check_out - check_in).days)]
+    if not nights:
+        return True
+    await db.execute(rollups.upsert(db.bind.dialect.name), _zero_rows((night, room_type) for night in nights))
+    claimed = await db.execute(
+        update(rollups_table)
+        .where(
+            rollups_table.c.room_type == room_type,
+            rollups_table.c.stay_date >= check_in,
+            rollups_table.c.stay_date < check_out,
+            rollups_table.c.rooms_sold < capacity_query(room_type).scalar_subquery(),
+        )
+        .values(rooms_sold=rollups_table.c.rooms_sold + 1)
+    )
+    return claimed.rowcount == len(nights)
+
+
+async def remaining(db, room_type: str, check_in, check_out) -> int:
+    """Rooms of `room_type` still sellable on every night of the stay (assigned or not)."""
+    sold = select(func.coalesce(func.max(rollups_table.c.rooms_sold), 0)).where(
+        rollups_table.c.room_type == room_type,
+        rollups_table.c.stay_date >= check_in,
+        rollups_table.c.stay_date < check_out,
+    ).scalar_subquery()
+    left = (await db.execute(select(capacity_query(room_type).scalar_subquery() - sold))).scalar()
+    return max(left or 0, 0)
+
+
+async def claim_deltas(db, deltas: rollups.Deltas) -> bool:
+    """Claim every night `deltas` adds to ``rooms_sold``; False if any of them is sold out.
+
+    On True the claimed nights are zeroed in `deltas`, so applying it afterwards
+    only adds the other counters and the nights it releases. On False the
+    caller must roll back, as with ``claim_nights``.
+    """
+    wanted = {key: values["rooms_sold"] for key, values in deltas.items() if values["rooms_sold"] > 0}
+    if not wanted:
+        return True
+    await db.execute(rollups.upsert(db.bind.dialect.name), _zero_rows(wanted))
+    for (night, room_type), count in sorted(wanted.items()):
+        claimed = await db.execute(
+            update(rollups_table)
+            .where(
+                rollups_table.c.room_type == room_type,
+                rollups_table.c.stay_date == night,
+                rollups_table.c.rooms_sold + count <= capacity_query(room_type).scalar_subquery(),
+            )
+            .values(rooms_sold=rollups_table.c.rooms_sold + count)
+        )
+        if claimed.rowcount != 1:
+            return False
+    for key in wanted:
+        deltas[key]["rooms_sold"] = 0
+    return True
+
+
+# ---------------- Bulk import ----------------
+def _batch_queries(keys):
+    room_types = {room_type for _, room_type in keys}
+    nights = [night for night, _ in keys]
+    sold = select(rollups_table.c.stay_date, rollups_table.c.room_type, rollups_table.c.rooms_sold).where(
+        rollups_table.c.room_type.in_(room_types),
+        rollups_table.c.stay_date >= min(nights),
+        rollups_table.c.stay_date <= max(nights),
+    )
+    capacity = select(rooms_table.c.room_type, func.count()).where(
+        rooms_table.c.room_type.in_(room_types), rooms_table.c.status.not_in(UNSELLABLE_STATUSES)
+    ).group_by(rooms_table.c.room_type)
+    return sold, capacity
+
+
+def _sold_keys(rows) -> list:
+    return [key for key, values in rollups.combined(rows).items() if values["rooms_sold"]]
+
+
+def fit(rows, sold: dict, capacity: dict) -> Tuple[List[int], List[Tuple[int, str]]]:
+    """Indexes of the `rows` that fit next to `sold`, in order, and why the others do not."""
+    taken = Counter()
+    kept, sold_out = [], []
+    for i, row in enumerate(rows):
+        nights = [key for key, values in rollups.combined([row]).items() if values["rooms_sold"]]
+        full = next((key for key in nights if sold.get(key, 0) + taken[key] >= capacity.get(key[1], 0)), None)
+        if full:
+            sold_out.append((i, f"No available rooms of type {full[1]} on {full[0].isoformat()}"))
+            continue
+        taken.update(nights)
+        kept.append(i)
+    return kept, sold_out
+
+
+def split_sellable(conn, rows) -> Tuple[List[int], List[Tuple[int, str]]]:
+    """Lock the nights of a batch and ``fit`` it, inside the caller's transaction (sync)."""
+    keys = _sold_keys(rows)
+    if not keys:
+        return list(range(len(rows))), []
+    # The zero-row upsert also takes the row locks the counts below rely on
+    conn.execute(rollups.upsert(conn.dialect.name), _zero_rows(keys))
+    sold_q, capacity_q = _batch_queries(keys)
+    sold = {(night, room_type): count for night, room_type, count in conn.execute(sold_q)}
+    return fit(rows, sold, dict(conn.execute(capacity_q).all()))
+
+
+async def split_sellable_async(conn, rows) -> Tuple[List[int], List[Tuple[int, str]]]:
+    """``split_sellable`` for an AsyncConnection."""
+    keys = _sold_keys(rows)
+    if not keys:
+        return list(range(len(rows))), []
+    await conn.execute(rollups.upsert(conn.dialect.name), _zero_rows(keys))
+    sold_q, capacity_q = _batch_queries(keys)
+    sold = {(night, room_type): count for night, room_type, count in await conn.execute(sold_q)}
+    return fit(rows, sold, dict((await conn.execute(capacity_q)).all()))
+
+
+def unclaimed(deltas: rollups.Deltas) -> rollups.Deltas:
+    """A contribution without the nights ``claim_nights`` already counted."""
+    for values in deltas.values():
+        values["rooms_sold"] = 0
+    return deltas
+
+
+def is_retryable(exc: DBAPIError) -> bool:
+    orig = exc.orig
+    code = getattr(orig, "sqlstate", None) or getattr(orig, "pgcode", None)
+    if code is None and getattr(orig, "args", None):
+        code = orig.args[0]
+    return code in _RETRYABLE_CODES or "database is locked" in str(orig)
+
+
+async def with_retries(session_factory, work, retries: int = BOOKING_RETRIES):
+    """Run `await work(db)` in a fresh session, retrying lock conflicts with a short backoff."""
+    for attempt in range(retries + 1):
+        async with session_factory() as db:
+            try:
+                return await work(db)
+            except DBAPIError as exc:
+                await db.rollback()
+                if attempt == retries or not is_retryable(exc):
+                    raise
+        await asyncio.sleep(0.01 * 2 ** attempt)
@@ -1,56 +1,102 @@
-from fastapi import FastAPI, Depends, HTTPException, Query, Body, Path
-from sqlalchemy.orm import Session
-from passlib.context import CryptContext
+from fastapi import APIRouter, FastAPI, Depends, HTTPException, Query, Body, Path, Request, Response
+from sqlalchemy.ext.asyncio import AsyncSession
+import asyncio
+import logging
 import re
+from bisect import bisect_right
+from decimal import Decimal
 import models, schemas
-from database import SessionLocal, engine, Base
+from database import AsyncSessionLocal, engine, async_engine, pool_status
 from typing import List, Optional
 from schemas import LoginRequest, LoginResponse, RoomBase, ReservationResponse, ReservationUpdate, CheckinResponse, RoomUpdate, CreateReservation, ArrivalResponse, DepartureResponse, ReservationUpdate
 from fastapi.middleware.cors import CORSMiddleware
-from sqlalchemy import and_
-from datetime import datetime
-
-# Create DB tables
-Base.metadata.create_all(bind=engine)
-
-app = FastAPI()
-
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
-
-# Password hashing
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-
-# DB session dependency
-def get_db():
-    db = SessionLocal()
-    try:
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
+from types import SimpleNamespace
+from sqlalchemy import and_, select
+from sqlalchemy.exc import DBAPIError, IntegrityError
+from datetime import date, datetime, timedelta
+from availability import AvailabilityIndex
+from guest_search import GuestSearchIndex
+import rollups
+import archive
+import assignment
+import audit
+import bulk_ops
+import inventory
+import conditional
+from events import EventBus, EventFilter, TOPICS, make_relay
+import metrics
+from metrics import MetricsMiddleware
+from cache import EntityCache, make_backend
+from rates import rate_card
+from migrate import pending_versions
+from settings import Settings
+from replicas import PrimaryPinMiddleware, ReplicaSet, pinned
+from queries import arrivals_query, departures_query, inhouse_query, checkins_query, rooms_query
+from pagination import NEXT_CURSOR_HEADER, keyset, ndjson_response, next_cursor_headers
+from serialization import dumps, row_json, rows_response
+from bulk_import import DEFAULT_BATCH_SIZE, import_stream, numbered_stream
+from security import hash_password, verify_password, issue_token, get_session, password_pool_status, shutdown_password_pool, check_session_secret
+
+# Routes are registered here and mounted by create_app()
+router = APIRouter()
+
+# In-process room-night availability index
+room_index = AvailabilityIndex()
+
+# In-process guest name / email / phone search index
+guest_index = GuestSearchIndex()
+
+# Committed room / reservation changes, streamed by /events
+event_bus = EventBus()
+
+# Read-through cache for single rooms, reservations and the room list (backend set by create_app)
+entity_cache = EntityCache()
+
+
+async def invalidate_rooms(*room_numbers):
+    # The room list is cached per change-counter version, so bumping "rooms" retires it
+    await entity_cache.invalidate("room", *room_numbers)
+
+# Async DB session dependency
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
         yield db
-    finally:
-        db.close()
 
-
-@app.post("/users/register", response_model=schemas.UserResponse)
-def register_user(user: schemas.UserCreate, db: Session = Depends(get_db)):
+# Read-only DB session dependency: a healthy replica of this app's set, or the primary when
+# there is none or the client wrote within the pin window
+async def get_read_db(request: Request):
+    replica = None if pinned(request) else request.app.state.replica_set.pick()
+    if replica is None:
+        async with AsyncSessionLocal() as db:
+            yield db
+        return
+    async with AsyncSessionLocal(bind=replica.engine) as db:
+        try:
+            yield db
+        except DBAPIError as exc:
+            if exc.connection_invalidated:
+                replica.mark_down(str(exc.orig))
+            raise
+
+
+@router.post("/users/register", response_model=schemas.UserResponse)
+async def register_user(user: schemas.UserCreate, db: AsyncSession = Depends(get_async_db)):
     # Validate role
     allowed_roles = ["admin","frontdesk","manager"]
     if user.role not in allowed_roles:
         raise HTTPException(status_code=400, detail=f"Role must be one of {allowed_roles}")
 
     # Check if email or name already exists
-    existing_user = db.query(models.User).filter(
+    existing_user = (await db.execute(select(models.User).filter(
         (models.User.email == user.email) | (models.User.name == user.name)
-    ).first()
+    ))).scalars().first()
     if existing_user:
         raise HTTPException(status_code=400, detail="Email or Name already registered")
 
-    # Hash the password
-    hashed_password = pwd_context.hash(user.password)
+    # Hash the password (off the event loop, in the bounded process pool)
+    hashed_password = await hash_password(user.password)
 
     # Create new user
     new_user = models.User(
@@ -60,235 +106,227 @@ def register_user(user: schemas.UserCreate, db: Session = Depends(get_db)):
         password=hashed_password
     )
     db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
+    await db.commit()
+    await db.refresh(new_user)
     return new_user
 
-@app.post("/login", response_model=LoginResponse)
-def login(login_req: LoginRequest, db: Session = Depends(get_db)):
-    user = db.query(models.User).filter(models.User.email == login_req.email).first()
+@router.post("/login", response_model=LoginResponse)
+async def login(login_req: LoginRequest, db: AsyncSession = Depends(get_async_db)):
+    user = (await db.execute(select(models.User).filter(models.User.email == login_req.email))).scalars().first()
     if not user:
         raise HTTPException(status_code=401, detail="Invalid email or password")
     
     # Verify password
-    if not pwd_context.verify(login_req.password, user.password):
+    if not await verify_password(login_req.password, user.password):
         raise HTTPException(status_code=401, detail="Invalid email or password")
     
     return LoginResponse(
         user_id=user.user_id,
         name=user.name,
         email=user.email,
-        role=user.role
+        role=user.role,
+        token=issue_token(user.user_id, user.role)
     )
 
-@app.get("/rooms_availability/{roomtype}", response_model=List[RoomBase])
-def get_available_rooms(
+@router.get("/session")
+async def read_session(session: dict = Depends(get_session)):
+    return {"user_id": session["sub"], "role": session["role"], "expires_at": session["exp"]}
+
+@router.get("/rooms_availability/{roomtype}", response_model=List[RoomBase])
+async def get_available_rooms(
     roomtype: str = Path(..., description="Room type (Single, Double, etc.)"),
     date: str = Query(..., description="Check-in date in YYYY-MM-DD"),
-    db: Session = Depends(get_db),
+    check_out: Optional[str] = Query(None, description="Check-out date in YYYY-MM-DD (defaults to one night)"),
+    db: AsyncSession = Depends(get_read_db),
 ):
-    # Convert date string to datetime
-    check_in_date = datetime.strptime(date, "%Y-%m-%d")
-
-    res = models.Reservations
-
-    # Subquery: rooms reserved on that date and of the given type
-    reserved_rooms = (
-        db.query(res.room_number)
-        .filter(
-            and_(
-                res.check_in <= check_in_date,
-                res.check_out > check_in_date,
-                res.status.in_(["booked", "checked_in"]),
-                res.room_type == roomtype
-            )
-        )
-    )
-
-    # Build response
-    response = [
-        RoomBase(
-            room_number=r.room_number,
-            room_type=r.room_type,
-            status=r.status,
-            room_condition=r.room_condition
-        )
-        for r in reserved_rooms
-    ]
-
-    return response
+    check_in_date = datetime.strptime(date, "%Y-%m-%d").date()
+    if check_out:
+        check_out_date = datetime.strptime(check_out, "%Y-%m-%d").date()
+        if check_out_date <= check_in_date:
+            raise HTTPException(status_code=400, detail="check_out must be after check_in")
+    else:
+        check_out_date = check_in_date + timedelta(days=1)
+
+    # Rooms of the type with no assigned stay on any night of the range, capped at the
+    # type's unsold inventory: unassigned bookings hold no room in the index, and the
+    # rollups also see bookings taken by other workers
+    free = room_index.free_rooms(roomtype, check_in_date, check_out_date)
+    return free[:await inventory.remaining(db, roomtype, check_in_date, check_out_date)]
 
     
-@app.get("/inhouse/{rstatus}", response_model= List[ArrivalResponse])
-def get_inhouse(rstatus = str, db: Session= Depends(get_db)):
-    response = db.query(models.Reservations).filter(models.Reservations.status == rstatus).all()
-
-    result = []
-    for r in response:
-        days = (r.check_out - r.check_in).days
-        result.append(ArrivalResponse(            
-            reservation_id = r.reservation_id,
-            first_name = r.first_name,
-            last_name=r.last_name,
-            check_in=r.check_in,
-            check_out=r.check_out,
-            room_number=r.room_number,
-            room_type=r.room_type,
-            days=days
-        )
+# Keyset paging: ?limit=N returns one page ordered by the key and sets
+# X-Next-Cursor; pass it back as ?after=... for the next page.
+# ?stream=true returns the whole result as NDJSON from a server-side cursor.
+# Rows are serialized straight from the selected columns (see serialization.py).
+AFTER_RESERVATION = Query(None, description="Return reservations after this reservation_id")
+AFTER_ROOM = Query(None, description="Return rooms after this room_number")
+LIMIT = Query(None, ge=1, le=10000, description="Page size; omit for the full list")
+STREAM = Query(False, description="Stream the result as NDJSON")
+
+
+@router.get("/inhouse/{rstatus}", response_model= List[ArrivalResponse])
+async def get_inhouse(
+    rstatus: str,
+    after: Optional[int] = AFTER_RESERVATION,
+    limit: Optional[int] = LIMIT,
+    stream: bool = STREAM,
+    db: AsyncSession= Depends(get_read_db)
+):
+    stmt = keyset(inhouse_query(rstatus), models.Reservations.reservation_id, after, limit)
+    if stream:
+        return ndjson_response(stmt, row_json, db.bind)
+
+    rows = (await db.execute(stmt)).all()
+    return rows_response(rows, next_cursor_headers(rows, "reservation_id", limit))
+
+@router.post("/reservations/", response_model=schemas.ReservationResponse)
+async def create_reservation(reservation: schemas.CreateReservation):
+    async def book(db: AsyncSession):
+        new_reservation = models.Reservations(
+            first_name=reservation.first_name,
+            last_name=reservation.last_name,
+            email=reservation.email,
+            phone_number=reservation.phone_number,
+            check_in=reservation.check_in,
+            check_out=reservation.check_out,
+            total_amount=reservation.total_amount,
+            address=reservation.address,
+            credit_card_number=reservation.credit_card_number,
+            cc_expiry=reservation.cc_expiry,
+            status=reservation.status,
+            room_type=reservation.room_type,
+            room_number=None,
+            created_by=reservation.created_by
         )
-    return result
-
-@app.post("/reservations/", response_model=schemas.ReservationResponse)
-def create_reservation(reservation: schemas.CreateReservation, db: Session = Depends(get_db)):
-    if reservation.room_type:
-        room = db.query(models.Room).filter(
-            models.Room.room_type == reservation.room_type,
-            models.Room.status == "vacant"
-        ).first()
-        if not room:
-            raise HTTPException(status_code=400, detail="No available rooms of the requested type")
-
-    # Create reservation
-    new_reservation = models.Reservations(
-        first_name=reservation.first_name,
-        last_name=reservation.last_name,
-        email=reservation.email,
-        phone_number=reservation.phone_number,
-        check_in=reservation.check_in,
-        check_out=reservation.check_out,
-        total_amount=reservation.total_amount,
-        address=reservation.address,
-        credit_card_number=reservation.credit_card_number,
-        cc_expiry=reservation.cc_expiry,
-        status=reservation.status,
-        room_type=reservation.room_type,
-        room_number=None,
-        created_by=reservation.created_by
-    )
-    db.add(new_reservation)
-    db.commit()
-    db.refresh(new_reservation)
+        deltas = rollups.contribution(new_reservation)
+        # Claim the room-type nights first: concurrent bookings for the same nights queue on those rows
+        if any(day["rooms_sold"] for day in deltas.values()):
+            if not await inventory.claim_nights(db, reservation.room_type, reservation.check_in, reservation.check_out):
+                await db.rollback()
+                raise HTTPException(status_code=400, detail="No available rooms of the requested type")
+            inventory.unclaimed(deltas)
+        db.add(new_reservation)
+        await rollups.apply_async(db, deltas)
+        await db.commit()
+        await db.refresh(new_reservation)
+        return new_reservation
+
+    new_reservation = await inventory.with_retries(AsyncSessionLocal, book)
+    room_index.upsert_reservation(new_reservation)
+    guest_index.upsert_reservation(new_reservation)
+    await entity_cache.invalidate("reservation", new_reservation.reservation_id)
+    event_bus.publish_reservations([new_reservation])
 
     return new_reservation
 
-@app.get("/arrivals", response_model=List[ArrivalResponse])
-def get_arrivals(
+# -------- Bulk import (NDJSON body, one CreateReservation per line) --------
+@router.post("/reservations/bulk")
+async def bulk_create_reservations(
+    request: Request,
+    batch_size: int = Query(DEFAULT_BATCH_SIZE, ge=1, le=50000),
+):
+    report = await import_stream(async_engine, numbered_stream(request.stream()), batch_size)
+    if report["inserted"]:
+        async with AsyncSessionLocal() as db:
+            await db.run_sync(guest_index.load_new_from_db)
+        event_bus.reset("bulk import")
+    return report
+
+@router.get("/arrivals", response_model=List[ArrivalResponse])
+async def get_arrivals(
     check_in_date: str = Query(..., description="Date in YYYY-MM-DD"),
-    db: Session = Depends(get_db)
+    after: Optional[int] = AFTER_RESERVATION,
+    limit: Optional[int] = LIMIT,
+    stream: bool = STREAM,
+    db: AsyncSession = Depends(get_read_db)
 ):
     target_check_in = datetime.strptime(check_in_date, "%Y-%m-%d").date()
 
     # Query reservations for that check-in date
-    reservations = db.query(
-        models.Reservations.reservation_id,
-        models.Reservations.first_name,
-        models.Reservations.last_name,
-        models.Reservations.check_in,
-        models.Reservations.check_out,
-        models.Reservations.room_number,
-        models.Reservations.room_type
-    ).filter(
-        and_(
-            models.Reservations.check_in == target_check_in,
-            models.Reservations.status == "booked"
-        )
-    ).all()
+    stmt = keyset(arrivals_query(target_check_in), models.Reservations.reservation_id, after, limit)
+    if stream:
+        return ndjson_response(stmt, row_json, db.bind)
 
-    # Build response with calculated 'days'
-    response = []
-    for r in reservations:
-        days = (r.check_out - r.check_in).days
-        response.append(ArrivalResponse(
-            reservation_id=r.reservation_id,
-            first_name=r.first_name,
-            last_name=r.last_name,
-            check_in=r.check_in,
-            check_out=r.check_out,
-            room_number=r.room_number,
-            room_type=r.room_type,
-            days=days
-        ))
+    # 'days' is calculated in the query
+    rows = (await db.execute(stmt)).all()
+    return rows_response(rows, next_cursor_headers(rows, "reservation_id", limit))
 
-    return response
-
-@app.get("/checkins", response_model=List[CheckinResponse])
-def get_checkins( check_in_date: str = Query(..., description="Date in YYYY-MM-DD"),
-    db: Session = Depends(get_db), rstatus : str = Query(...,)
+@router.get("/checkins", response_model=List[CheckinResponse])
+async def get_checkins(
+    check_in_date: str = Query(..., description="Date in YYYY-MM-DD"),
+    rstatus : str = Query(...,),
+    after: Optional[int] = AFTER_RESERVATION,
+    limit: Optional[int] = LIMIT,
+    stream: bool = STREAM,
+    db: AsyncSession = Depends(get_read_db)
 ):
-    res = db.query(models.Reservations).filter(
-        and_(
-            models.Reservations.check_in == check_in_date,
-            models.Reservations.status == rstatus 
-        )
-    ).all()
+    stmt = keyset(checkins_query(check_in_date, rstatus), models.Reservations.reservation_id, after, limit)
+    if stream:
+        return ndjson_response(stmt, row_json, db.bind)
 
-    response = []
+    rows = (await db.execute(stmt)).all()
+    return rows_response(rows, next_cursor_headers(rows, "reservation_id", limit))
 
-    for r in res:
-        response.append(CheckinResponse(
-            reservation_id=r.reservation_id,
-            first_name=r.first_name,
-            last_name=r.last_name,
-            check_in=r.check_in,
-            check_out=r.check_out,
-        ))
-
-    return response
 
 
-
-@app.get("/departures", response_model=List[DepartureResponse])
-def get_departures(check_out_date: str = Query(..., description="Date in YYYY-MM-DD"),
-    db: Session = Depends(get_db)
+@router.get("/departures", response_model=List[DepartureResponse])
+async def get_departures(
+    check_out_date: str = Query(..., description="Date in YYYY-MM-DD"),
+    after: Optional[int] = AFTER_RESERVATION,
+    limit: Optional[int] = LIMIT,
+    stream: bool = STREAM,
+    db: AsyncSession = Depends(get_read_db)
 ):
     target_date = datetime.strptime(check_out_date, "%Y-%m-%d").date()
-    res = db.query(
-        models.Reservations.reservation_id,
-        models.Reservations.first_name,
-        models.Reservations.last_name,
-        models.Reservations.room_number,
-        models.Reservations.room_type
-    ).filter(target_date == models.Reservations.check_out).all()
-
-    response = []
-
-    for r in res:
-        response.append(DepartureResponse(
-            first_name= r.first_name,
-            last_name= r.last_name,
-            reservation_id= r.reservation_id,
-            room_number= r.room_number,
-            room_type= r.room_type
-        )
-        )
-    return response
-
-
-@app.get("/rooms/", response_model= List[RoomBase])
-def get_rooms(db: Session=Depends(get_db)):
+    stmt = keyset(departures_query(target_date), models.Reservations.reservation_id, after, limit)
+    if stream:
+        return ndjson_response(stmt, row_json, db.bind)
 
-    res = db.query(models.Room).all()
-    response = []
-    for r in res:
-        response.append(RoomBase(
-            room_number = r.room_number,
-            room_type = r.room_type,
-            status = r.status,
-            room_condition = r.room_condition
-        )
-        )
-    return response
+    rows = (await db.execute(stmt)).all()
+    return rows_response(rows, next_cursor_headers(rows, "reservation_id", limit))
 
-@app.get("/roomst/{roomtype}", response_model= List[RoomBase])
-def get_rooms_ava(roomtype: str, db: Session=Depends(get_db)):
 
-    res = db.query(models.Room).filter(
+@router.get("/rooms/", response_model= List[RoomBase])
+async def get_rooms(
+    request: Request,
+    after: Optional[str] = AFTER_ROOM,
+    limit: Optional[int] = LIMIT,
+    stream: bool = STREAM,
+    db: AsyncSession=Depends(get_read_db)
+):
+    if stream:
+        return ndjson_response(keyset(rooms_query(), models.Room.room_number, after, limit), row_json, db.bind)
+
+    # Read the counter before the rows, so a cached list is never older than its version
+    version, changed_at = await conditional.version(db, "rooms")
+    etag, last_modified = conditional.list_validators("rooms", version, changed_at, after, limit)
+    if conditional.matches(request, etag):
+        return conditional.not_modified(etag, last_modified)
+
+    # The whole room list is small and rarely changes: cache it and page in memory. The cache is
+    # shared, so fill it from the primary; rows newer than a lagging replica's version are harmless
+    async def load():
+        async with AsyncSessionLocal() as primary:
+            rows = (await primary.execute(keyset(rooms_query(), models.Room.room_number))).all()
+        return [dict(zip(row._fields, row)) for row in rows]
+
+    rooms = await entity_cache.get("rooms", f"v{version}", load)
+    start = bisect_right([room["room_number"] for room in rooms], after) if after is not None else 0
+    page = rooms[start:start + limit] if limit else rooms[start:]
+    headers = conditional.headers(etag, last_modified)
+    if limit and len(page) == limit:
+        headers[NEXT_CURSOR_HEADER] = page[-1]["room_number"]
+    return Response(dumps(page), media_type="application/json", headers=headers)
+
+@router.get("/roomst/{roomtype}", response_model= List[RoomBase])
+async def get_rooms_ava(roomtype: str, db: AsyncSession=Depends(get_read_db)):
+
+    res = (await db.execute(select(models.Room).filter(
         and_(
             models.Room.room_type == roomtype,
             models.Room.status == 'vacant'
         )
-        ).all()
+        ))).scalars().all()
     
     response = []
     for r in res:
@@ -302,60 +340,122 @@ def get_rooms_ava(roomtype: str, db: Session=Depends(get_db)):
     return response
 
 
+# -------- Guest search (type-ahead) --------
+@router.get("/reservations/search", response_model=List[schemas.GuestSearchResult])
+async def search_reservations(
+    q: str = Query(..., min_length=1, max_length=100),
+    limit: int = Query(20, ge=1, le=100),
+):
+    return Response(dumps(guest_index.search(q, limit=limit)), media_type="application/json")
+
+
 # -------- GET Reservation --------
-@app.get("/reservation/", response_model=ReservationResponse)
-def view_reservation(
+# Card data never goes into the entity cache (a shared backend would copy it to the cache server);
+# a cache hit reads just these columns from the primary
+CARD_FIELDS = ("credit_card_number", "cc_expiry")
+
+@router.get("/reservation/", response_model=ReservationResponse)
+async def view_reservation(
+    request: Request,
+    response: Response,
     reservation_id: int = Query(..., alias="reservationid"),  # matches React query param
-    db: Session = Depends(get_db)
 ):
-    reservation = db.query(models.Reservations).filter(
-        models.Reservations.reservation_id == reservation_id
-    ).first()
-    if not reservation:
+    card = None
+
+    # The cache is shared by every client, so fill it from the primary: a lagging replica could
+    # otherwise put back a row that a write has just invalidated
+    async def load():
+        nonlocal card
+        async with AsyncSessionLocal() as primary:
+            reservation = await archive.get_reservation(primary, reservation_id)
+        if not reservation:
+            return None
+        row = ReservationResponse.model_validate(reservation).model_dump(mode="json")
+        card = {field: row.pop(field) for field in CARD_FIELDS}
+        return row
+
+    reservation = await entity_cache.get("reservation", reservation_id, load)
+    if reservation and card is None:
+        async with AsyncSessionLocal() as primary:
+            card = await archive.get_fields(primary, reservation_id, *CARD_FIELDS)
+    if not reservation or card is None:
         raise HTTPException(status_code=404, detail="Reservation not found")
+    reservation = {**reservation, **card}
+    etag, last_modified = conditional.row_validators("reservation", reservation_id, reservation)
+    if conditional.matches(request, etag):
+        return conditional.not_modified(etag, last_modified)
+    response.headers.update(conditional.headers(etag, last_modified))
     return reservation
 
-@app.get("/roomsn/", response_model=RoomUpdate)
-def get_room(room_number: str = Query(..., alias="roomnumber"),
-              db: Session = Depends(get_db)):
-    room = db.query(models.Room).filter(models.Room.room_number == room_number).first()
+@router.get("/roomsn/", response_model=RoomUpdate)
+async def get_room(request: Request, response: Response,
+              room_number: str = Query(..., alias="roomnumber")):
+    async def load():
+        async with AsyncSessionLocal() as primary:
+            room = await primary.get(models.Room, room_number)
+        if not room:
+            return None
+        # Timestamps ride along for the validators; response_model drops them
+        return {**RoomBase.model_validate(room).model_dump(mode="json"),
+                "updated_at": room.updated_at and room.updated_at.isoformat(),
+                "created_at": room.created_at and room.created_at.isoformat()}
+
+    room = await entity_cache.get("room", room_number, load)
     if not room:
         raise HTTPException(status_code=404, detail="Room not found")
+    etag, last_modified = conditional.row_validators("room", room_number, room)
+    if conditional.matches(request, etag):
+        return conditional.not_modified(etag, last_modified)
+    response.headers.update(conditional.headers(etag, last_modified))
     return room
 
 
 # -------- PUT Reservation --------
-@app.put("/reservation/", response_model=ReservationResponse)
-def update_reservation(
+@router.put("/reservation/", response_model=ReservationResponse)
+async def update_reservation(
     reservation_id: int = Query(..., alias="reservationid"),  # matches React query param
     request: ReservationUpdate = Body(...),  # Body is now required
-    db: Session = Depends(get_db)
 ):
-    # Find reservation
-    reservation = db.query(models.Reservations).filter(
-        models.Reservations.reservation_id == reservation_id
-    ).first()
-    if not reservation:
-        raise HTTPException(status_code=404, detail="Reservation not found")
-
-    # Update only provided fields
-    update_data = request.dict(exclude_unset=True)
-    for key, value in update_data.items():
-        setattr(reservation, key, value)
-
-    db.commit()
-    db.refresh(reservation)
+    async def edit(db: AsyncSession):
+        # Find reservation
+        reservation = await db.get(models.Reservations, reservation_id)
+        if not reservation:
+            if await archive.is_archived(db, reservation_id):
+                raise HTTPException(status_code=409, detail="Reservation is archived and can no longer be changed")
+            raise HTTPException(status_code=404, detail="Reservation not found")
+
+        # Update only provided fields
+        before = rollups.contribution(reservation)
+        update_data = request.dict(exclude_unset=True)
+        for key, value in update_data.items():
+            setattr(reservation, key, value)
+        deltas = rollups.difference(before, rollups.contribution(reservation))
+        # Nights the edit adds are claimed like a new booking's
+        if not await inventory.claim_deltas(db, deltas):
+            await db.rollback()
+            raise HTTPException(status_code=409, detail="No available rooms of the requested type for the new dates")
+        await rollups.apply_async(db, deltas)
+
+        await db.commit()
+        await db.refresh(reservation)
+        return reservation
+
+    reservation = await inventory.with_retries(AsyncSessionLocal, edit)
+    room_index.upsert_reservation(reservation)
+    guest_index.upsert_reservation(reservation)
+    await entity_cache.invalidate("reservation", reservation_id)
+    event_bus.publish_reservations([reservation])
     return reservation
 
 
-@app.put("/rooms/", response_model= RoomBase)
-def edit_room(
+@router.put("/rooms/", response_model= RoomBase)
+async def edit_room(
     room_number: str = Query(..., alias="roomnumber"),
     request: schemas.RoomUpdate = Body(...),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     # Find room
-    room = db.query(models.Room).filter(models.Room.room_number).first()
+    room = await db.get(models.Room, room_number)
     if not room:
         raise HTTPException(status_code=404, detail="Room not found")
 
@@ -364,38 +464,347 @@ def edit_room(
     for key, value in update_data.items():
         setattr(room, key, value)
 
-    db.commit()
-    db.refresh(room)
+    await conditional.bump(db, "rooms")
+    await db.commit()
+    await db.refresh(room)
+    room_index.upsert_room(room)
+    await invalidate_rooms(room_number)
+    event_bus.publish_rooms([room])
     return room
 
 
-@app.put("/roomhk/", response_model=List[schemas.RoomBase])
-def edit_roomhk(
+@router.put("/roomhk/", response_model=List[schemas.RoomBase])
+async def edit_roomhk(
     room_numbers: List[str] = Query(..., alias="roomnumber"),
     request: schemas.RoomUpdate = Body(...),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
-    updated_rooms = []
-    for r in room_numbers:
-        print(r)
+    # Room columns are NOT NULL, so an explicit null means "leave as is"
+    update_data = request.dict(exclude_none=True)
+    rooms = await bulk_ops.update_rooms(db, room_numbers, update_data) if update_data else \
+        (await db.execute(rooms_query().where(models.Room.room_number.in_(room_numbers)))).all()
+    found = {room.room_number for room in rooms}
+    missing = [r for r in room_numbers if r not in found]
+    if missing:
+        await db.rollback()
+        raise HTTPException(status_code=404, detail=f"Room {missing[0]} not found")
+
+    await db.commit()
+    for room in rooms:
+        room_index.upsert_room(room)
+    await invalidate_rooms(*found)
+    if update_data:
+        event_bus.publish_rooms(rooms)
+    return rows_response(rooms)
+
+
+# -------- Bulk status changes (one UPDATE per request) --------
+@router.put("/rooms/bulk", response_model=schemas.BulkResult)
+async def bulk_update_rooms(request: schemas.BulkRoomUpdate, db: AsyncSession = Depends(get_async_db)):
+    update_data = request.dict(exclude_none=True, exclude={"room_numbers"})
+    if not update_data:
+        raise HTTPException(status_code=400, detail="Nothing to update")
+    try:
+        rooms = await bulk_ops.update_rooms(db, request.room_numbers, update_data)
+        await db.commit()
+    except IntegrityError:
+        await db.rollback()
+        raise HTTPException(status_code=400, detail="Invalid room_type, status or room_condition")
+
+    by_number = {room.room_number: room for room in rooms}
+    for room in rooms:
+        room_index.upsert_room(room)
+    await invalidate_rooms(*by_number)
+    event_bus.publish_rooms(rooms)
+    results = [
+        {"key": number, "ok": True, "status": by_number[number].status} if number in by_number
+        else {"key": number, "ok": False, "error": "Room not found"}
+        for number in dict.fromkeys(request.room_numbers)
+    ]
+    return {"updated": len(rooms), "failed": len(results) - len(rooms), "results": results}
+
+
+async def _group_transition(reservation_ids: List[int], target: str, db: AsyncSession):
+    # Departing stays leave their rooms dirty in the same transaction, as in the night audit
+    rooms = await bulk_ops.vacate_rooms(db, reservation_ids) if target == "checked_out" else []
+    rows, errors = await bulk_ops.transition_reservations(db, reservation_ids, target)
+    await db.commit()
+    if rooms:
+        for room in rooms:
+            room_index.upsert_room(room)
+        await invalidate_rooms(*(room.room_number for room in rooms))
+        event_bus.publish_rooms(rooms)
+    for row in rows:
+        room_index.upsert_reservation(row)
+        guest_index.update_fields(row.reservation_id, status=row.status)
+    await entity_cache.invalidate("reservation", *(row.reservation_id for row in rows))
+    event_bus.publish_reservations(rows)
+    results = [
+        {"key": str(rid), "ok": False, "error": errors[rid]} if rid in errors
+        else {"key": str(rid), "ok": True, "status": target}
+        for rid in dict.fromkeys(reservation_ids)
+    ]
+    return {"updated": len(rows), "failed": len(errors), "results": results}
 
-    for r in room_numbers:
-        room = db.query(models.Room).filter(models.Room.room_number == r).first()
-        if not room:
-            raise HTTPException(status_code=404, detail=f"Room {r} not found")
 
-        update_data = request.dict(exclude_unset=True)
-        for key, value in update_data.items():
-            setattr(room, key, value)
+@router.post("/reservations/checkin", response_model=schemas.BulkResult)
+async def group_checkin(request: schemas.BulkReservationIds, db: AsyncSession = Depends(get_async_db)):
+    return await _group_transition(request.reservation_ids, "checked_in", db)
 
-        updated_rooms.append(room)
 
-    db.commit()
+@router.post("/reservations/checkout", response_model=schemas.BulkResult)
+async def group_checkout(request: schemas.BulkReservationIds, db: AsyncSession = Depends(get_async_db)):
+    return await _group_transition(request.reservation_ids, "checked_out", db)
 
-    # Refresh only updated rooms
-    for room in updated_rooms:
-        db.refresh(room)
 
-    return updated_rooms
+# -------- Batch room assignment --------
+@router.post("/assignments")
+async def assign_rooms(
+    date_from: date = Query(..., alias="from"),
+    date_to: date = Query(..., alias="to"),
+    dry_run: bool = False,
+    db: AsyncSession = Depends(get_async_db)
+):
+    if date_to < date_from:
+        raise HTTPException(status_code=400, detail="'to' must not be before 'from'")
+
+    rooms, held, pending = [(await db.execute(stmt)).all() for stmt in assignment.load_statements(date_from, date_to)]
+    # The solve is pure CPU; keep it off the event loop
+    result = await run_in_threadpool(assignment.timed_plan, rooms, held, pending, date_from)
+    if result["assignments"] and not dry_run:
+        await db.execute(assignment.write_back_statement(), assignment.write_back_params(result["assignments"]))
+        # Stays assigned or cancelled meanwhile were left alone; publish only what was stored
+        assignment.confirm(result, (await db.execute(assignment.written_query(result["assignments"]))).all())
+        await db.commit()
+        assigned = result["assignments"]
+        placed = [
+            SimpleNamespace(
+                reservation_id=stay.reservation_id, room_number=assigned[stay.reservation_id],
+                room_type=stay.room_type, check_in=stay.check_in, check_out=stay.check_out, status="booked",
+            )
+            for stay in pending if stay.reservation_id in assigned
+        ]
+        for stay in placed:
+            room_index.upsert_reservation(stay)
+            guest_index.update_fields(stay.reservation_id, room_number=stay.room_number)
+        await entity_cache.invalidate("reservation", *assigned)
+        event_bus.publish_reservations(placed)
+
+    result["dry_run"] = dry_run
+    result["assignments"] = [{"reservation_id": rid, "room_number": room} for rid, room in result["assignments"].items()]
+    return result
+
+
+# -------- Live change events (server-sent events) --------
+@router.get("/events")
+async def get_events(
+    request: Request,
+    topic: Optional[List[str]] = Query(None, description="room and/or reservation (default both)"),
+    room_type: Optional[List[str]] = Query(None),
+    room_number: Optional[List[str]] = Query(None),
+    status: Optional[List[str]] = Query(None),
+    last_event_id: Optional[str] = Query(None, description="Resume point for clients that cannot send Last-Event-ID"),
+):
+    unknown = set(topic or ()) - set(TOPICS)
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown topic {sorted(unknown)[0]!r}; use one of {list(TOPICS)}")
+    event_filter = EventFilter(topic, room_type, room_number, status)
+    return StreamingResponse(
+        event_bus.stream(request.headers.get("last-event-id") or last_event_id, event_filter),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
 
+# -------- Night audit --------
+@router.post("/night-audit")
+async def run_night_audit(business_date: Optional[date] = Query(None, alias="date")):
+    # Chunked, committed batches on the sync engine; keep them off the event loop
+    report = await run_in_threadpool(audit.run, engine, business_date or date.today())
+    changes = report.pop("changes")
+    stays, rooms = changes["reservations"], changes["rooms"]
+    for stay in stays:
+        room_index.upsert_reservation(stay)
+        guest_index.update_fields(stay.reservation_id, status=stay.status)
+    for room in rooms:
+        room_index.upsert_room(room)
+    await entity_cache.invalidate("reservation", *(stay.reservation_id for stay in stays))
+    await invalidate_rooms(*{room.room_number for room in rooms})
+    event_bus.publish_reservations(stays)
+    event_bus.publish_rooms(rooms)
+    return report
+
+
+# -------- Rate quotes --------
+@router.post("/quote", response_model=schemas.QuoteResponse)
+async def quote_stays(request: schemas.QuoteRequest):
+    return Response(dumps({"quotes": rate_card().quote_many(request.stays)}), media_type="application/json")
+
+
+# -------- Occupancy report (served from daily_rollups) --------
+def _occupancy(rooms_available: int, row: dict) -> dict:
+    sold, revenue = row["rooms_sold"], Decimal(row["revenue"]).quantize(rollups.CENT)
+    return {
+        "rooms_available": rooms_available,
+        **row,
+        "revenue": revenue,
+        "occupancy": round(sold / rooms_available, 4) if rooms_available else 0.0,
+        "adr": (revenue / sold).quantize(rollups.CENT) if sold else Decimal("0.00"),
+        "revpar": (revenue / rooms_available).quantize(rollups.CENT) if rooms_available else Decimal("0.00"),
+    }
+
+
+@router.get("/reports/occupancy", response_model=schemas.OccupancyReport)
+async def get_occupancy_report(
+    date_from: date = Query(..., alias="from"),
+    date_to: date = Query(..., alias="to"),
+    room_type: Optional[str] = None,
+    db: AsyncSession = Depends(get_read_db)
+):
+    if date_to < date_from:
+        raise HTTPException(status_code=400, detail="'to' must not be before 'from'")
+    if (date_to - date_from).days > 3660:
+        raise HTTPException(status_code=400, detail="Report range is limited to ten years")
+
+    rooms_available = sum(count for _, count in (await db.execute(rollups.room_count_query(room_type))).all())
+    days = {}
+    for row in (await db.execute(rollups.report_query(date_from, date_to, room_type))).mappings():
+        day = days.setdefault(row["stay_date"], dict.fromkeys(rollups.COUNTERS, 0))
+        for counter in rollups.COUNTERS:
+            day[counter] += row[counter]
+
+    report_days, totals = [], dict.fromkeys(rollups.COUNTERS, 0)
+    for n in range((date_to - date_from).days + 1):
+        stay_date = date_from + timedelta(days=n)
+        day = days.get(stay_date, dict.fromkeys(rollups.COUNTERS, 0))
+        for counter in rollups.COUNTERS:
+            totals[counter] += day[counter]
+        report_days.append({"stay_date": stay_date, **_occupancy(rooms_available, day)})
+
+    return {
+        "date_from": date_from,
+        "date_to": date_to,
+        "room_type": room_type,
+        "days": report_days,
+        "totals": _occupancy(rooms_available * len(report_days), totals),
+    }
+
+
+# -------- Internal diagnostics --------
+@router.get("/metrics", include_in_schema=False)
+async def get_metrics():
+    return Response(metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+@router.get("/internal/pool")
+async def get_pool_status(request: Request):
+    return {
+        "async": pool_status(async_engine.sync_engine),
+        "sync": pool_status(engine),
+        "password_hashing": password_pool_status(),
+        "entity_cache": entity_cache.status(),
+        "events": event_bus.status(),
+        "replicas": request.app.state.replica_set.status(),
+    }
+
+
+# -------- Background archival --------
+async def _archive_periodically(interval: float):
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            # Short pauses between batches leave room for request traffic
+            await run_in_threadpool(archive.archive, engine, archive.cutoff(), pause=0.05)
+        except Exception:
+            logging.getLogger("hotel.archive").exception("archive run failed; retrying next interval")
+
+
+# -------- Application factory --------
+def create_app(settings: Optional[Settings] = None) -> FastAPI:
+    """Build the app. Nothing touches the database until startup; the schema is managed by migrate.py.
+
+    The indexes and the entity cache are process-wide, so one process serves one app. There is no
+    module-level instance: run ``uvicorn --factory main:create_app``.
+    """
+    settings = settings or Settings.from_env()
+    app = FastAPI()
+    app.state.settings = settings
+    entity_cache.backend = make_backend(settings.cache_backend)
+    event_relay = make_relay(settings.event_relay)
+
+    app.add_middleware(MetricsMiddleware)
+    metrics.instrument(engine)
+    metrics.instrument(async_engine.sync_engine)
+
+    # Each app owns its replica engines and disposes them at shutdown
+    replica_set = app.state.replica_set = ReplicaSet(settings.replica_urls)
+    if replica_set.replicas:
+        app.add_middleware(PrimaryPinMiddleware, seconds=settings.primary_pin_seconds)
+        for replica in replica_set.replicas:
+            metrics.instrument(replica.engine.sync_engine)
+
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=list(settings.cors_origins),
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+        expose_headers=[NEXT_CURSOR_HEADER, "ETag", "Last-Modified"],
+    )
+    app.include_router(router)
+
+    @app.on_event("startup")
+    def check_secrets():
+        check_session_secret()
+
+    @app.on_event("startup")
+    async def check_schema():
+        if settings.require_migrations:
+            pending = await run_in_threadpool(pending_versions)
+            if pending:
+                raise RuntimeError(f"Pending schema migrations {pending}; run `python migrate.py` first")
+
+    @app.on_event("startup")
+    async def load_room_index():
+        if settings.warm_indexes:
+            async with AsyncSessionLocal() as db:
+                await db.run_sync(room_index.load_from_db)
+                await db.run_sync(guest_index.load_from_db)
+
+    @app.on_event("startup")
+    async def start_archiver():
+        if settings.archive_interval_minutes > 0:
+            app.state.archiver = asyncio.create_task(_archive_periodically(settings.archive_interval_minutes * 60))
+
+    @app.on_event("startup")
+    async def start_replica_checks():
+        if replica_set.replicas:
+            app.state.replica_monitor = asyncio.create_task(replica_set.monitor(settings.replica_check_seconds))
+
+    @app.on_event("startup")
+    async def start_event_relay():
+        if event_relay:
+            app.state.event_relay = asyncio.create_task(event_bus.relay(event_relay))
+
+    @app.on_event("shutdown")
+    def stop_password_pool():
+        shutdown_password_pool()
+
+    @app.on_event("shutdown")
+    def stop_archiver():
+        if getattr(app.state, "archiver", None):
+            app.state.archiver.cancel()
+
+    @app.on_event("shutdown")
+    def stop_event_relay():
+        if getattr(app.state, "event_relay", None):
+            app.state.event_relay.cancel()
+
+    @app.on_event("shutdown")
+    async def stop_replicas():
+        if getattr(app.state, "replica_monitor", None):
+            app.state.replica_monitor.cancel()
+        await replica_set.dispose()
+
+    return app
 
@@ -1,22 +1,183 @@
-from sqlalchemy.orm import Session
+import argparse
+import random
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+
+from sqlalchemy import insert
+
+import conditional
 import models
-from database import SessionLocal
-
-def seed_rooms():
-    db: Session = SessionLocal()
-    rooms = [
-        {"room_number": "101", "room_type": "Single", "status": "vacant", "room_condition": "clean", "created_by": 1},
-        {"room_number": "102", "room_type": "Double", "status": "vacant", "room_condition": "clean", "created_by": 1},
-        {"room_number": "103", "room_type": "Double", "status": "vacant", "room_condition": "clean", "created_by": 1},
-        {"room_number": "104", "room_type": "Single", "status": "vacant", "room_condition": "clean", "created_by": 1},
-        {"room_number": "105", "room_type": "Double", "status": "vacant", "room_condition": "clean", "created_by": 1},
-    ]
+import rollups
+from database import engine
+from migrate import migrate
+
+ROOM_TYPES = ("Single", "Double")
+ROLES = ("admin", "manager", "frontdesk")
+NIGHTLY_RATE = {"Single": 80, "Double": 120}
+# Relative weight of each stay length in nights (1..14); most stays are short
+STAY_WEIGHTS = [30, 25, 15, 10, 6, 4, 4, 1, 1, 1, 1, 0.5, 0.5, 1]
+STAY_LENGTHS = list(range(1, len(STAY_WEIGHTS) + 1))
+CANCEL_RATE = 0.05
+FIRST_NAMES = ("James", "Mary", "Ravi", "Priya", "Chen", "Aisha", "Lucas", "Sofia", "Omar", "Yuki",
+               "Anna", "David", "Fatima", "Sanjay", "Elena", "Kwame", "Laura", "Mateo", "Ines", "Noah")
+LAST_NAMES = ("Smith", "Kumar", "Garcia", "Nguyen", "Mueller", "Okafor", "Rossi", "Sato", "Patel", "Brown",
+              "Silva", "Khan", "Jensen", "Lopez", "Ivanova", "Reddy", "Cohen", "Moreau", "Kim", "Wilson")
+# One shared hash for generated users (password: "password") - bcrypt per user would dominate the run
+DEFAULT_PASSWORD_HASH = "$2b$12$RNHf.FHNGtqHSiiCDG05zuFqL9EeMB2l7rtFB.KY1DJwFiQgajzuO"
+
+
+def insert_ignore(table, dialect_name: str):
+    """INSERT that skips rows whose key already exists, so re-running a seed is a no-op."""
+    if dialect_name == "mysql":
+        return insert(table).prefix_with("IGNORE")
+    if dialect_name == "sqlite":
+        return insert(table).prefix_with("OR IGNORE")
+    if dialect_name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as pg_insert
+        return pg_insert(table).on_conflict_do_nothing()
+    return insert(table)
+
+
+def generate_users(count: int):
+    for user_id in range(1, count + 1):
+        yield {
+            "user_id": user_id,
+            "name": f"user{user_id}",
+            "email": f"user{user_id}@hotel.example",
+            "password": DEFAULT_PASSWORD_HASH,
+            "role": ROLES[(user_id - 1) % len(ROLES)],
+        }
+
+
+def room_numbers(count: int, per_floor: int = 50):
+    for i in range(count):
+        floor, index = divmod(i, per_floor)
+        yield f"{floor + 1}{index + 1:02d}"
+
+
+def generate_rooms(count: int, rng: random.Random):
+    for number in room_numbers(count):
+        yield {
+            "room_number": number,
+            "room_type": rng.choice(ROOM_TYPES),
+            "status": "vacant",
+            "room_condition": "clean",
+            "created_by": 1,
+        }
+
+
+def generate_reservations(rooms, users: int, start: date, days: int, occupancy: float,
+                          today: date, unassigned_rate: float, rng: random.Random):
+    """Walk each room's calendar laying stays end to end with idle gaps sized for `occupancy`."""
+    mean_stay = sum(n * w for n, w in zip(STAY_LENGTHS, STAY_WEIGHTS)) / sum(STAY_WEIGHTS)
+    mean_gap = mean_stay * (1 - occupancy) / occupancy if occupancy < 1 else 0
+    end = start + timedelta(days=days)
+    reservation_id = 0
     for room in rooms:
-        existing = db.query(models.Room).filter_by(room_number=room["room_number"]).first()
-        if not existing:
-            db.add(models.Room(**room))
-    db.commit()
-    db.close()
+        rate = NIGHTLY_RATE[room["room_type"]]
+        day = start + timedelta(days=int(rng.expovariate(1 / mean_gap)) if mean_gap else 0)
+        while day < end:
+            nights = rng.choices(STAY_LENGTHS, STAY_WEIGHTS)[0]
+            check_out = day + timedelta(days=nights)
+            if rng.random() < CANCEL_RATE:
+                status = "cancelled"
+            elif check_out <= today:
+                status = "checked_out"
+            elif day <= today:
+                status = "checked_in"
+            else:
+                status = "booked"
+            assigned = status != "booked" or rng.random() >= unassigned_rate
+            first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+            reservation_id += 1
+            yield {
+                "reservation_id": reservation_id,
+                "first_name": first,
+                "last_name": last,
+                "email": f"{first}.{last}.{reservation_id}@guest.example".lower(),
+                "phone_number": f"+1{rng.randrange(10**9, 10**10)}",
+                "check_in": day,
+                "check_out": check_out,
+                "total_amount": Decimal(rate * nights + rng.randrange(0, 20 * nights)),
+                "address": f"{rng.randrange(1, 999)} Main Street",
+                "credit_card_number": "4111111111111111",
+                "cc_expiry": "12/30",
+                "status": status,
+                "room_type": room["room_type"],
+                "room_number": room["room_number"] if assigned else None,
+                "created_by": rng.randrange(1, users + 1),
+            }
+            gap = int(rng.expovariate(1 / mean_gap)) if mean_gap else 0
+            day = check_out + timedelta(days=gap)
+
+
+def _write(conn, stmt, rows, batch_size: int) -> int:
+    written, batch = 0, []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= batch_size:
+            conn.execute(stmt, batch)
+            written += len(batch)
+            batch = []
+    if batch:
+        conn.execute(stmt, batch)
+        written += len(batch)
+    return written
+
+
+def seed(db_engine=engine, rooms: int = 5, users: int = 3, days: int = 0, start: date = None,
+         occupancy: float = 0.75, unassigned_rate: float = 0.5, seed: int = 42,
+         batch_size: int = 10000, today: date = None) -> dict:
+    if not 0 < occupancy <= 1:
+        raise ValueError("occupancy must be in (0, 1]")
+    rng = random.Random(seed)
+    today = today or date.today()
+    start = start or today - timedelta(days=days // 2)
+    dialect = db_engine.dialect.name
+    stats = {}
+
+    migrate(db_engine)
+    room_rows = list(generate_rooms(rooms, rng))
+    steps = [
+        ("users", models.User.__table__, generate_users(users)),
+        ("rooms", models.Room.__table__, room_rows),
+        ("reservations", models.Reservations.__table__,
+         generate_reservations(room_rows, users, start, days, occupancy, today, unassigned_rate, rng)),
+    ]
+    for name, table, rows in steps:
+        started = time.perf_counter()
+        with db_engine.begin() as conn:
+            count = _write(conn, insert_ignore(table, dialect), rows, batch_size)
+            if name == "rooms":
+                conditional.bump_sync(conn, "rooms")
+        stats[name] = {"rows": count, "seconds": round(time.perf_counter() - started, 2)}
+
+    # Raw inserts bypass the incremental rollup updates, so recompute them from scratch
+    started = time.perf_counter()
+    with db_engine.begin() as conn:
+        count = rollups.rebuild(conn, batch_size=batch_size)
+    stats["daily_rollups"] = {"rows": count, "seconds": round(time.perf_counter() - started, 2)}
+    return stats
+
 
 if __name__ == "__main__":
-    seed_rooms()
+    parser = argparse.ArgumentParser(description="Seed users, rooms and a synthetic reservation history")
+    parser.add_argument("--rooms", type=int, default=5)
+    parser.add_argument("--users", type=int, default=3)
+    parser.add_argument("--days", type=int, default=0, help="days of reservations to generate (0 = none)")
+    parser.add_argument("--start", type=date.fromisoformat, default=None,
+                        help="first day of the reservation calendar (default: centred on today)")
+    parser.add_argument("--today", type=date.fromisoformat, default=None,
+                        help="date that splits past/in-house/future stays (pin it for reproducible runs)")
+    parser.add_argument("--occupancy", type=float, default=0.75)
+    parser.add_argument("--unassigned-rate", type=float, default=0.5,
+                        help="share of future bookings left without a room")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--batch-size", type=int, default=10000)
+    args = parser.parse_args()
+    for table, result in seed(
+        rooms=args.rooms, users=args.users, days=args.days, start=args.start, occupancy=args.occupancy,
+        unassigned_rate=args.unassigned_rate, seed=args.seed, batch_size=args.batch_size, today=args.today,
+    ).items():
+        print(f"{table}: {result['rows']} rows in {result['seconds']}s")
@@ -0,0 +1,198 @@
+"""Request and database metrics in Prometheus text format.
+
+``MetricsMiddleware`` is a plain ASGI middleware (no per-request task or body
+buffering) that times every HTTP request and records a latency histogram,
+status codes per route template, plus the in-flight count per method. ``instrument``
+hooks an engine's cursor events so each request also gets its SQL statement
+count and database time. Everything is rendered by ``render()`` for
+``GET /metrics``.
+"""
+import threading
+import time
+from bisect import bisect_left
+from collections import defaultdict
+from contextvars import ContextVar
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy import event
+
+# Seconds; the usual Prometheus client defaults
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+UNMATCHED = "<unmatched>"
+
+
+class RequestStats:
+    """Per-request counters, reachable from engine events through a context variable."""
+    __slots__ = ("scope", "queries", "db_seconds", "shapes")
+
+    def __init__(self, scope):
+        self.scope = scope
+        self.queries = 0
+        self.db_seconds = 0.0
+        # Statement shape -> runs, filled in only when database query diagnostics are on
+        self.shapes = None
+
+    @property
+    def route(self) -> str:
+        # FastAPI stores the matched route in the scope before the endpoint runs
+        route = self.scope.get("route")
+        return getattr(route, "path", None) or UNMATCHED
+
+
+current_request: ContextVar[Optional[RequestStats]] = ContextVar("current_request", default=None)
+
+
+class Histogram:
+    __slots__ = ("counts", "total", "count")
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(BUCKETS, value)] += 1
+        self.total += value
+        self.count += 1
+
+
+class Registry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latency: Dict[Tuple[str, str], Histogram] = defaultdict(Histogram)
+        self.responses: Dict[Tuple[str, str, int], int] = defaultdict(int)
+        # Updated on the event loop thread only
+        self.in_flight: Dict[str, int] = defaultdict(int)
+        self.queries: Dict[Tuple[str, str], int] = defaultdict(int)
+        self.db_seconds: Dict[Tuple[str, str], float] = defaultdict(float)
+        # Statements run outside any request (startup, shutdown, scripts)
+        self.background_queries = 0
+        self.background_db_seconds = 0.0
+
+    def finish(self, method: str, stats: RequestStats, status: int, elapsed: float):
+        key = (method, stats.route)
+        with self._lock:
+            self.latency[key].observe(elapsed)
+            self.responses[(method, key[1], status)] += 1
+            self.queries[key] += stats.queries
+            self.db_seconds[key] += stats.db_seconds
+
+    def background(self, elapsed: float):
+        with self._lock:
+            self.background_queries += 1
+            self.background_db_seconds += elapsed
+
+
+registry = Registry()
+
+
+class MetricsMiddleware:
+    def __init__(self, app, registry: Registry = registry):
+        self.app = app
+        self.registry = registry
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        stats = RequestStats(scope)
+        token = current_request.set(stats)
+        status = 500
+        method = scope["method"]
+        self.registry.in_flight[method] += 1
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            self.registry.in_flight[method] -= 1
+            current_request.reset(token)
+            self.registry.finish(method, stats, status, time.perf_counter() - started)
+
+
+# ---------------- Engine events ----------------
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["query_started"].pop()
+    stats = current_request.get()
+    if stats is None:
+        registry.background(elapsed)
+    else:
+        stats.queries += 1
+        stats.db_seconds += elapsed
+
+
+def _handle_error(context):
+    # A failed statement never reaches after_cursor_execute; drop its start time
+    started = context.connection.info.get("query_started") if context.connection is not None else None
+    if started:
+        started.pop()
+
+
+def instrument(sync_engine):
+    """Count statements and DB time per request on an Engine (use ``async_engine.sync_engine`` for async)."""
+    if not event.contains(sync_engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(sync_engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(sync_engine, "after_cursor_execute", _after_cursor_execute)
+        event.listen(sync_engine, "handle_error", _handle_error)
+
+
+# ---------------- Exposition ----------------
+def _labels(**labels) -> str:
+    def escape(value) -> str:
+        return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+    return "{" + ",".join(f'{name}="{escape(value)}"' for name, value in labels.items()) + "}"
+
+
+def render(registry: Registry = registry) -> str:
+    lines = []
+    with registry._lock:
+        latency = {key: (list(h.counts), h.total, h.count) for key, h in registry.latency.items()}
+        responses = dict(registry.responses)
+        queries = dict(registry.queries)
+        db_seconds = dict(registry.db_seconds)
+        background = (registry.background_queries, registry.background_db_seconds)
+    in_flight = dict(registry.in_flight)
+
+    lines += ["# HELP http_request_duration_seconds Request latency by route.",
+              "# TYPE http_request_duration_seconds histogram"]
+    for (method, route), (counts, total, count) in sorted(latency.items()):
+        cumulative = 0
+        for bound, bucket in zip(BUCKETS + (float("inf"),), counts):
+            cumulative += bucket
+            le = "+Inf" if bound == float("inf") else repr(bound)
+            lines.append(f"http_request_duration_seconds_bucket{_labels(method=method, route=route, le=le)} {cumulative}")
+        lines.append(f"http_request_duration_seconds_sum{_labels(method=method, route=route)} {total}")
+        lines.append(f"http_request_duration_seconds_count{_labels(method=method, route=route)} {count}")
+
+    lines += ["# HELP http_responses_total Responses by route and status code.",
+              "# TYPE http_responses_total counter"]
+    for (method, route, status), count in sorted(responses.items()):
+        lines.append(f"http_responses_total{_labels(method=method, route=route, status=status)} {count}")
+
+    lines += ["# HELP http_requests_in_flight Requests currently being served.",
+              "# TYPE http_requests_in_flight gauge"]
+    for method, count in sorted(in_flight.items()):
+        lines.append(f"http_requests_in_flight{_labels(method=method)} {count}")
+
+    lines += ["# HELP db_queries_total SQL statements executed, by the route that ran them.",
+              "# TYPE db_queries_total counter"]
+    for (method, route), count in sorted(queries.items()):
+        lines.append(f"db_queries_total{_labels(method=method, route=route)} {count}")
+    lines.append(f"db_queries_total{_labels(method='', route='<background>')} {background[0]}")
+
+    lines += ["# HELP db_query_duration_seconds_total Time spent in SQL statements, by route.",
+              "# TYPE db_query_duration_seconds_total counter"]
+    for (method, route), seconds in sorted(db_seconds.items()):
+        lines.append(f"db_query_duration_seconds_total{_labels(method=method, route=route)} {seconds}")
+    lines.append(f"db_query_duration_seconds_total{_labels(method='', route='<background>')} {background[1]}")
+    return "\n".join(lines) + "\n"
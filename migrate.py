@@ -0,0 +1,166 @@
+"""Schema migrations.
+
+Each migration runs once per database and is recorded in ``schema_migrations``.
+
+    python migrate.py            # apply pending migrations
+    python migrate.py --status   # list applied / pending
+"""
+import argparse
+
+from sqlalchemy import (CheckConstraint, Column, DECIMAL, Date, DateTime, ForeignKey, Integer, MetaData, String,
+                        Table, inspect, select)
+from sqlalchemy.sql import func
+
+import conditional
+import models
+import rollups
+from database import engine
+
+migration_metadata = MetaData()
+schema_migrations = Table(
+    "schema_migrations",
+    migration_metadata,
+    Column("version", String(100), primary_key=True),
+    Column("applied_at", DateTime(timezone=True), server_default=func.now()),
+)
+
+
+# The schema as first shipped, frozen here so that 0001 keeps creating exactly these tables;
+# everything added since (indexes, tables, columns) belongs to its own migration below
+baseline_metadata = MetaData()
+Table(
+    "users", baseline_metadata,
+    Column("user_id", Integer, primary_key=True, index=True),
+    Column("name", String(50), unique=True, index=True, nullable=False),
+    Column("email", String(100), unique=True, index=True, nullable=False),
+    Column("password", String(100), nullable=False),
+    Column("role", String(20), nullable=False),
+    Column("created_at", DateTime(timezone=True), server_default=func.now()),
+    Column("updated_at", DateTime(timezone=True)),
+    CheckConstraint("role IN ('admin', 'manager', 'frontdesk')", name="usercheck"),
+)
+Table(
+    "rooms", baseline_metadata,
+    Column("room_number", String(10), primary_key=True, index=True),
+    Column("room_type", String(20), nullable=False),
+    Column("status", String(20), nullable=False),
+    Column("room_condition", String(20), nullable=False),
+    Column("created_at", DateTime(timezone=True), server_default=func.now()),
+    Column("updated_at", DateTime(timezone=True)),
+    Column("created_by", Integer, ForeignKey("users.user_id"), nullable=False),
+    Column("updated_by", Integer, ForeignKey("users.user_id"), nullable=True),
+    CheckConstraint("room_type IN ('Single', 'Double')", name="room_type"),
+    CheckConstraint("status IN ('vacant', 'occupied', 'maintenance', 'housekeeping')", name="room_status"),
+    CheckConstraint("room_condition IN ('clean', 'dirty', 'under_maintenance')", name="room_condition"),
+)
+Table(
+    "reservations", baseline_metadata,
+    Column("reservation_id", Integer, primary_key=True, index=True),
+    Column("first_name", String(50), nullable=False),
+    Column("last_name", String(50), nullable=False),
+    Column("email", String(100), nullable=False),
+    Column("check_in", Date, nullable=False),
+    Column("check_out", Date, nullable=False),
+    Column("phone_number", String(15), nullable=False),
+    Column("total_amount", DECIMAL(10, 2), nullable=False),
+    Column("address", String(200), nullable=False),
+    Column("credit_card_number", String(20), nullable=False),
+    Column("cc_expiry", String(5), nullable=False),
+    Column("created_at", DateTime(timezone=True), server_default=func.now()),
+    Column("updated_at", DateTime(timezone=True)),
+    Column("created_by", Integer, ForeignKey("users.user_id"), nullable=False),
+    Column("updated_by", Integer, ForeignKey("users.user_id"), nullable=True),
+    Column("status", String(20), nullable=False),
+    Column("room_type", String(20), nullable=True),
+    Column("room_number", String(10), ForeignKey("rooms.room_number"), nullable=True),
+)
+
+
+def initial_schema(conn):
+    baseline_metadata.create_all(bind=conn)
+
+
+def create_indexes(*indexes):
+    def apply(conn):
+        for index in indexes:
+            index.create(bind=conn, checkfirst=True)
+    return apply
+
+
+def daily_rollups(conn):
+    rollups.rollups.create(bind=conn, checkfirst=True)
+    # reservations_archive only arrives in 0005
+    rollups.rebuild(conn, sources=(models.Reservations,))
+
+
+def change_counters(conn):
+    models.ChangeCounter.__table__.create(bind=conn, checkfirst=True)
+    conditional.bump_sync(conn, "rooms")
+
+
+def reservations_archive(conn):
+    models.ReservationArchive.__table__.create(bind=conn, checkfirst=True)
+
+
+def _index(table, name):
+    return next(index for index in table.indexes if index.name == name)
+
+
+reservations = models.Reservations.__table__
+rooms = models.Room.__table__
+
+MIGRATIONS = [
+    ("0001_initial_schema", initial_schema),
+    ("0002_reservation_access_path_indexes", create_indexes(
+        _index(reservations, "ix_reservations_check_in_status"),
+        _index(reservations, "ix_reservations_check_out"),
+        _index(reservations, "ix_reservations_status_check_out"),
+        _index(rooms, "ix_rooms_room_type_status"),
+    )),
+    ("0003_daily_rollups", daily_rollups),
+    ("0004_change_counters", change_counters),
+    ("0005_reservations_archive", reservations_archive),
+    ("0006_inhouse_keyset_index", create_indexes(_index(reservations, "ix_reservations_status_reservation_id"))),
+]
+
+
+def applied_versions(db_engine=engine) -> set:
+    migration_metadata.create_all(bind=db_engine)
+    with db_engine.connect() as conn:
+        return set(conn.execute(select(schema_migrations.c.version)).scalars())
+
+
+def pending_versions(db_engine=engine) -> list:
+    """Migrations not yet applied; read-only, unlike ``applied_versions``."""
+    with db_engine.connect() as conn:
+        if not inspect(conn).has_table(schema_migrations.name):
+            done = set()
+        else:
+            done = set(conn.execute(select(schema_migrations.c.version)).scalars())
+    return [version for version, _ in MIGRATIONS if version not in done]
+
+
+def migrate(db_engine=engine) -> list:
+    done = applied_versions(db_engine)
+    applied = []
+    for version, apply in MIGRATIONS:
+        if version in done:
+            continue
+        with db_engine.begin() as conn:
+            apply(conn)
+            conn.execute(schema_migrations.insert().values(version=version))
+        applied.append(version)
+    return applied
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Apply database schema migrations")
+    parser.add_argument("--status", action="store_true", help="list migrations without applying them")
+    args = parser.parse_args()
+    if args.status:
+        done = applied_versions()
+        for version, _ in MIGRATIONS:
+            print(f"{'applied' if version in done else 'pending'}  {version}")
+    else:
+        applied = migrate()
+        print("\n".join(f"applied  {version}" for version in applied) or "up to date")
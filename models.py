@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DECIMAL, Date, DateTime, ForeignKey, CheckConstraint
+from sqlalchemy import Column, Integer, String, DECIMAL, Date, DateTime, ForeignKey, CheckConstraint, Index, Table
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 from database import Base
@@ -22,6 +22,12 @@ class User(Base):
 # ---------------- Reservations ----------------
 class Reservations(Base):
     __tablename__ = "reservations"
+    __table_args__ = (
+        Index("ix_reservations_check_in_status", "check_in", "status"),  # /arrivals, /checkins
+        Index("ix_reservations_check_out", "check_out"),  # /departures
+        Index("ix_reservations_status_check_out", "status", "check_out"),  # availability index load, night audit
+        Index("ix_reservations_status_reservation_id", "status", "reservation_id"),  # /inhouse keyset pages
+    )
 
     reservation_id = Column(Integer, primary_key=True, index=True)
     first_name = Column(String(50), nullable=False)
@@ -47,6 +53,20 @@ class Reservations(Base):
     room = relationship("Room", back_populates="reservations")
 
 
+# ---------------- Reservation archive ----------------
+# Finished stays moved out of the hot table by archive.py: same columns, no foreign keys
+class ReservationArchive(Base):
+    __table__ = Table(
+        "reservations_archive",
+        Base.metadata,
+        *(Column(column.name, column.type, primary_key=column.primary_key, nullable=column.nullable,
+                 autoincrement=False)
+          for column in Reservations.__table__.columns),
+        Column("archived_at", DateTime(timezone=True), server_default=func.now()),
+        Index("ix_reservations_archive_check_out", "check_out"),
+    )
+
+
 # ---------------- Room ----------------
 class Room(Base):
     __tablename__ = "rooms"
@@ -54,6 +74,7 @@ class Room(Base):
         CheckConstraint("room_type IN ('Single', 'Double')", name="room_type"),
         CheckConstraint("status IN ('vacant', 'occupied', 'maintenance', 'housekeeping')", name="room_status"),
         CheckConstraint("room_condition IN ('clean', 'dirty', 'under_maintenance')", name="room_condition"),
+        Index("ix_rooms_room_type_status", "room_type", "status"),  # vacant room lookup
     )
 
     room_number = Column(String(10), primary_key=True, index=True)
@@ -67,3 +88,26 @@ class Room(Base):
 
     # Relationship
     reservations = relationship("Reservations", back_populates="room")
+
+
+# ---------------- Daily rollups ----------------
+class DailyRollup(Base):
+    __tablename__ = "daily_rollups"
+
+    stay_date = Column(Date, primary_key=True)
+    room_type = Column(String(20), primary_key=True)
+    rooms_sold = Column(Integer, nullable=False, default=0)
+    revenue = Column(DECIMAL(14, 2), nullable=False, default=0)
+    arrivals = Column(Integer, nullable=False, default=0)
+    departures = Column(Integer, nullable=False, default=0)
+    cancellations = Column(Integer, nullable=False, default=0)
+
+
+# ---------------- Change counters ----------------
+# One row per table whose list endpoint answers conditional GETs; every write bumps it
+class ChangeCounter(Base):
+    __tablename__ = "change_counters"
+
+    name = Column(String(50), primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
+    changed_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
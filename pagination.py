@@ -0,0 +1,42 @@
+from typing import Callable, Optional
+
+from fastapi.responses import StreamingResponse
+
+from database import AsyncSessionLocal
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+# Rows fetched per round trip when streaming from a server-side cursor
+STREAM_BATCH_SIZE = 1000
+
+
+def keyset(stmt, key_column, after=None, limit: Optional[int] = None):
+    """Order by the key and, for a page, start after the last key the client saw."""
+    stmt = stmt.order_by(key_column)
+    if after is not None:
+        stmt = stmt.where(key_column > after)
+    if limit:
+        stmt = stmt.limit(limit)
+    return stmt
+
+
+def next_cursor_headers(rows, key: str, limit: Optional[int]) -> dict:
+    # A short page is the last one; otherwise hand back the key to continue from
+    if limit and len(rows) == limit:
+        return {NEXT_CURSOR_HEADER: str(getattr(rows[-1], key))}
+    return {}
+
+
+def ndjson_response(stmt, to_json: Callable[[object], bytes], bind=None) -> StreamingResponse:
+    """Stream rows as NDJSON from a server-side cursor, one batch in memory at a time.
+
+    The request's session dependency is closed before the body is sent, so the
+    stream opens its own session for as long as it runs, on `bind` (the
+    request session's engine, e.g. a replica) or else the primary.
+    """
+    async def body():
+        async with (AsyncSessionLocal(bind=bind) if bind is not None else AsyncSessionLocal()) as db:
+            result = await db.stream(stmt.execution_options(yield_per=STREAM_BATCH_SIZE))
+            async for rows in result.partitions():
+                yield b"".join(to_json(row) + b"\n" for row in rows)
+
+    return StreamingResponse(body(), media_type="application/x-ndjson")
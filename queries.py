@@ -0,0 +1,138 @@
+from datetime import date
+
+from sqlalchemy import Integer, and_, select
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.functions import FunctionElement
+
+import models
+
+# Statement builders shared by the endpoints in main.py and the EXPLAIN
+# checks in query_plans.py. main.py pages the list queries with
+# pagination.keyset(), and query_plans.py checks them through that same
+# call, so the plans we check are the plans we run.
+
+res = models.Reservations
+
+
+class days_between(FunctionElement):
+    """Whole days from the first date to the second, computed by the database."""
+    type = Integer()
+    inherit_cache = True
+
+
+@compiles(days_between)
+def _days_between(element, compiler, **kw):
+    start, end = list(element.clauses)
+    return f"({compiler.process(end, **kw)} - {compiler.process(start, **kw)})"
+
+
+@compiles(days_between, "mysql")
+def _days_between_mysql(element, compiler, **kw):
+    start, end = list(element.clauses)
+    return f"DATEDIFF({compiler.process(end, **kw)}, {compiler.process(start, **kw)})"
+
+
+@compiles(days_between, "sqlite")
+def _days_between_sqlite(element, compiler, **kw):
+    start, end = list(element.clauses)
+    return f"CAST(julianday({compiler.process(end, **kw)}) - julianday({compiler.process(start, **kw)}) AS INTEGER)"
+
+
+def arrivals_query(check_in_date: date):
+    return select(
+        res.reservation_id,
+        res.first_name,
+        res.last_name,
+        res.check_in,
+        res.check_out,
+        days_between(res.check_in, res.check_out).label("days"),
+        res.room_number,
+        res.room_type
+    ).filter(
+        and_(
+            res.check_in == check_in_date,
+            res.status == "booked"
+        )
+    )
+
+
+def departures_query(check_out_date: date):
+    return select(
+        res.reservation_id,
+        res.first_name,
+        res.last_name,
+        res.room_number,
+        res.room_type
+    ).filter(res.check_out == check_out_date)
+
+
+def inhouse_query(status: str):
+    return select(
+        res.reservation_id,
+        res.first_name,
+        res.last_name,
+        res.check_in,
+        res.check_out,
+        days_between(res.check_in, res.check_out).label("days"),
+        res.room_number,
+        res.room_type
+    ).filter(res.status == status)
+
+
+def checkins_query(check_in_date, status: str):
+    return select(
+        res.reservation_id,
+        res.first_name,
+        res.last_name,
+        res.check_in,
+        res.check_out
+    ).filter(
+        and_(
+            res.check_in == check_in_date,
+            res.status == status
+        )
+    )
+
+
+def live_assignments_query(since: date):
+    # Room-held stays that still have nights after `since` (feeds the availability index)
+    return select(
+        res.reservation_id,
+        res.room_number,
+        res.check_in,
+        res.check_out,
+        res.status
+    ).filter(
+        and_(
+            res.status.in_(["booked", "checked_in"]),
+            res.check_out > since,
+            res.room_number.isnot(None)
+        )
+    )
+
+
+def unassigned_query(date_from: date, date_to: date):
+    # Booked stays still waiting for a room, arriving inside the window (feeds the assignment engine)
+    return select(
+        res.reservation_id,
+        res.room_type,
+        res.check_in,
+        res.check_out
+    ).filter(
+        and_(
+            res.check_in >= date_from,
+            res.check_in <= date_to,
+            res.status == "booked",
+            res.room_number.is_(None)
+        )
+    )
+
+
+def rooms_query():
+    return select(
+        models.Room.room_number,
+        models.Room.room_type,
+        models.Room.status,
+        models.Room.room_condition
+    )
+
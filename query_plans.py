@@ -0,0 +1,121 @@
+"""Query-plan regression check.
+
+Seeds a large dataset (or uses --database-url), runs EXPLAIN on the statement
+behind each endpoint (list endpoints as keyset pages, the way main.py runs
+them) and exits non-zero if any of them falls back to a full table or index
+scan.
+
+    python query_plans.py --rooms 2000 --days 365
+    python query_plans.py --database-url mysql+pymysql://user:pw@host/hotel_db
+"""
+import argparse
+import os
+import sys
+import tempfile
+from datetime import date, timedelta
+
+from sqlalchemy import create_engine, text
+
+PLAN_TODAY = date(2025, 6, 1)
+# Page shape for the keyset-paged list endpoints (?limit=, ?after=)
+PLAN_PAGE_SIZE = 100
+PLAN_AFTER_ID = 1000
+
+
+def endpoint_queries(today: date):
+    # Imported late: database.py reads DATABASE_URL at import time
+    import archive
+    import audit
+    import inventory
+    import models
+    import queries
+    import rollups
+    from pagination import keyset
+    from sqlalchemy import update
+
+    # The list endpoints run their query through keyset(); check a first page and an after= page
+    reservation_lists = {
+        "/arrivals": queries.arrivals_query(today),
+        "/departures": queries.departures_query(today),
+        "/inhouse/{rstatus}": queries.inhouse_query("checked_in"),
+        "/checkins": queries.checkins_query(today, "booked"),
+    }
+    pages = {}
+    for name, stmt in reservation_lists.items():
+        pages[f"{name} (first page)"] = keyset(stmt, models.Reservations.reservation_id, None, PLAN_PAGE_SIZE)
+        pages[f"{name} (after= page)"] = keyset(stmt, models.Reservations.reservation_id, PLAN_AFTER_ID, PLAN_PAGE_SIZE)
+
+    return {
+        **pages,
+        "/reservations/ (room-type capacity)": inventory.capacity_query("Double"),
+        "/reservations/ (night claim)": update(rollups.rollups).where(
+            rollups.rollups.c.room_type == "Double",
+            rollups.rollups.c.stay_date >= today,
+            rollups.rollups.c.stay_date < today + timedelta(days=3),
+            rollups.rollups.c.rooms_sold < inventory.capacity_query("Double").scalar_subquery(),
+        ).values(rooms_sold=rollups.rollups.c.rooms_sold + 1),
+        "availability index load": queries.live_assignments_query(today),
+        "/assignments (unassigned bookings)": queries.unassigned_query(today, today + timedelta(days=30)),
+        "/reports/occupancy": rollups.report_query(today, today + timedelta(days=364)),
+        "/night-audit (no-shows)": audit.no_shows_query(today, audit.AUDIT_CHUNK_SIZE),
+        "/night-audit (departures)": audit.departures_query(today, audit.AUDIT_CHUNK_SIZE),
+        "archive.py (candidate batch)": archive.candidates_query(archive.cutoff(today), archive.ARCHIVE_BATCH_SIZE),
+    }
+
+
+def explain(conn, stmt):
+    """Return (plan lines, full scan found) for a statement on this connection's dialect."""
+    dialect = conn.dialect
+    sql = str(stmt.compile(dialect=dialect, compile_kwargs={"literal_binds": True}))
+    if dialect.name == "sqlite":
+        rows = conn.execute(text("EXPLAIN QUERY PLAN " + sql)).all()
+        lines = [row[-1] for row in rows]
+        # "SCAN t" is a table scan and "SCAN t USING INDEX i" walks the whole index
+        full_scan = any(line.startswith("SCAN") for line in lines)
+    elif dialect.name == "mysql":
+        rows = conn.execute(text("EXPLAIN " + sql)).mappings().all()
+        lines = [f"{row['table']}: type={row['type']} key={row['key']} rows={row['rows']}" for row in rows]
+        full_scan = any(row["type"] in ("ALL", "index") for row in rows)
+    else:
+        raise SystemExit(f"EXPLAIN check not implemented for {dialect.name}")
+    return lines, full_scan
+
+
+def check(db_engine, today: date) -> int:
+    failures = 0
+    with db_engine.connect() as conn:
+        for name, stmt in endpoint_queries(today).items():
+            lines, full_scan = explain(conn, stmt)
+            failures += full_scan
+            print(f"{'FULL SCAN' if full_scan else 'ok':9}  {name}")
+            for line in lines:
+                print(f"           {line}")
+    return failures
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fail if any endpoint query plan is a full scan")
+    parser.add_argument("--database-url", help="check an existing database instead of seeding SQLite")
+    parser.add_argument("--rooms", type=int, default=2000)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    if args.database_url:
+        db_engine = create_engine(args.database_url)
+        today = date.today()
+    else:
+        db_path = os.path.join(tempfile.mkdtemp(prefix="hotel-plans-"), "plans.db")
+        os.environ["DATABASE_URL"] = f"sqlite:///{db_path}"
+        import master_data
+        from database import engine as db_engine
+        from migrate import migrate
+
+        today = PLAN_TODAY
+        migrate(db_engine)
+        print(master_data.seed(db_engine, rooms=args.rooms, users=20, days=args.days, seed=args.seed,
+                               start=today - timedelta(days=args.days // 2), today=today))
+        with db_engine.begin() as conn:
+            conn.execute(text("ANALYZE"))
+
+    sys.exit(1 if check(db_engine, today) else 0)
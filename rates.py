@@ -0,0 +1,147 @@
+"""Server-side stay pricing.
+
+A rate card gives each room type a base nightly rate. That rate is scaled by a
+day-of-week multiplier and by the last matching season, and the stay total
+gets the best length-of-stay discount it qualifies for::
+
+    {
+      "base": {"Single": "80.00", "Double": "120.00"},
+      "weekday": {"fri": 1.15, "sat": 1.25},
+      "seasons": [{"from": "2025-12-20", "to": "2026-01-03", "multiplier": 1.4, "room_types": ["Double"]}],
+      "length_of_stay": [{"min_nights": 3, "discount": 0.05}, {"min_nights": 7, "discount": 0.10}]
+    }
+
+``RATES_FILE`` points at such a JSON file (``DEFAULT_RATES`` otherwise).
+
+For every room type the card keeps nightly prices in cents for the next
+``HORIZON_DAYS`` days, indexed by date, as a running total. The subtotal of
+any stay is then the difference of two entries,
+``prefix[check_out] - prefix[check_in]``. That is constant work however long
+the stay is, so a request can price thousands of candidate stays. Identical
+stays are memoized per card. The card is rebuilt when the date rolls over or
+the file changes.
+"""
+import json
+import os
+import threading
+from datetime import date, timedelta
+from decimal import ROUND_HALF_UP, Decimal
+from functools import lru_cache
+from itertools import accumulate
+from typing import Dict, List, Optional
+
+from rollups import CENT
+
+RATES_FILE = os.getenv("RATES_FILE")
+HORIZON_DAYS = int(os.getenv("RATES_HORIZON_DAYS", "730"))
+QUOTE_CACHE_SIZE = 65536
+WEEKDAYS = ("mon", "tue", "wed", "thu", "fri", "sat", "sun")
+
+DEFAULT_RATES = {
+    "base": {"Single": "80.00", "Double": "120.00"},
+    "weekday": {"fri": 1.15, "sat": 1.15},
+    "seasons": [],
+    "length_of_stay": [{"min_nights": 3, "discount": 0.05}, {"min_nights": 7, "discount": 0.10}],
+}
+
+
+class QuoteError(ValueError):
+    pass
+
+
+class RateCard:
+    def __init__(self, config: dict, today: Optional[date] = None):
+        self.origin = today or date.today()
+        self.horizon = HORIZON_DAYS
+        self.base = {room_type: Decimal(str(rate)) for room_type, rate in config["base"].items()}
+        weekday = config.get("weekday", {})
+        unknown = set(weekday) - set(WEEKDAYS)
+        if unknown:
+            raise ValueError(f"Unknown weekday {sorted(unknown)[0]!r}; use {', '.join(WEEKDAYS)}")
+        self.weekday = [Decimal(str(weekday.get(day, 1))) for day in WEEKDAYS]
+        self.seasons = [
+            (date.fromisoformat(season["from"]), date.fromisoformat(season["to"]),
+             Decimal(str(season["multiplier"])), set(season.get("room_types") or self.base))
+            for season in config.get("seasons", [])
+        ]
+        # Longest qualifying tier first
+        self.length_of_stay = sorted(
+            ((tier["min_nights"], Decimal(str(tier["discount"]))) for tier in config.get("length_of_stay", [])),
+            reverse=True,
+        )
+        self.prefix: Dict[str, List[int]] = {
+            room_type: list(accumulate(self._nightly_cents(room_type), initial=0)) for room_type in self.base
+        }
+        self._quote = lru_cache(maxsize=QUOTE_CACHE_SIZE)(self._quote_uncached)
+
+    def _nightly_cents(self, room_type: str):
+        base = self.base[room_type] * 100
+        for offset in range(self.horizon):
+            night = self.origin + timedelta(days=offset)
+            multiplier = self.weekday[night.weekday()]
+            # Later seasons override earlier ones
+            for start, end, season_multiplier, room_types in reversed(self.seasons):
+                if start <= night <= end and room_type in room_types:
+                    multiplier *= season_multiplier
+                    break
+            yield int((base * multiplier).quantize(Decimal(1), rounding=ROUND_HALF_UP))
+
+    def _quote_uncached(self, room_type: str, check_in: date, check_out: date) -> dict:
+        prefix = self.prefix.get(room_type)
+        if prefix is None:
+            raise QuoteError(f"No rate for room type {room_type!r}")
+        nights = (check_out - check_in).days
+        if nights <= 0:
+            raise QuoteError("check_out must be after check_in")
+        start = (check_in - self.origin).days
+        if start < 0:
+            raise QuoteError("check_in is in the past")
+        if start + nights > self.horizon:
+            raise QuoteError(f"Rates are only loaded {self.horizon} days ahead")
+
+        subtotal = (Decimal(prefix[start + nights] - prefix[start]) / 100).quantize(CENT)
+        rate = next((discount for min_nights, discount in self.length_of_stay if nights >= min_nights), Decimal(0))
+        discount = (subtotal * rate).quantize(CENT, rounding=ROUND_HALF_UP)
+        # Amounts leave as strings (the API's Decimal format), so memoized quotes serialize without conversion
+        return {"nights": nights, "subtotal": str(subtotal), "discount": str(discount), "total": str(subtotal - discount)}
+
+    def quote(self, room_type: str, check_in: date, check_out: date) -> dict:
+        return self._quote(room_type, check_in, check_out)
+
+    def quote_many(self, stays) -> List[dict]:
+        """Price many stays; a stay that cannot be priced carries `error` instead of amounts."""
+        quotes = []
+        for stay in stays:
+            item = {"room_type": stay.room_type, "check_in": stay.check_in, "check_out": stay.check_out}
+            try:
+                item.update(self._quote(stay.room_type, stay.check_in, stay.check_out))
+            except QuoteError as exc:
+                item["error"] = str(exc)
+            quotes.append(item)
+        return quotes
+
+
+_lock = threading.Lock()
+_card: Optional[RateCard] = None
+_card_source = None
+
+
+def _source():
+    return (RATES_FILE, os.path.getmtime(RATES_FILE)) if RATES_FILE else None
+
+
+def load_config() -> dict:
+    if not RATES_FILE:
+        return DEFAULT_RATES
+    with open(RATES_FILE) as f:
+        return json.load(f)
+
+
+def rate_card() -> RateCard:
+    """The current card, rebuilt when the day changes or RATES_FILE is edited."""
+    global _card, _card_source
+    source = _source()
+    with _lock:
+        if _card is None or _card.origin != date.today() or _card_source != source:
+            _card, _card_source = RateCard(load_config()), source
+        return _card
@@ -0,0 +1,140 @@
+"""Read replicas for the read-only endpoints.
+
+With ``DB_REPLICA_URLS`` set, the read-only handlers take their session from
+``main.get_read_db``. Each request goes to the next healthy replica in turn,
+or to the primary when none is healthy. Writes always use the primary.
+
+A background check runs ``SELECT 1`` on every replica every
+``DB_REPLICA_CHECK_SECONDS``. A replica that fails or times out is skipped
+until it answers again, and so is one whose connection drops mid-request.
+
+Replicas lag the primary. After a successful write (any method but
+GET/HEAD/OPTIONS answered below 400), ``PrimaryPinMiddleware`` sets a
+``db_primary_until`` cookie, so that client's reads stay on the primary for
+``DB_PRIMARY_PIN_SECONDS`` and it reads its own writes. Over HTTPS the cookie
+is ``SameSite=None; Secure`` so cross-site frontends send it back (with
+``credentials: "include"``); over plain HTTP it is ``SameSite=Lax``. Clients
+that drop cookies are not pinned.
+
+    DB_REPLICA_URLS=mysql+pymysql://hotel_ro@replica1/hotel_db,mysql+pymysql://hotel_ro@replica2/hotel_db
+    DB_PRIMARY_PIN_SECONDS=5  DB_REPLICA_CHECK_SECONDS=5
+"""
+import asyncio
+import logging
+import time
+from typing import Iterable, List, Optional
+
+from sqlalchemy import text
+
+from database import make_async_engine, pool_status
+
+logger = logging.getLogger("hotel.replicas")
+
+PIN_COOKIE = "db_primary_until"
+SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+
+
+class Replica:
+    def __init__(self, url: str):
+        self.url = url
+        self.engine = make_async_engine(url)
+        # Assumed healthy until a check says otherwise
+        self.healthy = True
+        self.last_error: Optional[str] = None
+
+    def mark_down(self, error: str):
+        if self.healthy:
+            logger.warning("replica %s is down: %s", self.name, error)
+        self.healthy, self.last_error = False, error
+
+    def mark_up(self):
+        if not self.healthy:
+            logger.info("replica %s is back", self.name)
+        self.healthy, self.last_error = True, None
+
+    @property
+    def name(self) -> str:
+        # The URL without its credentials
+        return self.engine.url.render_as_string(hide_password=True)
+
+
+class ReplicaSet:
+    def __init__(self, urls: Iterable[str] = ()):
+        self.replicas: List[Replica] = []
+        self._next = 0
+        self.configure(urls)
+
+    def configure(self, urls: Iterable[str]):
+        self.replicas = [Replica(url) for url in urls]
+        self._next = 0
+
+    def pick(self) -> Optional[Replica]:
+        """The next healthy replica, round-robin, or None to read from the primary."""
+        for _ in range(len(self.replicas)):
+            replica = self.replicas[self._next % len(self.replicas)]
+            self._next += 1
+            if replica.healthy:
+                return replica
+        return None
+
+    async def check(self, timeout: float):
+        async def probe(replica: Replica):
+            async def select_one():
+                async with replica.engine.connect() as conn:
+                    await conn.execute(text("SELECT 1"))
+
+            try:
+                # The timeout covers connecting too: an unreachable host hangs in connect, not in the query
+                await asyncio.wait_for(select_one(), timeout)
+            except Exception as exc:
+                replica.mark_down(f"{type(exc).__name__}: {exc}")
+            else:
+                replica.mark_up()
+
+        await asyncio.gather(*(probe(replica) for replica in self.replicas))
+
+    async def monitor(self, interval: float):
+        while True:
+            await self.check(timeout=interval)
+            await asyncio.sleep(interval)
+
+    async def dispose(self):
+        for replica in self.replicas:
+            await replica.engine.dispose()
+
+    def status(self) -> list:
+        return [{"url": replica.name, "healthy": replica.healthy, "last_error": replica.last_error,
+                 **pool_status(replica.engine.sync_engine)} for replica in self.replicas]
+
+
+def pinned(request) -> bool:
+    """Whether the client wrote recently enough that it must read from the primary."""
+    try:
+        return float(request.cookies.get(PIN_COOKIE, 0)) > time.time()
+    except ValueError:
+        return False
+
+
+class PrimaryPinMiddleware:
+    """Sets the pin cookie on every successful write response."""
+
+    def __init__(self, app, seconds: float):
+        self.app = app
+        self.seconds = seconds
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] in SAFE_METHODS:
+            return await self.app(scope, receive, send)
+
+        # Cross-site fetches only carry SameSite=None cookies, which browsers accept only with Secure;
+        # over plain HTTP (local development) the cookie still works for same-site pages
+        same_site = "SameSite=None; Secure" if scope.get("scheme") == "https" else "SameSite=Lax"
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start" and message["status"] < 400:
+                until = time.time() + self.seconds
+                cookie = f"{PIN_COOKIE}={until:.3f}; Max-Age={int(self.seconds + 1)}; Path=/; HttpOnly; {same_site}"
+                message = {**message, "headers": [*message.get("headers", []), (b"set-cookie", cookie.encode())]}
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
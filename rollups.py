@@ -0,0 +1,193 @@
+"""Daily occupancy and revenue rollups.
+
+One ``daily_rollups`` row per (stay_date, room_type). Each reservation
+contributes a night sold and its share of ``total_amount`` to every night of
+its stay, an arrival on check_in and a departure on check_out; a cancelled
+reservation contributes one cancellation on its check_in date. Writes apply
+the difference between a reservation's old and new contribution in the same
+transaction, and ``rebuild`` recomputes a date range from scratch.
+
+    python rollups.py rebuild --from 2025-01-01 --to 2025-12-31
+"""
+import argparse
+from collections import defaultdict
+from datetime import date, timedelta
+from decimal import ROUND_DOWN, Decimal
+from types import SimpleNamespace
+from typing import Dict, Iterable, Optional, Tuple
+
+from sqlalchemy import and_, delete, func, insert, select
+
+import models
+
+rollups = models.DailyRollup.__table__
+res = models.Reservations
+
+# Stays that occupy rooms; anything else (cancelled, no_show) sells nothing
+SOLD_STATUSES = ("booked", "checked_in", "checked_out")
+COUNTERS = ("rooms_sold", "revenue", "arrivals", "departures", "cancellations")
+CENT = Decimal("0.01")
+
+Deltas = Dict[Tuple[date, str], Dict[str, object]]
+
+
+def _as_date(value) -> date:
+    return date.fromisoformat(value[:10]) if isinstance(value, str) else value
+
+
+def contribution(reservation) -> Deltas:
+    """What one reservation adds to the rollups, keyed by (stay_date, room_type)."""
+    deltas = _empty()
+    check_in, check_out = _as_date(reservation.check_in), _as_date(reservation.check_out)
+    room_type = reservation.room_type
+    if reservation.status == "cancelled":
+        deltas[(check_in, room_type)]["cancellations"] += 1
+        return deltas
+    if reservation.status not in SOLD_STATUSES or check_out <= check_in:
+        return deltas
+
+    nights = (check_out - check_in).days
+    total = Decimal(str(reservation.total_amount)).quantize(CENT)
+    per_night = (total / nights).quantize(CENT, rounding=ROUND_DOWN)
+    for n in range(nights):
+        day = deltas[(check_in + timedelta(days=n), room_type)]
+        day["rooms_sold"] += 1
+        # The first night carries the rounding remainder so nights sum to total_amount
+        day["revenue"] += total - per_night * (nights - 1) if n == 0 else per_night
+    deltas[(check_in, room_type)]["arrivals"] += 1
+    deltas[(check_out, room_type)]["departures"] += 1
+    return deltas
+
+
+def _empty() -> Deltas:
+    return defaultdict(lambda: dict.fromkeys(COUNTERS, 0))
+
+
+def _merge(into: Deltas, deltas: Deltas, sign: int = 1):
+    for key, values in deltas.items():
+        day = into[key]
+        for counter, value in values.items():
+            day[counter] += sign * value
+
+
+def difference(before: Deltas, after: Deltas) -> Deltas:
+    deltas = _empty()
+    _merge(deltas, after)
+    _merge(deltas, before, -1)
+    return deltas
+
+
+def combined(reservations: Iterable) -> Deltas:
+    """Summed contribution of many reservations (rows or row mappings)."""
+    deltas = _empty()
+    for reservation in reservations:
+        if isinstance(reservation, dict):
+            reservation = SimpleNamespace(**reservation)
+        _merge(deltas, contribution(reservation))
+    return deltas
+
+
+def _rows(deltas: Deltas):
+    return [
+        {"stay_date": stay_date, "room_type": room_type, **values}
+        for (stay_date, room_type), values in deltas.items()
+        if any(values.values())
+    ]
+
+
+def upsert(dialect_name: str):
+    """INSERT that adds to the counters of an existing (stay_date, room_type) row."""
+    if dialect_name == "mysql":
+        from sqlalchemy.dialects.mysql import insert as mysql_insert
+        stmt = mysql_insert(rollups)
+        return stmt.on_duplicate_key_update({c: rollups.c[c] + stmt.inserted[c] for c in COUNTERS})
+    if dialect_name in ("sqlite", "postgresql"):
+        if dialect_name == "sqlite":
+            from sqlalchemy.dialects.sqlite import insert as dialect_insert
+        else:
+            from sqlalchemy.dialects.postgresql import insert as dialect_insert
+        stmt = dialect_insert(rollups)
+        return stmt.on_conflict_do_update(
+            index_elements=[rollups.c.stay_date, rollups.c.room_type],
+            set_={c: rollups.c[c] + stmt.excluded[c] for c in COUNTERS},
+        )
+    raise ValueError(f"Unsupported dialect {dialect_name!r} for rollups (supported: mysql, postgresql, sqlite)")
+
+
+def _dialect_name(db) -> str:
+    # Connections carry the dialect directly, sessions through their bind
+    return db.dialect.name if hasattr(db, "dialect") else db.bind.dialect.name
+
+
+def apply(conn, deltas: Deltas):
+    """Add `deltas` inside the caller's transaction (sync Connection or Session)."""
+    rows = _rows(deltas)
+    if rows:
+        conn.execute(upsert(_dialect_name(conn)), rows)
+
+
+async def apply_async(db, deltas: Deltas):
+    """Add `deltas` inside the caller's transaction (AsyncConnection or AsyncSession)."""
+    rows = _rows(deltas)
+    if rows:
+        await db.execute(upsert(_dialect_name(db)), rows)
+
+
+# ---------------- Rebuild ----------------
+def rebuild(conn, date_from: Optional[date] = None, date_to: Optional[date] = None, batch_size: int = 10000,
+            sources=(res, models.ReservationArchive)) -> int:
+    """Recompute rollups for [date_from, date_to] (all dates when omitted) on a sync Connection."""
+    totals = _empty()
+
+    # Any reservation touching the range, hot or archived: a night, its check-out day or its check-in
+    for table in sources:
+        stmt = select(table.check_in, table.check_out, table.room_type, table.status, table.total_amount)
+        if date_from is not None:
+            stmt = stmt.where(table.check_out >= date_from)
+        if date_to is not None:
+            stmt = stmt.where(table.check_in <= date_to)
+        result = conn.execution_options(yield_per=batch_size).execute(stmt)
+        for reservation in result:
+            _merge(totals, contribution(reservation))
+    # Stays that straddle a boundary also contributed to nights outside the range
+    for key in [key for key in totals if (date_from and key[0] < date_from) or (date_to and key[0] > date_to)]:
+        del totals[key]
+
+    clear = delete(rollups)
+    if date_from is not None:
+        clear = clear.where(rollups.c.stay_date >= date_from)
+    if date_to is not None:
+        clear = clear.where(rollups.c.stay_date <= date_to)
+    conn.execute(clear)
+    rows = _rows(totals)
+    for start in range(0, len(rows), batch_size):
+        conn.execute(insert(rollups), rows[start:start + batch_size])
+    return len(rows)
+
+
+# ---------------- Reporting ----------------
+def report_query(date_from: date, date_to: date, room_type: Optional[str] = None):
+    stmt = select(rollups).where(and_(rollups.c.stay_date >= date_from, rollups.c.stay_date <= date_to))
+    if room_type:
+        stmt = stmt.where(rollups.c.room_type == room_type)
+    return stmt
+
+
+def room_count_query(room_type: Optional[str] = None):
+    stmt = select(models.Room.room_type, func.count()).group_by(models.Room.room_type)
+    return stmt.where(models.Room.room_type == room_type) if room_type else stmt
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Maintain the daily occupancy/revenue rollups")
+    commands = parser.add_subparsers(dest="command", required=True)
+    rebuild_parser = commands.add_parser("rebuild", help="recompute rollups for a date range (default: all)")
+    rebuild_parser.add_argument("--from", dest="date_from", type=date.fromisoformat)
+    rebuild_parser.add_argument("--to", dest="date_to", type=date.fromisoformat)
+    args = parser.parse_args()
+
+    from database import engine
+
+    with engine.begin() as conn:
+        count = rebuild(conn, args.date_from, args.date_to)
+    print(f"rebuilt {count} rollup rows")
@@ -1,7 +1,7 @@
 from pydantic import BaseModel, EmailStr, Field, validator
 from datetime import date, datetime
 from decimal import Decimal
-from typing import Optional
+from typing import List, Optional
 
 
 class UserBase(BaseModel):
@@ -28,6 +28,8 @@ class LoginResponse(BaseModel):
     name: str
     email: str
     role: str
+    token: str  # signed session token, sent back as "Authorization: Bearer <token>"
+    token_type: str = "bearer"
 
 class CreateReservation(BaseModel):
     first_name: str = Field(..., max_length=50)
@@ -47,7 +49,7 @@ class CreateReservation(BaseModel):
 
     @validator("status")
     def validate_status(cls, v):
-        allowed = ["booked", "checked_in", "checked_out", "cancelled"]
+        allowed = ["booked", "checked_in", "checked_out", "cancelled", "no_show"]
         if v not in allowed:
             raise ValueError(f"status must be one of {allowed}")
         return v
@@ -167,4 +169,78 @@ class RoomBase(BaseModel):
 class RoomUpdate(BaseModel):
     room_type: Optional[str]
     room_condition: Optional[str]
-    status: Optional[str]
\ No newline at end of file
+    status: Optional[str]
+
+class GuestSearchResult(BaseModel):
+    reservation_id: int
+    first_name: str
+    last_name: str
+    email: str
+    phone_number: str
+    check_in: date
+    check_out: date
+    status: str
+    room_type: Optional[str] = None
+    room_number: Optional[str] = None
+
+class BulkRoomUpdate(BaseModel):
+    room_numbers: List[str] = Field(..., min_length=1, max_length=5000)
+    room_type: Optional[str] = None
+    room_condition: Optional[str] = None
+    status: Optional[str] = None
+
+class BulkReservationIds(BaseModel):
+    reservation_ids: List[int] = Field(..., min_length=1, max_length=5000)
+
+class BulkItemResult(BaseModel):
+    key: str
+    ok: bool
+    status: Optional[str] = None
+    error: Optional[str] = None
+
+class BulkResult(BaseModel):
+    updated: int
+    failed: int
+    results: List[BulkItemResult]
+
+class OccupancyTotals(BaseModel):
+    rooms_available: int
+    rooms_sold: int
+    occupancy: float
+    revenue: Decimal
+    adr: Decimal
+    revpar: Decimal
+    arrivals: int
+    departures: int
+    cancellations: int
+
+class OccupancyDay(OccupancyTotals):
+    stay_date: date
+
+class OccupancyReport(BaseModel):
+    date_from: date
+    date_to: date
+    room_type: Optional[str] = None
+    days: List[OccupancyDay]
+    totals: OccupancyTotals
+
+# Rate quotes
+MAX_QUOTE_STAYS = 10000
+
+class StayQuery(BaseModel):
+    room_type: str
+    check_in: date
+    check_out: date
+
+class QuoteRequest(BaseModel):
+    stays: List[StayQuery] = Field(..., min_length=1, max_length=MAX_QUOTE_STAYS)
+
+class StayQuote(StayQuery):
+    nights: Optional[int] = None
+    subtotal: Optional[Decimal] = None
+    discount: Optional[Decimal] = None
+    total: Optional[Decimal] = None
+    error: Optional[str] = None
+
+class QuoteResponse(BaseModel):
+    quotes: List[StayQuote]
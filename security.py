@@ -0,0 +1,166 @@
+import asyncio
+import base64
+import hashlib
+import hmac
+import json
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Optional
+
+from fastapi import Header, HTTPException
+
+# Password hashing pool: bcrypt is pure CPU, so it runs in worker processes
+PASSWORD_WORKERS = int(os.getenv("PASSWORD_WORKERS", "2"))
+# Jobs allowed to wait for a worker before new ones are turned away with a 503
+PASSWORD_QUEUE_DEPTH = int(os.getenv("PASSWORD_QUEUE_DEPTH", "32"))
+
+# Session tokens; every worker must share SESSION_SECRET or tokens only verify where issued
+SESSION_SECRET = os.getenv("SESSION_SECRET", "").encode()
+SESSION_SECRET_PLACEHOLDER = "REPLACE_WITH_A_LONG_RANDOM_STRING"
+SESSION_SECRET_MIN_LENGTH = 32
+SESSION_TTL = int(os.getenv("SESSION_TTL", "43200"))
+
+_pwd_context = None
+_executor: Optional[ProcessPoolExecutor] = None
+_executor_lock = threading.Lock()
+_in_flight = 0
+
+
+# ---------------- Worker side ----------------
+def _context():
+    global _pwd_context
+    if _pwd_context is None:
+        from passlib.context import CryptContext
+        _pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+    return _pwd_context
+
+
+def _hash(password: str) -> str:
+    return _context().hash(password)
+
+
+def _verify(password: str, hashed: str) -> bool:
+    return _context().verify(password, hashed)
+
+
+# ---------------- Request side ----------------
+def _get_executor() -> ProcessPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(
+                max_workers=PASSWORD_WORKERS, mp_context=multiprocessing.get_context("spawn")
+            )
+        return _executor
+
+
+def _replace_broken(executor: ProcessPoolExecutor):
+    # A pool whose worker died fails every later job; the first caller to notice drops it
+    global _executor
+    with _executor_lock:
+        if _executor is executor:
+            _executor = None
+    executor.shutdown(wait=False, cancel_futures=True)
+
+
+def shutdown_password_pool():
+    global _executor
+    with _executor_lock:
+        executor, _executor = _executor, None
+    if executor is not None:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+async def _submit(fn, *args):
+    global _in_flight
+    if _in_flight >= PASSWORD_WORKERS + PASSWORD_QUEUE_DEPTH:
+        raise HTTPException(
+            status_code=503, detail="Password service busy, retry shortly", headers={"Retry-After": "1"}
+        )
+    _in_flight += 1
+    try:
+        # Retry once on a fresh pool if a worker died (e.g. OOM-killed) under this job
+        for _ in range(2):
+            executor = _get_executor()
+            try:
+                return await asyncio.get_running_loop().run_in_executor(executor, fn, *args)
+            except BrokenProcessPool:
+                _replace_broken(executor)
+        raise HTTPException(
+            status_code=503, detail="Password service unavailable, retry shortly", headers={"Retry-After": "1"}
+        )
+    finally:
+        _in_flight -= 1
+
+
+async def hash_password(password: str) -> str:
+    return await _submit(_hash, password)
+
+
+async def verify_password(password: str, hashed: str) -> bool:
+    return await _submit(_verify, password, hashed)
+
+
+def password_pool_status() -> dict:
+    return {
+        "workers": PASSWORD_WORKERS,
+        "queue_depth": PASSWORD_QUEUE_DEPTH,
+        "in_flight": _in_flight,
+    }
+
+
+# ---------------- Session tokens ----------------
+def _b64(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode()
+
+
+def _unb64(data: str) -> bytes:
+    return base64.urlsafe_b64decode(data + "=" * (-len(data) % 4))
+
+
+def check_session_secret():
+    """Refuse to serve with a missing, placeholder or short SESSION_SECRET (run at app startup)."""
+    hint = "set SESSION_SECRET to the same random value on every worker, " \
+           "e.g. `python -c \"import secrets; print(secrets.token_hex(32))\"`"
+    if not SESSION_SECRET:
+        raise RuntimeError(f"SESSION_SECRET is not set; {hint}")
+    if SESSION_SECRET.decode() == SESSION_SECRET_PLACEHOLDER:
+        raise RuntimeError(f"SESSION_SECRET is still the .env.example placeholder; {hint}")
+    if len(SESSION_SECRET) < SESSION_SECRET_MIN_LENGTH:
+        raise RuntimeError(f"SESSION_SECRET is shorter than {SESSION_SECRET_MIN_LENGTH} characters; {hint}")
+
+
+def _sign(payload: str) -> str:
+    return _b64(hmac.new(SESSION_SECRET, payload.encode(), hashlib.sha256).digest())
+
+
+def issue_token(user_id: int, role: str) -> str:
+    claims = {"sub": user_id, "role": role, "exp": int(time.time()) + SESSION_TTL}
+    payload = _b64(json.dumps(claims, separators=(",", ":")).encode())
+    return f"{payload}.{_sign(payload)}"
+
+
+def read_token(token: str) -> Optional[dict]:
+    payload, _, signature = token.partition(".")
+    if not signature or not hmac.compare_digest(signature, _sign(payload)):
+        return None
+    try:
+        claims = json.loads(_unb64(payload))
+    except ValueError:
+        return None
+    if claims.get("exp", 0) < time.time():
+        return None
+    return claims
+
+
+# Session dependency: checks the signed token instead of the password
+def get_session(authorization: Optional[str] = Header(None)) -> dict:
+    scheme, _, token = (authorization or "").partition(" ")
+    claims = read_token(token) if scheme.lower() == "bearer" else None
+    if claims is None:
+        raise HTTPException(status_code=401, detail="Invalid or expired session", headers={"WWW-Authenticate": "Bearer"})
+    return claims
@@ -0,0 +1,28 @@
+from decimal import Decimal
+
+import orjson
+from fastapi import Response
+
+# Fast path for list endpoints: the statements in queries.py already select
+# exactly the response fields (``days`` included), so rows go straight to
+# orjson without building a Pydantic model per row or re-validating through
+# response_model. The declared response_model still documents the contract.
+
+
+def _default(value):
+    if isinstance(value, Decimal):
+        return str(value)
+    raise TypeError(f"Cannot serialize {type(value).__name__}")
+
+
+def dumps(value) -> bytes:
+    return orjson.dumps(value, default=_default)
+
+
+def row_json(row) -> bytes:
+    return dumps(dict(zip(row._fields, row)))
+
+
+def rows_response(rows, headers=None) -> Response:
+    keys = rows[0]._fields if rows else ()
+    return Response(dumps([dict(zip(keys, row)) for row in rows]), media_type="application/json", headers=headers)
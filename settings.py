@@ -0,0 +1,51 @@
+"""Application settings for ``main.create_app``.
+
+Database and pool settings stay in ``database.py``; these are the options
+that decide what the app does when it is built and started.
+
+    CORS_ORIGINS=*  WARM_INDEXES=true  REQUIRE_MIGRATIONS=true  ARCHIVE_INTERVAL_MINUTES=0
+    DB_REPLICA_URLS=  DB_PRIMARY_PIN_SECONDS=5  DB_REPLICA_CHECK_SECONDS=5  EVENT_RELAY=local
+"""
+import os
+from dataclasses import dataclass
+from typing import Tuple
+
+from cache import CACHE_BACKEND
+from events import EVENT_RELAY
+
+
+def _flag(name: str, default: str) -> bool:
+    return os.getenv(name, default).lower() in ("1", "true", "yes")
+
+
+@dataclass(frozen=True)
+class Settings:
+    cors_origins: Tuple[str, ...] = ("*",)
+    cache_backend: str = CACHE_BACKEND
+    # Share /events between workers: local (per process) or redis (events.py)
+    event_relay: str = EVENT_RELAY
+    # Load the availability and guest search indexes at startup (off for tools and tests that don't need them)
+    warm_indexes: bool = True
+    # Refuse to start while migrate.py has pending migrations
+    require_migrations: bool = True
+    # Run the archive mover in the background every N minutes (0 = leave it to cron / archive.py)
+    archive_interval_minutes: float = 0
+    # Read replicas for the read-only endpoints (replicas.py); none = everything on the primary
+    replica_urls: Tuple[str, ...] = ()
+    # How long a client that wrote keeps reading from the primary
+    primary_pin_seconds: float = 5
+    replica_check_seconds: float = 5
+
+    @classmethod
+    def from_env(cls) -> "Settings":
+        return cls(
+            cors_origins=tuple(origin.strip() for origin in os.getenv("CORS_ORIGINS", "*").split(",") if origin.strip()),
+            cache_backend=CACHE_BACKEND,
+            event_relay=EVENT_RELAY,
+            warm_indexes=_flag("WARM_INDEXES", "true"),
+            require_migrations=_flag("REQUIRE_MIGRATIONS", "true"),
+            archive_interval_minutes=float(os.getenv("ARCHIVE_INTERVAL_MINUTES", "0")),
+            replica_urls=tuple(url.strip() for url in os.getenv("DB_REPLICA_URLS", "").split(",") if url.strip()),
+            primary_pin_seconds=float(os.getenv("DB_PRIMARY_PIN_SECONDS", "5")),
+            replica_check_seconds=float(os.getenv("DB_REPLICA_CHECK_SECONDS", "5")),
+        )
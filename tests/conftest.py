@@ -0,0 +1,43 @@
+"""Shared fixtures: a throwaway SQLite database seeded by ``master_data.seed``.
+
+``database.py`` reads ``DATABASE_URL`` at import, so it is set here before any
+app module is imported.
+"""
+import os
+import tempfile
+from datetime import date, timedelta
+
+DB_PATH = os.path.join(tempfile.mkdtemp(prefix="hotel-tests-"), "hotel.db")
+os.environ["DATABASE_URL"] = f"sqlite:///{DB_PATH}"
+os.environ.setdefault("SESSION_SECRET", "tests-only-session-secret-0123456789abcdef")
+
+import pytest  # noqa: E402
+
+TODAY = date(2025, 6, 1)
+
+
+@pytest.fixture
+def seeded():
+    """A fresh database with 20 rooms, 3 users and no reservations."""
+    import master_data
+    from database import async_engine, engine
+
+    engine.dispose()
+    async_engine.sync_engine.dispose()
+    if os.path.exists(DB_PATH):
+        os.remove(DB_PATH)
+    master_data.seed(rooms=20, users=3, days=0, today=TODAY)
+    yield engine
+    engine.dispose()
+    async_engine.sync_engine.dispose()
+
+
+def booking(check_in, nights: int = 2, room_type: str = "Double", **fields) -> dict:
+    """A ``CreateReservation`` body."""
+    return {
+        "first_name": "Test", "last_name": "Guest", "email": "guest@example.com",
+        "phone_number": "+15550000000", "check_in": check_in.isoformat(),
+        "check_out": (check_in + timedelta(days=nights)).isoformat(), "total_amount": "200.00",
+        "address": "1 Main Street", "credit_card_number": "4111111111111111", "cc_expiry": "12/30",
+        "room_type": room_type, "created_by": 1, **fields,
+    }
@@ -0,0 +1,64 @@
+import asyncio
+from datetime import timedelta
+from types import SimpleNamespace
+
+import httpx
+from sqlalchemy import select, update
+
+import assignment
+import models
+from conftest import TODAY, booking
+
+reservations = models.Reservations.__table__
+
+
+def test_confirm_keeps_only_stored_assignments():
+    result = {"assigned": 3, "skipped": [], "assignments": {1: "101", 2: "102", 3: "103"}}
+    rows = [SimpleNamespace(reservation_id=1, room_number="101"),
+            SimpleNamespace(reservation_id=2, room_number="204"),
+            SimpleNamespace(reservation_id=3, room_number=None)]
+    assignment.confirm(result, rows)
+    assert result["assignments"] == {1: "101"}
+    assert result["skipped"] == [2, 3]
+    assert result["assigned"] == 1
+
+
+def test_write_back_leaves_stays_changed_during_the_solve(seeded, monkeypatch):
+    import main
+    from settings import Settings
+
+    solve = assignment.timed_plan
+    raced = {}
+
+    def racing(rooms, held, pending, window_start):
+        result = solve(rooms, held, pending, window_start)
+        first, second = list(result["assignments"])[:2]
+        other = next(room.room_number for room in rooms if room.room_number != result["assignments"][first])
+        # The front desk places one stay and cancels another while the plan is being solved
+        with seeded.begin() as conn:
+            conn.execute(update(reservations).where(reservations.c.reservation_id == first).values(room_number=other))
+            conn.execute(update(reservations).where(reservations.c.reservation_id == second).values(status="cancelled"))
+        raced.update(first=first, second=second, other=other, planned=len(result["assignments"]))
+        return result
+
+    monkeypatch.setattr(assignment, "timed_plan", racing)
+    app = main.create_app(Settings(warm_indexes=False))
+    window = {"from": TODAY.isoformat(), "to": (TODAY + timedelta(days=7)).isoformat()}
+
+    async def run():
+        async with app.router.lifespan_context(app):
+            async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+                for day in range(3):
+                    assert (await client.post("/reservations/", json=booking(TODAY + timedelta(days=day)))).status_code == 200
+                buffered = main.event_bus.status()["buffered"]
+                result = (await client.post("/assignments", params=window)).json()
+                return result, main.event_bus.status()["buffered"] - buffered
+
+    result, published = asyncio.run(run())
+    assert sorted(result["skipped"]) == sorted([raced["first"], raced["second"]])
+    assert result["assigned"] == raced["planned"] - 2 == len(result["assignments"]) == published
+    assert {a["reservation_id"] for a in result["assignments"]}.isdisjoint(result["skipped"])
+    with seeded.connect() as conn:
+        stored = dict(conn.execute(select(reservations.c.reservation_id, reservations.c.room_number)).all())
+    assert stored[raced["first"]] == raced["other"]
+    assert stored[raced["second"]] is None
@@ -0,0 +1,55 @@
+import asyncio
+
+import httpx
+from sqlalchemy import select, update
+
+import models
+from conftest import TODAY, booking
+
+reservations = models.Reservations.__table__
+rooms = models.Room.__table__
+
+
+def test_group_checkout_reports_each_item_and_dirties_the_rooms(seeded):
+    import main
+    from settings import Settings
+
+    app = main.create_app(Settings(warm_indexes=False))
+    with seeded.connect() as conn:
+        first, second = conn.execute(select(rooms.c.room_number).where(rooms.c.room_type == "Double")
+                                     .order_by(rooms.c.room_number).limit(2)).scalars()
+
+    async def run():
+        async with app.router.lifespan_context(app):
+            async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+                ids = [(await client.post("/reservations/", json=booking(TODAY))).json()["reservation_id"]
+                       for _ in range(3)]
+                # Two stays are in house, one still booked; one room is occupied, the other not
+                with seeded.begin() as conn:
+                    for rid, number in zip(ids, (first, second)):
+                        conn.execute(update(reservations).where(reservations.c.reservation_id == rid)
+                                     .values(status="checked_in", room_number=number))
+                    conn.execute(update(rooms).where(rooms.c.room_number.in_((first, second)))
+                                 .values(room_condition="clean", status="vacant"))
+                    conn.execute(update(rooms).where(rooms.c.room_number == first).values(status="occupied"))
+
+                checkout = await client.post("/reservations/checkout", json={"reservation_ids": [*ids, 999999, ids[0]]})
+                # Housekeeping cleans one room; checking the same stays out again must not undo it
+                with seeded.begin() as conn:
+                    conn.execute(update(rooms).where(rooms.c.room_number == first).values(room_condition="clean"))
+                again = await client.post("/reservations/checkout", json={"reservation_ids": ids[:2]})
+                return ids, checkout.json(), again.json()
+
+    ids, checkout, again = asyncio.run(run())
+    assert checkout["updated"] == 2 and checkout["failed"] == 2
+    assert checkout["results"] == [
+        {"key": str(ids[0]), "ok": True, "status": "checked_out", "error": None},
+        {"key": str(ids[1]), "ok": True, "status": "checked_out", "error": None},
+        {"key": str(ids[2]), "ok": False, "status": None, "error": "Status is 'booked', expected 'checked_in'"},
+        {"key": "999999", "ok": False, "status": None, "error": "Reservation not found"},
+    ]
+    assert again["updated"] == 2 and again["failed"] == 0
+    with seeded.connect() as conn:
+        state = dict(conn.execute(select(rooms.c.room_number, rooms.c.status + "/" + rooms.c.room_condition)
+                                  .where(rooms.c.room_number.in_((first, second)))).all())
+    assert state == {first: "vacant/clean", second: "vacant/dirty"}
@@ -0,0 +1,55 @@
+import asyncio
+
+import httpx
+
+import cache
+from conftest import TODAY, booking
+
+
+class StandInRedis:
+    """The slice of redis.asyncio.Redis that SharedBackend uses, kept in a dict."""
+
+    def __init__(self):
+        self.values = {}
+
+    async def get(self, key):
+        return self.values.get(key)
+
+    async def set(self, key, value, ex=None):
+        self.values[key] = value
+
+    async def delete(self, *keys):
+        for key in keys:
+            self.values.pop(key, None)
+
+
+def test_shared_cache_never_holds_card_data(seeded, monkeypatch):
+    import main
+    from settings import Settings
+
+    client_store = StandInRedis()
+    app = main.create_app(Settings(warm_indexes=False))
+    # create_app picks the configured backend; swap in a shared one over the stand-in client
+    monkeypatch.setattr(main.entity_cache, "backend", cache.SharedBackend(client_store))
+
+    async def run():
+        async with app.router.lifespan_context(app):
+            async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+                created = (await client.post("/reservations/", json=booking(TODAY))).json()
+                params = {"reservationid": created["reservation_id"]}
+                miss, hit = [(await client.get("/reservation/", params=params)) for _ in range(2)]
+                cached = dict(client_store.values)
+                changed = {**created, "credit_card_number": "5500000000000004"}
+                assert (await client.put("/reservation/", params=params, json=changed)).status_code == 200
+                revalidated = await client.get("/reservation/", params=params,
+                                               headers={"If-None-Match": hit.headers["ETag"]})
+                return miss, hit, cached, revalidated
+
+    miss, hit, cached, revalidated = asyncio.run(run())
+    assert miss.json() == hit.json()
+    assert hit.json()["credit_card_number"] == "4111111111111111" and hit.json()["cc_expiry"] == "12/30"
+    assert len(cached) == 1
+    stored = next(iter(cached.values()))
+    assert b"4111111111111111" not in stored and b"cc_expiry" not in stored
+    # The card is part of the ETag even though it is not cached
+    assert revalidated.status_code == 200 and revalidated.json()["credit_card_number"] == "5500000000000004"
@@ -0,0 +1,58 @@
+import asyncio
+from datetime import datetime, timezone
+
+import httpx
+
+import conditional
+
+ROOM = {"room_number": "101", "room_type": "Double", "status": "vacant", "room_condition": "clean",
+        "created_at": "2025-06-01T08:00:00", "updated_at": None}
+
+
+def test_row_etag_is_stable_for_the_same_row():
+    assert conditional.row_validators("room", "101", ROOM) == conditional.row_validators("room", "101", dict(ROOM))
+
+
+def test_row_etag_changes_with_any_field_even_within_the_same_second():
+    etag, _ = conditional.row_validators("room", "101", ROOM)
+    changed, _ = conditional.row_validators("room", "101", {**ROOM, "room_condition": "dirty"})
+    assert changed != etag
+    assert etag.startswith('W/"room-101-') and changed.startswith('W/"room-101-')
+
+
+def test_last_modified_prefers_updated_at_over_created_at():
+    _, created = conditional.row_validators("room", "101", ROOM)
+    assert created == datetime(2025, 6, 1, 8, tzinfo=timezone.utc)
+    _, updated = conditional.row_validators("room", "101", {**ROOM, "updated_at": datetime(2025, 6, 2, 9)})
+    assert updated == datetime(2025, 6, 2, 9, tzinfo=timezone.utc)
+    assert conditional.http_date(updated) == "Mon, 02 Jun 2025 09:00:00 GMT"
+
+
+def test_room_get_revalidates_and_sees_same_second_edits(seeded):
+    import main
+    from settings import Settings
+
+    app = main.create_app(Settings(warm_indexes=False))
+    edit = {"room_type": "Double", "status": "vacant"}
+
+    async def run():
+        async with app.router.lifespan_context(app):
+            async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+                room_number = (await client.get("/rooms/")).json()[0]["room_number"]
+                params = {"roomnumber": room_number}
+                first = await client.get("/roomsn/", params=params)
+                etag = first.headers["ETag"]
+                assert first.headers["Last-Modified"]
+
+                fresh = await client.get("/roomsn/", params=params, headers={"If-None-Match": etag})
+                assert fresh.status_code == 304 and fresh.headers["ETag"] == etag
+
+                # Two edits inside one second share updated_at but not the ETag
+                for condition in ("dirty", "clean", "dirty"):
+                    assert (await client.put("/rooms/", params=params,
+                                             json={**edit, "room_condition": condition})).status_code == 200
+                stale = await client.get("/roomsn/", params=params, headers={"If-None-Match": etag})
+                assert stale.status_code == 200 and stale.headers["ETag"] != etag
+                assert stale.json()["room_condition"] == "dirty"
+
+    asyncio.run(run())
@@ -0,0 +1,72 @@
+import asyncio
+
+from events import EventBus, EventFilter, RedisRelay
+
+
+class FakeRedis:
+    """In-memory stand-in for a redis.asyncio client's publish/pubsub, shared by every "worker"."""
+
+    def __init__(self, subscribers: list):
+        self.subscribers = subscribers
+
+    async def publish(self, channel, message):
+        for queue in list(self.subscribers):
+            queue.put_nowait(message)
+
+    def pubsub(self):
+        return FakePubSub(self.subscribers)
+
+
+class FakePubSub:
+    def __init__(self, subscribers: list):
+        self.subscribers = subscribers
+        self.queue = asyncio.Queue()
+
+    async def subscribe(self, channel):
+        self.subscribers.append(self.queue)
+
+    async def listen(self):
+        while True:
+            message = await self.queue.get()
+            if message is None:
+                raise ConnectionError("connection lost")
+            yield {"type": "message", "data": message}
+
+    async def reset(self):
+        if self.queue in self.subscribers:
+            self.subscribers.remove(self.queue)
+
+
+def topics(bus: EventBus) -> list:
+    return [(topic, data) for _, topic, data, _ in bus._events]
+
+
+def test_events_reach_every_worker_and_drops_reset_streams():
+    async def run():
+        subscribers = []
+        first, second = EventBus(), EventBus()
+        relays = [asyncio.create_task(bus.relay(RedisRelay(FakeRedis(subscribers)), retry_seconds=0.01))
+                  for bus in (first, second)]
+        await asyncio.sleep(0.02)
+
+        stream = second.stream(None, EventFilter(topics=["room"]))
+        await stream.__anext__()  # retry: header
+        received = asyncio.ensure_future(stream.__anext__())
+        first.publish("room", {"room_number": "101", "status": "dirty"})
+        frame = await asyncio.wait_for(received, 1)
+        assert b"event: room" in frame and b'"room_number":"101"' in frame
+        # Each worker keeps a single copy of its own events
+        assert topics(first) == [("room", {"room_number": "101", "status": "dirty"})]
+
+        for queue in list(subscribers):
+            queue.put_nowait(None)
+        await asyncio.sleep(0.05)
+        assert topics(second)[-1] == ("reset", {"reason": "event relay reconnected"})
+        assert second.status()["relay"] == "subscribed"
+
+        for task in relays:
+            task.cancel()
+        await asyncio.gather(*relays, return_exceptions=True)
+        assert first.status()["relay"] == "local"
+
+    asyncio.run(run())
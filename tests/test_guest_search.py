@@ -0,0 +1,29 @@
+from datetime import timedelta
+from types import SimpleNamespace
+
+from conftest import TODAY
+from guest_search import GuestSearchIndex
+
+
+def stay(rid, first, last, days, status="booked"):
+    check_in = TODAY + timedelta(days=days)
+    return SimpleNamespace(reservation_id=rid, first_name=first, last_name=last, email=f"{first}{rid}@example.com",
+                           phone_number=f"+1555000{rid:04d}", check_in=check_in,
+                           check_out=check_in + timedelta(days=2), status=status, room_type="Double",
+                           room_number=None)
+
+
+def search_ids(rows, q):
+    index = GuestSearchIndex()
+    index.load(rows)
+    return [hit["reservation_id"] for hit in index.search(q, today=TODAY, limit=5)]
+
+
+def test_in_house_guests_rank_first_from_either_side_of_the_intersection():
+    smiths = [stay(1, "Mary", "Smith", 1), stay(2, "John", "Smith", -1, "checked_in"), stay(3, "Ann", "Smith", 30)]
+    # Few in-house guests: the in-house set is walked
+    assert search_ids(smiths, "smith") == [2, 1, 3]
+    # Many in-house guests: the matching stays are walked and checked against the in-house set
+    others = [stay(rid, "Guest", f"Other{rid}", -1, "checked_in") for rid in range(10, 30)]
+    assert search_ids(smiths + others, "smith") == [2, 1, 3]
+    assert search_ids(smiths + others, "smith mary") == [1]
@@ -0,0 +1,140 @@
+import asyncio
+import json
+from datetime import timedelta
+from types import SimpleNamespace
+
+import httpx
+from sqlalchemy import select
+
+import bulk_import
+import inventory
+import rollups
+from conftest import TODAY, booking
+from database import AsyncSessionLocal
+
+STAY = TODAY + timedelta(days=30)
+
+
+def capacity(engine, room_type="Double") -> int:
+    with engine.connect() as conn:
+        return conn.execute(inventory.capacity_query(room_type)).scalar()
+
+
+def rooms_sold(engine, room_type="Double") -> dict:
+    table = rollups.rollups
+    with engine.connect() as conn:
+        rows = conn.execute(select(table.c.stay_date, table.c.rooms_sold).where(table.c.room_type == room_type))
+        return {stay_date: sold for stay_date, sold in rows if sold}
+
+
+async def claim(check_in=STAY, check_out=STAY + timedelta(days=2)) -> bool:
+    async with AsyncSessionLocal() as db:
+        claimed = await inventory.claim_nights(db, "Double", check_in, check_out)
+        await (db.commit() if claimed else db.rollback())
+        return claimed
+
+
+def test_claim_nights_stops_at_capacity(seeded):
+    rooms = capacity(seeded)
+    assert [asyncio.run(claim()) for _ in range(rooms + 1)] == [True] * rooms + [False]
+    assert rooms_sold(seeded) == {STAY: rooms, STAY + timedelta(days=1): rooms}
+
+
+def test_claim_nights_fails_when_any_night_is_sold_out(seeded):
+    rooms = capacity(seeded)
+    for _ in range(rooms):
+        assert asyncio.run(claim(STAY + timedelta(days=1), STAY + timedelta(days=2)))
+    assert not asyncio.run(claim())
+    # The rolled-back claim left the free first night alone
+    assert rooms_sold(seeded) == {STAY + timedelta(days=1): rooms}
+
+
+def test_concurrent_claims_never_oversell(seeded):
+    rooms = capacity(seeded)
+
+    async def book(db):
+        claimed = await inventory.claim_nights(db, "Double", STAY, STAY + timedelta(days=3))
+        await (db.commit() if claimed else db.rollback())
+        return claimed
+
+    async def storm():
+        return await asyncio.gather(*(inventory.with_retries(AsyncSessionLocal, book) for _ in range(rooms + 5)))
+
+    assert sum(asyncio.run(storm())) == rooms
+    assert set(rooms_sold(seeded).values()) == {rooms}
+
+
+def test_claim_deltas_claims_only_added_nights(seeded):
+    before = rollups.contribution(SimpleNamespace(**booking(STAY), status="booked"))
+    after = rollups.contribution(SimpleNamespace(**booking(STAY + timedelta(days=1)), status="booked"))
+    deltas = rollups.difference(before, after)
+
+    async def run():
+        async with AsyncSessionLocal() as db:
+            assert await inventory.claim_deltas(db, deltas)
+            await db.commit()
+
+    asyncio.run(run())
+    # Only the night the move adds was claimed and zeroed; the released night is left for apply
+    assert rooms_sold(seeded) == {STAY + timedelta(days=2): 1}
+    assert deltas[(STAY + timedelta(days=2), "Double")]["rooms_sold"] == 0
+    assert deltas[(STAY, "Double")]["rooms_sold"] == -1
+
+
+def test_claim_deltas_refuses_a_sold_out_night(seeded):
+    rooms = capacity(seeded)
+    for _ in range(rooms):
+        assert asyncio.run(claim(STAY + timedelta(days=2), STAY + timedelta(days=3)))
+    deltas = rollups.difference({}, rollups.contribution(SimpleNamespace(**booking(STAY, 3), status="booked")))
+
+    async def run():
+        async with AsyncSessionLocal() as db:
+            claimed = await inventory.claim_deltas(db, deltas)
+            await db.rollback()
+            return claimed
+
+    assert not asyncio.run(run())
+    assert rooms_sold(seeded) == {STAY + timedelta(days=2): rooms}
+
+
+def test_fit_keeps_rows_in_order_until_a_night_is_full():
+    rows = [{**booking(STAY), "status": "booked"} for _ in range(3)]
+    sold = {(STAY, "Double"): 1}
+    kept, sold_out = inventory.fit(rows, sold, {"Double": 3})
+    assert kept == [0, 1]
+    assert sold_out == [(2, f"No available rooms of type Double on {STAY.isoformat()}")]
+
+
+def test_bulk_import_reports_sold_out_lines(seeded):
+    rooms = capacity(seeded)
+    lines = [json.dumps(booking(STAY)) for _ in range(rooms + 2)]
+    report = bulk_import.import_lines(seeded, lines, batch_size=3)
+    assert report["inserted"] == rooms
+    assert report["failed"] == 2
+    assert {error["line"] for error in report["errors"]} == {rooms + 1, rooms + 2}
+    assert set(rooms_sold(seeded).values()) == {rooms}
+
+
+def test_reservation_edit_onto_sold_out_nights_is_refused(seeded):
+    import main
+    from settings import Settings
+
+    rooms = capacity(seeded)
+    app = main.create_app(Settings(warm_indexes=False))
+
+    async def run():
+        async with app.router.lifespan_context(app):
+            async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+                for _ in range(rooms):
+                    assert (await client.post("/reservations/", json=booking(STAY))).status_code == 200
+                moved = (await client.post("/reservations/", json=booking(STAY + timedelta(days=10)))).json()
+                body = {**booking(STAY), "status": "booked", "created_at": moved["created_at"]}
+                response = await client.put("/reservation/", params={"reservationid": moved["reservation_id"]}, json=body)
+                assert response.status_code == 409
+                body = {**booking(STAY + timedelta(days=11)), "status": "booked", "created_at": moved["created_at"]}
+                response = await client.put("/reservation/", params={"reservationid": moved["reservation_id"]}, json=body)
+                assert response.status_code == 200
+
+    asyncio.run(run())
+    assert rooms_sold(seeded) == {STAY: rooms, STAY + timedelta(days=1): rooms,
+                                  STAY + timedelta(days=11): 1, STAY + timedelta(days=12): 1}
@@ -0,0 +1,91 @@
+import asyncio
+import os
+import shutil
+import time
+from types import SimpleNamespace
+
+import httpx
+from sqlalchemy import create_engine, insert
+
+import models
+import replicas
+from conftest import DB_PATH, TODAY, booking
+
+
+async def ok_app(scope, receive, send):
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b""})
+
+
+def pin_cookie(base_url: str) -> str:
+    async def run():
+        app = replicas.PrimaryPinMiddleware(ok_app, seconds=5)
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url=base_url) as client:
+            return (await client.post("/")).headers["set-cookie"]
+
+    return asyncio.run(run())
+
+
+def test_pin_cookie_is_cross_site_over_https():
+    cookie = pin_cookie("https://api.test")
+    assert cookie.startswith(f"{replicas.PIN_COOKIE}=")
+    assert "SameSite=None; Secure" in cookie
+
+
+def test_pin_cookie_is_lax_over_plain_http():
+    assert "SameSite=Lax" in pin_cookie("http://api.test")
+
+
+def test_check_times_out_a_hanging_connect():
+    class HangingConnect:
+        async def __aenter__(self):
+            await asyncio.sleep(30)
+
+        async def __aexit__(self, *exc):
+            return False
+
+    replica_set = replicas.ReplicaSet(["sqlite+aiosqlite://"])
+    replica = replica_set.replicas[0]
+    replica.engine = SimpleNamespace(connect=HangingConnect, url=replica.engine.url)
+    started = time.perf_counter()
+    asyncio.run(replica_set.check(timeout=0.1))
+    assert time.perf_counter() - started < 5
+    assert not replica.healthy
+    assert replica.last_error.startswith("TimeoutError")
+
+
+def test_reads_use_the_replica_until_a_write_pins_the_client(seeded):
+    import main
+    from settings import Settings
+
+    # The replica is a copy of the primary with one extra in-house stay to tell them apart
+    replica_path = os.path.join(os.path.dirname(DB_PATH), "replica.db")
+    shutil.copyfile(DB_PATH, replica_path)
+    replica_engine = create_engine(f"sqlite:///{replica_path}")
+    with replica_engine.begin() as conn:
+        conn.execute(insert(models.Reservations.__table__).values(
+            first_name="Replica", last_name="Marker", email="marker@example.com", phone_number="+15550000001",
+            check_in=TODAY, check_out=TODAY, total_amount=0, address="-", credit_card_number="-",
+            cc_expiry="-", status="checked_in", room_type="Double", created_by=1))
+    replica_engine.dispose()
+
+    settings = Settings(warm_indexes=False, replica_urls=(f"sqlite:///{replica_path}",), primary_pin_seconds=60)
+    first, second = main.create_app(settings), main.create_app(settings)
+    # Each app owns its replica engines instead of reconfiguring a shared set
+    assert first.state.replica_set is not second.state.replica_set
+
+    async def run():
+        async with second.router.lifespan_context(second):
+            async with httpx.AsyncClient(transport=httpx.ASGITransport(app=second),
+                                         base_url="http://hotel.test") as client:
+                before = [(await client.get("/inhouse/checked_in")).json() for _ in range(2)]
+                written = await client.post("/reservations/", json=booking(TODAY))
+                after = [(await client.get("/inhouse/checked_in")).json() for _ in range(2)]
+                return before, written, after
+
+    before, written, after = asyncio.run(run())
+    assert [[row["last_name"] for row in rows] for rows in before] == [["Marker"], ["Marker"]]
+    assert written.status_code == 200
+    assert written.headers["set-cookie"].startswith(f"{replicas.PIN_COOKIE}=")
+    # The pin cookie sends this client's reads to the primary, which has no in-house stay
+    assert after == [[], []]
@@ -0,0 +1,48 @@
+import asyncio
+from datetime import timedelta
+
+import httpx
+import pytest
+from sqlalchemy import select
+
+import rollups
+from conftest import TODAY, booking
+
+
+def test_upsert_names_the_supported_dialects():
+    with pytest.raises(ValueError, match="mysql, postgresql, sqlite"):
+        rollups.upsert("oracle")
+
+
+def test_incremental_rollups_match_a_rebuild_after_book_edit_cancel(seeded):
+    import main
+    from settings import Settings
+
+    app = main.create_app(Settings(warm_indexes=False))
+
+    async def run():
+        async with app.router.lifespan_context(app):
+            async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+                assert (await client.post("/reservations/", json=booking(TODAY, nights=3))).status_code == 200
+                edited = (await client.post("/reservations/", json=booking(TODAY, nights=2))).json()
+                params = {"reservationid": edited["reservation_id"]}
+                moved = {**edited, "check_in": (TODAY + timedelta(days=1)).isoformat(),
+                         "check_out": (TODAY + timedelta(days=4)).isoformat(), "total_amount": "310.00"}
+                assert (await client.put("/reservation/", params=params, json=moved)).status_code == 200
+                cancelled = {**moved, "status": "cancelled"}
+                assert (await client.put("/reservation/", params=params, json=cancelled)).status_code == 200
+
+    asyncio.run(run())
+
+    def snapshot(conn):
+        rows = conn.execute(select(rollups.rollups)).mappings()
+        return {(row["stay_date"], row["room_type"]): {c: row[c] for c in rollups.COUNTERS} for row in rows}
+
+    with seeded.begin() as conn:
+        incremental = snapshot(conn)
+        rollups.rebuild(conn)
+        # Rows a cancellation zeroed out stay behind as zeros; a rebuild never writes them
+        assert {key: values for key, values in incremental.items() if any(values.values())} == snapshot(conn)
+        # The cancellation lands on the moved check-in; only the kept stay still sells that night
+        assert incremental[(TODAY + timedelta(days=1), "Double")]["cancellations"] == 1
+        assert incremental[(TODAY + timedelta(days=1), "Double")]["rooms_sold"] == 1
@@ -0,0 +1,27 @@
+import asyncio
+import os
+
+import pytest
+from fastapi import HTTPException
+
+import security
+
+
+def _crash():
+    os._exit(1)
+
+
+def test_password_pool_recovers_after_a_worker_dies():
+    async def run():
+        # The job kills its worker on the first try and on the retry, so the caller gets a 503
+        with pytest.raises(HTTPException) as failed:
+            await security._submit(_crash)
+        assert failed.value.status_code == 503 and failed.value.headers["Retry-After"]
+        # The broken pool was replaced, so the next job runs on a fresh one
+        return await security._submit(pow, 2, 10)
+
+    try:
+        assert asyncio.run(run()) == 1024
+        assert security.password_pool_status()["in_flight"] == 0
+    finally:
+        security.shutdown_password_pool()